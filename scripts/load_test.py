@@ -0,0 +1,83 @@
+"""
+Compare requests/sec of dashboard deployments.
+
+Start the Flask dev server and the production server side by side (from src/),
+then point this script at both:
+
+    DASH_DEBUG=false python -m app.main           # dev server on :8000
+    WEB_PORT=8001 python -m app.serve             # production server on :8001
+    python scripts/load_test.py http://127.0.0.1:8000 http://127.0.0.1:8001
+
+By default `/_dash-layout` is requested, which makes Dash serialize the full
+layout on every request, like a page load.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+import httpx
+
+
+async def _worker(client: httpx.AsyncClient, url: str, deadline: float,
+                  latencies: List[float], errors: List[int]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 400:
+                errors[0] += 1
+                continue
+        except httpx.HTTPError:
+            errors[0] += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(base_url: str, path: str, concurrency: int, duration: float) -> Dict[str, float]:
+    """Hammer one URL with `concurrency` clients for `duration` seconds."""
+    url = base_url.rstrip("/") + path
+    latencies: List[float] = []
+    errors = [0]
+    limits = httpx.Limits(max_connections=concurrency,
+                          max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        # Warm up (imports, first render) before measuring
+        await client.get(url)
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            _worker(client, url, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_urls", nargs="+",
+                        help="Servers to compare, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/_dash-layout")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(f"{'server':<32}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for base_url in args.base_urls:
+        result = await run_load(base_url, args.path, args.concurrency, args.duration)
+        print(f"{base_url:<32}{result['requests']:>10}{result['errors']:>8}"
+              f"{result['rps']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Runs once when the primary's data volume is initialised: lets the db_replica
+# service stream WAL from it (wal_level=replica is already the default).
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,11 @@
+#!/bin/bash
+# Starts a hot standby of the db service: on first start the data directory is
+# cloned from the primary with pg_basebackup (-R writes standby.signal and the
+# connection settings), afterwards postgres resumes streaming from it.
+set -e
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    PGPASSWORD="$POSTGRES_PASSWORD" pg_basebackup \
+        -h db -U "${POSTGRES_USER:-postgres}" -D "$PGDATA" -R -X stream -P
+    chmod 0700 "$PGDATA"
+fi
+exec postgres
@@ -0,0 +1,212 @@
+import json
+import logging
+import math
+import os
+import random
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.redis_logic.async_redis import RedisClient
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Burst Detection Configuration ---
+# Half-life of the "recent" counter and of the baseline counter
+BURST_FAST_HALF_LIFE_HOURS = float(os.getenv("BURST_FAST_HALF_LIFE_HOURS", "3"))
+BURST_SLOW_HALF_LIFE_HOURS = float(os.getenv("BURST_SLOW_HALF_LIFE_HOURS", "72"))
+# Terms tracked per category; the least active are evicted beyond this
+BURST_MAX_TERMS = int(os.getenv("BURST_MAX_TERMS", "500"))
+# Baseline rate (articles/hour) assumed for terms with little history
+BURST_MIN_BASELINE_RATE = float(os.getenv("BURST_MIN_BASELINE_RATE", "0.05"))
+# Recent counters are autocorrelated and small counts are skewed, so the normal
+# approximation needs a high threshold to keep background noise out
+BURST_Z_THRESHOLD = float(os.getenv("BURST_Z_THRESHOLD", "5"))
+# Recent mentions needed before a term is reported at all
+BURST_MIN_COUNT = float(os.getenv("BURST_MIN_COUNT", "3"))
+BURST_TOP_N = int(os.getenv("BURST_TOP_N", "15"))
+
+STATE_KEY = "bursts:state:{}"
+TRENDING_KEY = "bursts:trending"
+# Counters decayed below this are dropped
+_NEGLIGIBLE = 0.01
+
+
+def trending_key(category: Optional[str]) -> str:
+    """Dashboard category value of a category: None → "summary", "Sci/Tech" → "sci_tech"."""
+    return "summary" if category is None else category.lower().replace("/", "_")
+
+
+def _decay(hours: float, half_life: float) -> float:
+    return 2 ** (-hours / half_life)
+
+# --- Burst Detector Class ---
+
+
+class TermBurstState:
+    """
+    Exponentially decayed mention counters of the terms of one category.
+
+    Each term has a fast counter (half-life of hours) and a slow baseline counter
+    (half-life of days), both decayed lazily to the last update. The baseline
+    gives the term's usual rate λ; under a Poisson model the fast counter then has
+    mean λ·Hf/ln2 and variance λ·Hf/(2·ln2) (corrected for how long the detector
+    has run), and its z-score against that is the burst score. At most `max_terms`
+    terms are kept, so memory is bounded however many distinct terms arrive.
+    """
+
+    def __init__(self, max_terms: int = BURST_MAX_TERMS):
+        self.max_terms = max_terms
+        self.started: Optional[float] = None
+        self.updated: Optional[float] = None
+        # term -> [fast, slow]
+        self.terms: Dict[str, List[float]] = {}
+
+    def update(self, counts: Counter, now: float) -> None:
+        """Decay the counters to `now` (epoch seconds), then add this batch's mentions."""
+        if self.started is None:
+            self.started = self.updated = now
+        hours = max(0.0, now - self.updated) / 3600
+        fast_decay = _decay(hours, BURST_FAST_HALF_LIFE_HOURS)
+        slow_decay = _decay(hours, BURST_SLOW_HALF_LIFE_HOURS)
+        for counter in self.terms.values():
+            counter[0] *= fast_decay
+            counter[1] *= slow_decay
+        for term, count in counts.items():
+            counter = self.terms.setdefault(term, [0.0, 0.0])
+            counter[0] += count
+            counter[1] += count
+        self.updated = now
+        self._prune()
+
+    def _prune(self) -> None:
+        terms = {term: counter for term, counter in self.terms.items()
+                 if counter[0] + counter[1] >= _NEGLIGIBLE}
+        if len(terms) > self.max_terms:
+            ranked = sorted(terms.items(), key=lambda entry: entry[1][0] + entry[1][1], reverse=True)
+            terms = dict(ranked[:self.max_terms])
+        self.terms = terms
+
+    def score(self, fast: float, slow: float) -> Tuple[float, float]:
+        """(z-score, expected recent count) of a term's counters at the last update."""
+        ln2 = math.log(2)
+        hf, hs = BURST_FAST_HALF_LIFE_HOURS, BURST_SLOW_HALF_LIFE_HOURS
+        # Counters haven't reached steady state while the detector is young
+        age = max((self.updated - self.started) / 3600, hf)
+        rate = max(slow * ln2 / (hs * (1 - _decay(age, hs))), BURST_MIN_BASELINE_RATE)
+        expected = rate * hf / ln2 * (1 - _decay(age, hf))
+        variance = rate * hf / (2 * ln2) * (1 - _decay(2 * age, hf))
+        return (fast - expected) / math.sqrt(variance), expected
+
+    def trending(self, top_n: int = BURST_TOP_N) -> List[Dict[str, Any]]:
+        """Terms whose recent mentions burst above their baseline, highest z-score first."""
+        results = []
+        for term, (fast, slow) in self.terms.items():
+            if fast < BURST_MIN_COUNT:
+                continue
+            z, expected = self.score(fast, slow)
+            if z >= BURST_Z_THRESHOLD:
+                results.append({"term": term, "z_score": round(z, 2),
+                                "recent": round(fast, 2), "baseline": round(expected, 2)})
+        results.sort(key=lambda row: row["z_score"], reverse=True)
+        return results[:top_n]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"started": self.started, "updated": self.updated,
+                "terms": {term: [round(fast, 4), round(slow, 4)]
+                          for term, (fast, slow) in self.terms.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "TermBurstState":
+        state = cls()
+        if data:
+            state.started, state.updated = data["started"], data["updated"]
+            state.terms = {term: list(counter) for term, counter in data["terms"].items()}
+        return state
+
+
+async def update_bursts(redis_client: RedisClient, counts: Dict[str, Counter],
+                        now: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Feed one ingestion run's term mentions per category into the detector and
+    publish the trending terms of every category (and all categories together,
+    under "summary") to the `bursts:trending` hash. Categories without new
+    mentions are still decayed. Ingestion is serialized by its lease lock, so the
+    read-modify-write of the state is safe. Returns the published lists.
+    """
+    now = now or datetime.utcnow()
+    timestamp = now.timestamp()
+    overall: Counter = Counter()
+    for category_counts in counts.values():
+        overall.update(category_counts)
+    by_key = {trending_key(category): category_counts for category, category_counts in counts.items()}
+    by_key[trending_key(None)] = overall
+
+    await redis_client.ensure_client()
+    client = redis_client.client
+    known = await redis_client.execute_command(client.hkeys, TRENDING_KEY)
+    keys = sorted(set(by_key) | set(known))
+    values = await redis_client.execute_command(client.mget, [STATE_KEY.format(key) for key in keys])
+
+    published = {}
+    async with client.pipeline(transaction=False) as pipe:
+        for key, value in zip(keys, values):
+            state = TermBurstState.from_dict(json.loads(value) if value else None)
+            state.update(by_key.get(key, Counter()), timestamp)
+            published[key] = state.trending()
+            pipe.set(STATE_KEY.format(key), json.dumps(state.to_dict()))
+            pipe.hset(TRENDING_KEY, key, json.dumps(
+                {"updated": now.isoformat(), "terms": published[key]}))
+        await redis_client.execute_command(pipe.execute)
+    logger.info(f"Trending terms: {sum(map(len, published.values()))} across {len(published)} categories")
+    return published
+
+
+def read_trending_sync(redis_client, key: str) -> List[Dict[str, Any]]:
+    """Trending terms of a dashboard category, for the synchronous client used by Dash callbacks."""
+    redis_client.ensure_client()
+    value = redis_client.execute_command(redis_client.client.hget, TRENDING_KEY, key)
+    return json.loads(value)["terms"] if value else []
+
+# --- Test Function ---
+
+
+def main_test(hours: int = 24 * 10, burst_at: int = 24 * 8):
+    """
+    Hourly batches over ten days: steady background terms at various rates, then
+    a term that normally appears once a day gets 8 mentions an hour for three
+    hours. The burst must be reported on top, background terms only rarely, and
+    memory stays bounded.
+    """
+    rng = random.Random(3)
+    state = TermBurstState(max_terms=100)
+    false_positives = 0
+    background = {f"term_{i}": 0.02 + 0.5 * rng.random() for i in range(60)}
+    for hour in range(hours):
+        counts = Counter({term: sum(rng.random() < rate / 4 for _ in range(4))
+                          for term, rate in background.items()})
+        # A long tail of one-off terms that must not grow the state
+        counts.update(f"rare_{hour}_{i}" for i in range(30))
+        if rng.random() < 1 / 24:
+            counts["election"] += 1
+        if burst_at <= hour < burst_at + 3:
+            counts["election"] += 8
+        state.update(+counts, hour * 3600.0)
+        trending = [row["term"] for row in state.trending()]
+        assert len(state.terms) <= 100
+        if hour == burst_at + 2:
+            logger.info(f"During burst: {state.trending()[:3]}")
+            assert trending and trending[0] == "election", trending
+        elif hour > 24:
+            if hour < burst_at:
+                assert "election" not in trending
+            false_positives += sum(term != "election" for term in trending)
+    rate = false_positives / (hours - 25)
+    logger.info(f"Tracked terms: {len(state.terms)}, background terms reported per hour: {rate:.3f}")
+    assert rate <= 0.02, rate
+
+
+if __name__ == "__main__":
+    main_test()
@@ -0,0 +1,400 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+from app.redis_logic.lease_lock import FencingError, fenced_write
+from app.aggregates.topk import SpaceSaving
+from app.aggregates.quantiles import DDSketch
+from app.aggregates.terms import TERM_SKETCH_CAPACITY, extract_terms
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Bucket Configuration ---
+# Days of buckets kept in Redis; matches the article retention window
+BUCKET_RETENTION_DAYS = int(os.getenv("BUCKET_RETENTION_DAYS", "31"))
+BUCKET_PREFIX = "bucket:day"
+CATEGORIES_KEY = f"{BUCKET_PREFIX}:categories"
+# Set once a full rebuild has been written, so a partial backfill is retried
+BACKFILLED_KEY = f"{BUCKET_PREFIX}:backfilled"
+# Stored in BACKFILLED_KEY; bumped when buckets gain a field, so older ones are rebuilt
+# 1: counts, pie and sources, 2: sentiment quantile sketches, 3: keyword sketches
+BUCKET_FORMAT = 3
+# Same thresholds as the pie chart query
+POSITIVE_THRESHOLD = 0.4
+NEGATIVE_THRESHOLD = -0.4
+
+
+def sentiment_class(sentiment: float) -> str:
+    if sentiment > POSITIVE_THRESHOLD:
+        return "good"
+    if sentiment < NEGATIVE_THRESHOLD:
+        return "bad"
+    return "okay"
+
+
+def bucket_key(category: str, day: date) -> str:
+    return f"{BUCKET_PREFIX}:{category}:{day.isoformat()}"
+
+# --- Daily Bucket Class ---
+
+
+@dataclass
+class DailyBucket:
+    """
+    Pre-aggregated articles of one (category, day): count, sentiment sum, pie
+    class counts, a Space-Saving sketch of sources with their sentiment sums and a
+    DDSketch of sentiment scores for quantiles and arbitrary thresholds, and a
+    Space-Saving sketch of keywords with the sentiment of the articles mentioning
+    them. Buckets merge by addition, so any set of days and categories combines without
+    touching the articles again.
+    """
+    count: int = 0
+    sentiment_sum: float = 0.0
+    pie: Dict[str, int] = field(default_factory=lambda: {"good": 0, "okay": 0, "bad": 0})
+    sources: SpaceSaving = field(default_factory=SpaceSaving)
+    quantiles: DDSketch = field(default_factory=DDSketch)
+    terms: SpaceSaving = field(default_factory=lambda: SpaceSaving(TERM_SKETCH_CAPACITY))
+    # Read from a bucket stored before keyword sketches; articles can have no keywords,
+    # so unlike quantiles this can't be told from the counts
+    missing_terms: bool = field(default=False, repr=False)
+
+    def add(self, source_id: str, sentiment: float, terms: Iterable[str] = ()) -> None:
+        """Add one article with its distinct keywords (see app.aggregates.terms.extract_terms)."""
+        self.count += 1
+        self.sentiment_sum += sentiment
+        self.pie[sentiment_class(sentiment)] += 1
+        self.sources.update(source_id, sentiment)
+        self.quantiles.add(sentiment)
+        for term in terms:
+            self.terms.update(term, sentiment)
+
+    def merge(self, other: "DailyBucket") -> "DailyBucket":
+        """Add another bucket into this one and return self."""
+        self.count += other.count
+        self.sentiment_sum += other.sentiment_sum
+        for name, value in other.pie.items():
+            self.pie[name] = self.pie.get(name, 0) + value
+        self.sources.merge(other.sources)
+        self.quantiles.merge(other.quantiles)
+        self.terms.merge(other.terms)
+        return self
+
+    @property
+    def stale(self) -> bool:
+        """Written before the quantile or keyword sketch existed, so it misses some of the articles."""
+        return self.quantiles.count != self.count or self.missing_terms
+
+    def top_sources(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Sources by estimated article count, shaped like get_top_sources_with_avg_sentiment."""
+        return self.sources.top(limit)
+
+    def to_json(self) -> str:
+        return json.dumps({"count": self.count, "sentiment_sum": self.sentiment_sum,
+                           "pie": self.pie, "sources": self.sources.to_dict(),
+                           "quantiles": self.quantiles.to_dict(),
+                           "terms": self.terms.to_dict()})
+
+    @classmethod
+    def from_json(cls, value: str) -> "DailyBucket":
+        data = json.loads(value)
+        sources = data["sources"]
+        if "counters" in sources:
+            sketch = SpaceSaving.from_dict(sources)
+        else:
+            # Exact {source: [count, sentiment_sum]} tallies written before sketches
+            sketch = SpaceSaving()
+            for source_id, (count, sentiment_sum) in sources.items():
+                sketch.update(source_id, sentiment_sum, weight=int(count))
+        return cls(count=data["count"], sentiment_sum=data["sentiment_sum"],
+                   pie=data["pie"], sources=sketch,
+                   quantiles=DDSketch.from_dict(data.get("quantiles")),
+                   terms=SpaceSaving.from_dict(data["terms"]) if "terms" in data
+                   else SpaceSaving(TERM_SKETCH_CAPACITY),
+                   missing_terms="terms" not in data)
+
+# --- Window Queries ---
+
+
+def window_days(start: datetime, end: datetime) -> List[date]:
+    """Days overlapping [start, end). Buckets are whole days, so partial days count in full."""
+    days = []
+    day = start.date()
+    while datetime.combine(day, datetime.min.time()) < end:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def summarize_window(buckets_by_day: Dict[date, DailyBucket], top_n: int = 10,
+                     thresholds: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Turn per-day buckets into the snapshot format used by the dashboard:
+    a daily line_graph, pie_chart counts, top_sources and top_terms, plus
+    sentiment percentiles and, if `thresholds` are given, estimated counts per band.
+    """
+    total = DailyBucket()
+    line_graph = {}
+    for day in sorted(buckets_by_day):
+        bucket = buckets_by_day[day]
+        total.merge(bucket)
+        if bucket.count:
+            line_graph[day.strftime("%Y-%m-%d 00:00:00")] = bucket.sentiment_sum / bucket.count
+    return {
+        "line_graph": line_graph,
+        "bucket": "day",
+        "pie_chart": dict(total.pie),
+        "top_sources": total.top_sources(top_n),
+        "top_terms": total.terms.top(top_n, label="term"),
+        "sentiment_quantiles": total.quantiles.summary(),
+        "sentiment_bands": total.quantiles.band_counts(thresholds) if thresholds else None,
+        "article_count": total.count,
+        "avg_sentiment": total.sentiment_sum / total.count if total.count else 0.0,
+    }
+
+
+def _merge_values(keys: List[Tuple[date, str]], values: Iterable[Optional[str]]) -> Dict[date, DailyBucket]:
+    buckets_by_day: Dict[date, DailyBucket] = {}
+    for (day, _), value in zip(keys, values):
+        if value is None:
+            continue
+        buckets_by_day.setdefault(day, DailyBucket()).merge(DailyBucket.from_json(value))
+    return buckets_by_day
+
+
+def _window_keys(start: datetime, end: datetime, categories: Iterable[str]) -> List[Tuple[date, str]]:
+    return [(day, bucket_key(category, day))
+            for day in window_days(start, end) for category in categories]
+
+
+async def query_window(redis_client: RedisClient, start: datetime, end: datetime,
+                       category: str | None = None, top_n: int = 10,
+                       thresholds: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Aggregate any [start, end) window (naive UTC, day resolution) for one category,
+    or all categories when None, by merging daily buckets from Redis. Costs one
+    MGET regardless of how many articles the window holds; no SQL is run.
+    `thresholds` (ascending) adds estimated article counts per sentiment band.
+    """
+    await redis_client.ensure_client()
+    client = redis_client.client
+    categories = [category] if category else sorted(
+        await redis_client.execute_command(client.smembers, CATEGORIES_KEY))
+    keys = _window_keys(start, end, categories)
+    values = await redis_client.execute_command(
+        client.mget, [key for _, key in keys]) if keys else []
+    return summarize_window(_merge_values(keys, values), top_n, thresholds)
+
+
+def query_window_sync(redis_client, start: datetime, end: datetime,
+                      category: str | None = None, top_n: int = 10,
+                      thresholds: Optional[List[float]] = None) -> Dict[str, Any]:
+    """query_window for the synchronous client (app.redis_logic.redis.RedisClient) used by Dash callbacks."""
+    redis_client.ensure_client()
+    client = redis_client.client
+    categories = [category] if category else sorted(
+        redis_client.execute_command(client.smembers, CATEGORIES_KEY))
+    keys = _window_keys(start, end, categories)
+    values = redis_client.execute_command(
+        client.mget, [key for _, key in keys]) if keys else []
+    return summarize_window(_merge_values(keys, values), top_n, thresholds)
+
+# --- Bucket Maintenance ---
+
+
+async def merge_daily_buckets(redis_client: RedisClient,
+                              deltas: Dict[Tuple[str, date], DailyBucket]) -> int:
+    """
+    Add the buckets built during an ingestion run into the stored ones.
+    Ingestion is serialized by its lease lock, and the write is fenced by its token,
+    so read-modify-write is safe here. Returns the number of buckets written.
+    """
+    if not deltas:
+        return 0
+    await redis_client.ensure_client()
+    client = redis_client.client
+    ttl = BUCKET_RETENTION_DAYS * 86400
+    keys = [bucket_key(category, day) for category, day in deltas]
+    stored = [DailyBucket.from_json(value) if value else None
+              for value in await redis_client.execute_command(client.mget, keys)]
+    stale = sum(1 for bucket in stored if bucket is not None and bucket.stale)
+    if stale:
+        # e.g. written by an older worker; the next run rebuilds every bucket
+        logger.warning(f"{stale} daily buckets predate the current sketches, rebuilding on the next run")
+        await redis_client.execute_command(client.delete, BACKFILLED_KEY)
+    await fenced_write(redis_client, {
+        key: (bucket.merge(delta) if bucket else delta).to_json()
+        for key, delta, bucket in zip(keys, deltas.values(), stored)
+    }, ttl=ttl)
+    await redis_client.execute_command(client.sadd, CATEGORIES_KEY, *{category for category, _ in deltas})
+    logger.info(f"Merged {len(deltas)} daily buckets into Redis")
+    return len(deltas)
+
+
+async def rebuild_daily_buckets(redis_client: RedisClient, days: int = BUCKET_RETENTION_DAYS) -> int:
+    """
+    Rebuild every bucket of the last `days` days from news_articles with two
+    grouped scans and a scan of titles and descriptions, replacing what is stored. Used to backfill and to repair drift.
+    """
+    # Imported here so the web tier can query buckets without loading the DB layer
+    from sqlalchemy import case, func
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.future import select
+    from app.db_logic.db import engine
+    from app.db_logic.models import NewsArticle, Source, counted_articles, decompress_text
+    from app.db_logic.dimensions import dimension_cache
+    from app.db_logic.streaming import stream_rows
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    day_trunc = func.date_trunc('day', NewsArticle.pubDate).label("day")
+    async with AsyncSession(engine) as session:
+        source_names = await dimension_cache.names(session, Source)
+    buckets: Dict[Tuple[str, date], DailyBucket] = {}
+    grouped = 0
+    # Each scan is folded into the buckets as it streams, so memory depends on the
+    # number of buckets rather than on the number of articles
+    async for row in stream_rows(
+        select(
+            day_trunc,
+            NewsArticle.category,
+            NewsArticle.source_key,
+            func.count(NewsArticle.id).label("count"),
+            func.sum(NewsArticle.sentiment).label("sentiment_sum"),
+            func.sum(case((NewsArticle.sentiment > POSITIVE_THRESHOLD, 1), else_=0)).label("good"),
+            func.sum(case((NewsArticle.sentiment < NEGATIVE_THRESHOLD, 1), else_=0)).label("bad"),
+        )
+        .where(NewsArticle.pubDate >= cutoff)
+        .where(counted_articles())
+        .group_by(day_trunc, NewsArticle.category, NewsArticle.source_key)
+    ):
+        grouped += 1
+        bucket = buckets.setdefault((row.category, row.day.date()), DailyBucket())
+        bucket.count += row.count
+        bucket.sentiment_sum += float(row.sentiment_sum)
+        bucket.pie["good"] += int(row.good)
+        bucket.pie["bad"] += int(row.bad)
+        bucket.pie["okay"] += row.count - int(row.good) - int(row.bad)
+        bucket.sources.update(source_names.get(row.source_key, "Unknown"),
+                              float(row.sentiment_sum), weight=row.count)
+    # Distinct scores per bucket for the quantile sketches (VADER scores have four decimals)
+    async for row in stream_rows(
+        select(day_trunc, NewsArticle.category, NewsArticle.sentiment,
+               func.count(NewsArticle.id).label("count"))
+        .where(NewsArticle.pubDate >= cutoff)
+        .where(counted_articles())
+        .group_by(day_trunc, NewsArticle.category, NewsArticle.sentiment)
+    ):
+        # Articles inserted between scans may open new buckets
+        buckets.setdefault((row.category, row.day.date()), DailyBucket()).quantiles.add(
+            row.sentiment, weight=row.count)
+    # Articles stored before descriptions were kept only contribute title terms
+    async for row in stream_rows(
+        select(day_trunc, NewsArticle.category, NewsArticle.title,
+               NewsArticle.description_compressed, NewsArticle.sentiment)
+        .where(NewsArticle.pubDate >= cutoff)
+        .where(counted_articles())
+    ):
+        bucket = buckets.setdefault((row.category, row.day.date()), DailyBucket())
+        description = decompress_text(row.description_compressed)
+        text = f"{row.title}. {description}" if description else row.title
+        for term in extract_terms(text):
+            bucket.terms.update(term, row.sentiment)
+
+    await fenced_write(redis_client, {bucket_key(category, day): bucket.to_json()
+                                      for (category, day), bucket in buckets.items()},
+                       ttl=BUCKET_RETENTION_DAYS * 86400)
+    if buckets:
+        await redis_client.execute_command(
+            redis_client.client.sadd, CATEGORIES_KEY, *{category for category, _ in buckets})
+    await redis_client.execute_command(redis_client.client.set, BACKFILLED_KEY, BUCKET_FORMAT)
+    logger.info(f"Rebuilt {len(buckets)} daily buckets from {grouped} grouped rows")
+    return len(buckets)
+
+
+async def ensure_daily_buckets(redis_client: RedisClient) -> bool:
+    """
+    Backfill the buckets once if they were never rebuilt (first deploy or flushed
+    Redis) or were built in an older BUCKET_FORMAT. Returns False if the backfill failed, in which case the stored buckets
+    are incomplete and must not be merged into; the next run retries it.
+    """
+    try:
+        built = await redis_client.execute_command(redis_client.client.get, BACKFILLED_KEY)
+        if built is None:
+            logger.info("Daily buckets were never backfilled, rebuilding from news_articles")
+            await rebuild_daily_buckets(redis_client)
+        elif int(built) < BUCKET_FORMAT:
+            logger.info(f"Daily buckets are in format {built}, rebuilding in format {BUCKET_FORMAT}")
+            await rebuild_daily_buckets(redis_client)
+        return True
+    except FencingError:
+        # A newer run holds the lease; stop writing
+        raise
+    except Exception as e:
+        logger.error(f"Failed to backfill daily buckets: {e}")
+        return False
+
+# --- Test Function ---
+
+
+async def main_test():
+    redis_client = RedisClient(REDIS_URL)
+    try:
+        await redis_client.initialize()
+        await rebuild_daily_buckets(redis_client)
+        now = datetime.utcnow()
+        for days in (1, 7, 30):
+            window = await query_window(redis_client, now - timedelta(days=days), now)
+            logger.info(f"Last {days} days: {window['article_count']} articles, "
+                        f"pie {window['pie_chart']}, top {window['top_sources'][:3]}")
+
+        # Sketch top sources against an exact GROUP BY over the same whole days
+        from sqlalchemy import func
+        from sqlalchemy.ext.asyncio import AsyncSession
+        from sqlalchemy.future import select
+        from app.db_logic.db import engine
+        from app.db_logic.models import NewsArticle, Source, counted_articles
+        from app.db_logic.dimensions import dimension_cache
+        whole_days = window_days(now - timedelta(days=30), now)
+        start = datetime.combine(whole_days[0], datetime.min.time())
+        end = datetime.combine(whole_days[-1] + timedelta(days=1), datetime.min.time())
+        async with AsyncSession(engine) as session:
+            source_names = await dimension_cache.names(session, Source)
+            result = await session.execute(
+                select(NewsArticle.source_key, func.count(NewsArticle.id).label("count"))
+                .where(NewsArticle.pubDate >= start)
+                .where(NewsArticle.pubDate < end)
+                .where(counted_articles())
+                .group_by(NewsArticle.source_key)
+            )
+            exact_counts = {source_names.get(row.source_key, "Unknown"): row.count for row in result}
+        approx_top = (await query_window(redis_client, start, end))["top_sources"]
+        k = min(10, len(exact_counts))
+        if not k:
+            logger.info("No articles in the window, nothing to compare")
+            return
+        # Sources tied with the exact k-th count are equally valid members of the top k
+        unknown = [row["source"] for row in approx_top if row["source"] not in exact_counts]
+        assert not unknown, f"Sketch reports sources without articles in the window: {unknown}"
+        kth_count = sorted(exact_counts.values(), reverse=True)[k - 1]
+        recall = sum(1 for row in approx_top if exact_counts.get(row["source"], 0) >= kth_count) / k
+        max_error = max(abs(row["article_count"] - exact_counts[row["source"]]) / exact_counts[row["source"]]
+                        for row in approx_top)
+        logger.info(f"Top-{k} recall against the exact query: {recall:.2f}, "
+                    f"max relative count error: {max_error:.4f}")
+        assert recall >= 0.9, f"Top-{k} recall too low: {recall}"
+        assert max_error <= 0.1, f"Count error too high: {max_error}"
+        for row in approx_top:
+            exact = exact_counts[row["source"]]
+            assert row["article_count"] - row["error"] <= exact <= row["article_count"], \
+                f"Error bound violated for {row['source']}: {row} vs exact {exact}"
+    finally:
+        await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main_test())
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import random
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+from app.aggregates.terms import tokenize
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Deduplication Configuration ---
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+LSH_BANDS = int(os.getenv("LSH_BANDS", "16"))
+# Estimated Jaccard similarity of shingles above which two articles are one story
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_RETENTION_DAYS = int(os.getenv("DEDUP_RETENTION_DAYS", "30"))
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def article_id(link: Optional[str], title: str) -> str:
+    """Stable id of an article: its link, or its title when it has none."""
+    return hashlib.sha1((link or title).encode("utf-8")).hexdigest()[:16]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Character shingles of the normalized text, so small wording changes keep most shingles."""
+    normalized = " ".join(tokenize(text))
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+# --- MinHash Class ---
+
+
+class MinHasher:
+    """
+    MinHash signatures: for each of `num_perm` random hash functions, the minimum
+    hash over a document's shingles. The fraction of equal positions between two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def signature(self, text: str) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big")
+                  for s in shingles(text)]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                for a, b in self.params]
+
+    @staticmethod
+    def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+# --- Near-Duplicate Index Class ---
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index of recent articles kept in Redis.
+
+    Each signature is cut into `bands` bands; articles sharing any whole band are
+    candidates, and candidates whose estimated similarity reaches `threshold` join
+    the same story cluster. A lookup costs one SMEMBERS per band plus one MGET of
+    candidates, independent of how many articles are indexed. Entries expire after
+    the retention window.
+
+    Keys (`prefix` defaults to "dedup"):
+        <prefix>:band:<band>:<hash>  set of article ids sharing that band
+        <prefix>:doc:<article id>    {"cluster": cluster id, "sig": signature}
+    """
+
+    def __init__(self, redis_client: RedisClient, bands: int = LSH_BANDS,
+                 threshold: float = DEDUP_THRESHOLD, hasher: Optional[MinHasher] = None,
+                 prefix: str = "dedup"):
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("MINHASH_PERMUTATIONS must be a multiple of LSH_BANDS")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.threshold = threshold
+        self.ttl = DEDUP_RETENTION_DAYS * 86400
+
+    def _band_keys(self, signature: Sequence[int]) -> List[str]:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(",".join(map(str, chunk)).encode(), digest_size=8).hexdigest()
+            keys.append(f"{self.prefix}:band:{band}:{digest}")
+        return keys
+
+    async def assign(self, articles: List[Tuple[str, str]]) -> List[Tuple[str, bool, List[int]]]:
+        """
+        Assign a story cluster to each (article id, text) of a batch, in order.
+
+        Returns:
+            (cluster id, is duplicate, signature) per article. An article matching an
+            indexed article or an earlier one in the batch joins its cluster and is a
+            duplicate; otherwise it starts a cluster named after itself.
+        """
+        signatures = [self.hasher.signature(text) for _, text in articles]
+        band_keys = [self._band_keys(sig) for sig in signatures]
+
+        await self.redis_client.ensure_client()
+        client = self.redis_client.client
+        async with client.pipeline(transaction=False) as pipe:
+            for keys in band_keys:
+                for key in keys:
+                    pipe.smembers(key)
+            members = await self.redis_client.execute_command(pipe.execute)
+        candidates: List[Set[str]] = []
+        for i in range(len(articles)):
+            found = set()
+            for member_set in members[i * self.bands:(i + 1) * self.bands]:
+                found |= member_set
+            candidates.append(found)
+
+        candidate_ids = sorted(set().union(*candidates)) if candidates else []
+        indexed: Dict[str, dict] = {}
+        if candidate_ids:
+            values = await self.redis_client.execute_command(
+                client.mget, [f"{self.prefix}:doc:{doc_id}" for doc_id in candidate_ids])
+            indexed = {doc_id: json.loads(value)
+                       for doc_id, value in zip(candidate_ids, values) if value}
+
+        results: List[Tuple[str, bool, List[int]]] = []
+        batch_bands: Dict[str, List[int]] = {}
+        for i, ((doc_id, _), sig) in enumerate(zip(articles, signatures)):
+            best, best_similarity = None, self.threshold
+            for candidate in candidates[i]:
+                entry = indexed.get(candidate)
+                if entry is None:
+                    continue
+                similarity = MinHasher.similarity(sig, entry["sig"])
+                if similarity >= best_similarity:
+                    best, best_similarity = entry["cluster"], similarity
+            # Earlier articles of this batch aren't indexed yet
+            for key in band_keys[i]:
+                for j in batch_bands.get(key, []):
+                    similarity = MinHasher.similarity(sig, signatures[j])
+                    if similarity >= best_similarity:
+                        best, best_similarity = results[j][0], similarity
+                batch_bands.setdefault(key, []).append(i)
+            results.append((best or doc_id, best is not None, sig))
+
+        duplicates = sum(is_duplicate for _, is_duplicate, _ in results)
+        logger.info(f"Near-duplicate check: {duplicates} of {len(articles)} articles joined existing stories")
+        return results
+
+    async def add(self, entries: List[Tuple[str, str, List[int]]]) -> None:
+        """Index (article id, cluster id, signature) entries, e.g. after they were inserted."""
+        if not entries:
+            return
+        await self.redis_client.ensure_client()
+        async with self.redis_client.client.pipeline(transaction=False) as pipe:
+            for doc_id, cluster_id, sig in entries:
+                pipe.set(f"{self.prefix}:doc:{doc_id}", json.dumps({"cluster": cluster_id, "sig": sig}),
+                         ex=self.ttl)
+                for key in self._band_keys(sig):
+                    pipe.sadd(key, doc_id)
+                    pipe.expire(key, self.ttl)
+            await self.redis_client.execute_command(pipe.execute)
+
+# --- Test Function ---
+
+
+def _test_redis_url(db: int) -> str:
+    """REDIS_URL with database index `db`, so the self-test never writes to the live index."""
+    parts = urlsplit(REDIS_URL)
+    if (parts.path.strip("/") or "0") == str(db):
+        raise RuntimeError(f"REDIS_URL already uses database {db}; set DEDUP_TEST_REDIS_DB to a free one")
+    return urlunsplit(parts._replace(path=f"/{db}"))
+
+
+async def main_test():
+    # Pure MinHash: near-identical texts agree on most positions, unrelated ones don't
+    hasher = MinHasher()
+    fed = hasher.signature("Fed holds interest rates steady as inflation cools, central bank says")
+    similar = MinHasher.similarity(
+        fed, hasher.signature("Fed holds interest rates steady as inflation cools, central bank said"))
+    unrelated = MinHasher.similarity(
+        fed, hasher.signature("Lakers beat Celtics in overtime thriller at the Garden"))
+    logger.info(f"Similar: {similar:.2f}, unrelated: {unrelated:.2f}")
+    assert similar >= DEDUP_THRESHOLD > unrelated
+
+    # The index, in a database of its own (DEDUP_TEST_REDIS_DB, default 15)
+    redis_client = RedisClient(_test_redis_url(int(os.getenv("DEDUP_TEST_REDIS_DB", "15"))))
+    try:
+        await redis_client.initialize()
+        index = NearDuplicateIndex(redis_client, prefix="dedup_test")
+        first = [("a", "Fed holds interest rates steady as inflation cools, central bank says"),
+                 ("b", "Lakers beat Celtics in overtime thriller at the Garden")]
+        assigned = await index.assign(first)
+        assert [(cluster, duplicate) for cluster, duplicate, _ in assigned] == [("a", False), ("b", False)]
+        await index.add([(doc_id, cluster, sig) for (doc_id, _), (cluster, _, sig) in zip(first, assigned)])
+        second = [("c", "Fed holds interest rates steady as inflation cools, central bank said"),
+                  ("d", "Apple unveils new iPhone with faster chip"),
+                  ("e", "Apple unveils new iPhone with a faster chip")]
+        clusters = {doc_id: (cluster, duplicate)
+                    for (doc_id, _), (cluster, duplicate, _) in zip(second, await index.assign(second))}
+        logger.info(f"Clusters: {clusters}")
+        # c matches an indexed article, e an earlier article of the same batch
+        assert clusters == {"c": ("a", True), "d": ("d", False), "e": ("d", True)}, clusters
+    finally:
+        client = redis_client.client
+        if client is not None:
+            keys = [key async for key in client.scan_iter(match="dedup_test:*")]
+            if keys:
+                await client.delete(*keys)
+        await redis_client.close()
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main_test())
@@ -0,0 +1,186 @@
+import logging
+import math
+import os
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Relative error of reported quantiles
+SENTIMENT_SKETCH_ACCURACY = float(os.getenv("SENTIMENT_SKETCH_ACCURACY", "0.01"))
+# Magnitudes below this are counted as zero (VADER reports four decimals)
+MIN_INDEXABLE = 1e-4
+
+# --- DDSketch Class ---
+
+
+class DDSketch:
+    """
+    DDSketch (Masson et al.) quantile sketch for sentiment scores.
+
+    Values are counted in logarithmic bins whose width grows with magnitude, so
+    every reported quantile is within `relative_accuracy` of a true value. Positive
+    and negative scores have their own bins and exact zeros their own counter, which
+    suits VADER compound scores in [-1, 1]. Sketches with the same accuracy merge by
+    adding bin counts, so per-day sketches combine into any window exactly as if
+    the articles had been added to one sketch.
+    """
+
+    def __init__(self, relative_accuracy: float = SENTIMENT_SKETCH_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value > MIN_INDEXABLE:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + weight
+        elif value < -MIN_INDEXABLE:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + weight
+        else:
+            self.zero += weight
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        """Merge another sketch with the same accuracy into this one and return self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _bins(self):
+        """(representative value, count) from most negative to most positive."""
+        for index in sorted(self.negative, reverse=True):
+            yield -self._value(index), self.negative[index]
+        if self.zero:
+            yield 0.0, self.zero
+        for index in sorted(self.positive):
+            yield self._value(index), self.positive[index]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in self._bins():
+            seen += count
+            if seen > rank:
+                return max(self.min, min(self.max, value))
+        return self.max
+
+    def cdf(self, x: float) -> float:
+        """Estimated fraction of values <= x."""
+        if not self.count:
+            return 0.0
+        return sum(count for value, count in self._bins() if value <= x) / self.count
+
+    def band_counts(self, thresholds: Sequence[float]) -> List[int]:
+        """
+        Estimated counts in the bands split by ascending thresholds, e.g.
+        [-0.4, 0.4] → [< -0.4, -0.4..0.4, > 0.4] like the pie chart.
+        """
+        bands = [0] * (len(thresholds) + 1)
+        for value, count in self._bins():
+            if value < thresholds[0]:
+                bands[0] += count
+            elif value > thresholds[-1]:
+                bands[-1] += count
+            else:
+                band = next(i for i, t in enumerate(thresholds[1:], 1) if value <= t)
+                bands[band] += count
+        return bands
+
+    def summary(self, percentiles: Sequence[int] = (10, 25, 50, 75, 90)) -> Dict[str, Optional[float]]:
+        """Selected percentiles as {"p10": ..., "p50": ...}, rounded to 4 decimals."""
+        return {f"p{p}": (round(v, 4) if (v := self.quantile(p / 100)) is not None else None)
+                for p in percentiles}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "accuracy": self.relative_accuracy,
+            "positive": self.positive,
+            "negative": self.negative,
+            "zero": self.zero,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "DDSketch":
+        if not data:
+            return cls()
+        sketch = cls(data["accuracy"])
+        # JSON object keys are strings
+        sketch.positive = {int(i): c for i, c in data["positive"].items()}
+        sketch.negative = {int(i): c for i, c in data["negative"].items()}
+        sketch.zero = data["zero"]
+        sketch.count = data["count"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+# --- Test Function ---
+
+
+def main_test(days: int = 30, articles_per_day: int = 400):
+    """Check merged per-day sketches against exact quantiles and threshold counts."""
+    rng = random.Random(11)
+    values = []
+    merged = DDSketch()
+    for _ in range(days):
+        day = DDSketch()
+        for _ in range(articles_per_day):
+            # Compound scores: a spike at 0 plus skewed positive/negative mass
+            value = 0.0 if rng.random() < 0.2 else round(max(-1, min(1, rng.gauss(0.15, 0.5))), 4)
+            values.append(value)
+            day.add(value)
+        merged.merge(day)
+
+    values.sort()
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        exact = values[int(q * (len(values) - 1))]
+        approx = merged.quantile(q)
+        logger.info(f"q={q}: exact {exact:.4f}, sketch {approx:.4f}")
+        assert abs(approx - exact) <= SENTIMENT_SKETCH_ACCURACY * abs(exact) + 1e-9, (q, exact, approx)
+
+    for thresholds in ([-0.4, 0.4], [-0.2, 0.2]):
+        exact = [sum(v < thresholds[0] for v in values),
+                 sum(thresholds[0] <= v <= thresholds[1] for v in values),
+                 sum(v > thresholds[1] for v in values)]
+        approx = merged.band_counts(thresholds)
+        logger.info(f"Bands {thresholds}: exact {exact}, sketch {approx}")
+        # Only values within the relative accuracy of a threshold can land in the wrong band
+        near = sum(any(abs(v - t) <= SENTIMENT_SKETCH_ACCURACY * abs(t) for t in thresholds)
+                   for v in values)
+        assert all(abs(a - e) <= near for a, e in zip(approx, exact))
+
+
+if __name__ == "__main__":
+    main_test()
@@ -0,0 +1,63 @@
+import os
+import re
+from typing import Set
+
+# Distinct terms counted per category/day before the rarest are evicted
+TERM_SKETCH_CAPACITY = int(os.getenv("TERM_SKETCH_CAPACITY", "200"))
+# Longest n-gram extracted
+TERM_MAX_NGRAM = int(os.getenv("TERM_MAX_NGRAM", "2"))
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]*(?:['’\-][a-z0-9]+)*")
+# n-grams never cross these
+CLAUSE_PATTERN = re.compile(r"[.,;:!?()\[\]\"“”|/]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+few for from further had has have having he her here hers herself him himself his how
+i if in into is it its itself just me more most my myself no nor not now of off on
+once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves its it's he's she's they're we're i'm don't
+doesn't didn't can't won't isn't aren't wasn't weren't hasn't haven't hadn't
+one two three first last may might must shall us via per amid upon within without
+""".split()) | frozenset("""
+said says say new news year years today yesterday week month time report reports
+reported according people get gets got make makes made take takes took like many much
+back still even well way told tell show shows shown use used including
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens; apostrophes and hyphens inside words are kept."""
+    return TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+def extract_terms(text: str, max_ngram: int = TERM_MAX_NGRAM) -> Set[str]:
+    """
+    Distinct keywords of one article: unigrams and n-grams up to `max_ngram`
+    words. Stopwords, words shorter than three letters and pure numbers are
+    dropped, and n-grams never span a dropped word or punctuation, so "the price
+    of oil" gives {"price", "oil"} but no "price oil". Counting each term once per
+    article makes counts read as "articles mentioning".
+    """
+    terms: Set[str] = set()
+    for clause in CLAUSE_PATTERN.split(text):
+        run: list[str] = []
+        for token in tokenize(clause) + [""]:
+            if len(token) >= 3 and token not in STOPWORDS and not token.isdigit():
+                run.append(token)
+                continue
+            # A dropped word ends the current run of keywords
+            for n in range(1, max_ngram + 1):
+                for i in range(len(run) - n + 1):
+                    terms.add(" ".join(run[i:i + n]))
+            run = []
+    return terms
+
+
+if __name__ == "__main__":
+    print(sorted(extract_terms(
+        "Federal Reserve holds interest rates steady as inflation cools, "
+        "the central bank said on Wednesday.")))
@@ -0,0 +1,158 @@
+import logging
+import os
+import random
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Counters kept per sketch; items ranked well inside this are reported exactly
+SOURCE_SKETCH_CAPACITY = int(os.getenv("SOURCE_SKETCH_CAPACITY", "64"))
+
+# --- Space-Saving Sketch Class ---
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch (Metwally et al.) that also tracks the
+    sentiment sum of each monitored item.
+
+    At most `capacity` items are monitored. When a new item arrives and the sketch
+    is full, the item with the smallest count is replaced and the newcomer inherits
+    that count as its error, so `count - error <= true count <= count`. Any item
+    whose true count exceeds total/capacity is guaranteed to be monitored.
+    Sketches merge by adding counters and keeping the `capacity` largest, which
+    lets per-day sketches combine into any window.
+    """
+
+    def __init__(self, capacity: int = SOURCE_SKETCH_CAPACITY):
+        self.capacity = capacity
+        # item -> [count, error, sentiment_sum]
+        self.counters: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def _min_item(self) -> str:
+        return min(self.counters, key=lambda item: self.counters[item][0])
+
+    def min_count(self) -> int:
+        """Count of the smallest monitored item, or 0 while the sketch has room."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return int(self.counters[self._min_item()][0])
+
+    def update(self, item: str, sentiment_sum: float, weight: int = 1) -> None:
+        """Count `weight` occurrences of item with the given total sentiment."""
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+            counter[2] += sentiment_sum
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0, sentiment_sum]
+            return
+        evicted = self._min_item()
+        floor = self.counters.pop(evicted)[0]
+        # The evicted item's sentiment can't be attributed; the newcomer's average
+        # is taken from its own observations only
+        self.counters[item] = [floor + weight, floor, sentiment_sum]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Merge another sketch into this one and return self."""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        merged: Dict[str, List[float]] = {}
+        for item in self.counters.keys() | other.counters.keys():
+            mine = self.counters.get(item)
+            theirs = other.counters.get(item)
+            count = error = sentiment_sum = 0
+            # An item missing from a full sketch may have been seen up to its floor
+            for counter, floor in ((mine, own_floor), (theirs, other_floor)):
+                if counter is None:
+                    count += floor
+                    error += floor
+                else:
+                    count += counter[0]
+                    error += counter[1]
+                    sentiment_sum += counter[2]
+            merged[item] = [count, error, sentiment_sum]
+        ranked = sorted(merged.items(), key=lambda entry: entry[1][0], reverse=True)
+        self.capacity = max(self.capacity, other.capacity)
+        self.counters = dict(ranked[:self.capacity])
+        return self
+
+    def top(self, k: int = 10, label: str = "source") -> List[Dict[str, Any]]:
+        """
+        The k items with the highest estimated counts, with their average sentiment
+        (over the occurrences observed while monitored) and the count error bound.
+        Each item is reported under the `label` key.
+        """
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        results = []
+        for item, (count, error, sentiment_sum) in ranked[:k]:
+            observed = count - error
+            results.append({
+                label: item,
+                "article_count": int(count),
+                "avg_sentiment": round(sentiment_sum / observed, 4) if observed else 0.0,
+                "error": int(error),
+            })
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "SpaceSaving":
+        sketch = cls(data.get("capacity", SOURCE_SKETCH_CAPACITY) if data else SOURCE_SKETCH_CAPACITY)
+        if data:
+            sketch.counters = {item: list(counter)
+                               for item, counter in data.get("counters", {}).items()}
+        return sketch
+
+# --- Test Function ---
+
+
+def main_test(days: int = 30, articles_per_day: int = 400, sources: int = 500, k: int = 10):
+    """
+    Accuracy check against exact counting: one sketch per day over a Zipf-like
+    source distribution, merged over the whole window, compared with the exact
+    GROUP BY source_id ORDER BY count DESC LIMIT k result.
+    """
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(sources)]
+    names = [f"source_{rank}" for rank in range(sources)]
+    exact_counts: Counter = Counter()
+    exact_sentiment: Counter = Counter()
+    merged = SpaceSaving()
+    for _ in range(days):
+        day = SpaceSaving()
+        for name in rng.choices(names, weights=weights, k=articles_per_day):
+            sentiment = rng.uniform(-1, 1)
+            day.update(name, sentiment)
+            exact_counts[name] += 1
+            exact_sentiment[name] += sentiment
+        merged.merge(day)
+
+    exact_top = [name for name, _ in exact_counts.most_common(k)]
+    approx_top = merged.top(k)
+    recall = len(set(exact_top) & {row["source"] for row in approx_top}) / k
+    max_error = max(abs(row["article_count"] - exact_counts[row["source"]]) / exact_counts[row["source"]]
+                    for row in approx_top)
+    max_sentiment_error = max(abs(row["avg_sentiment"] - exact_sentiment[row["source"]] / exact_counts[row["source"]])
+                              for row in approx_top)
+    logger.info(f"Top-{k} recall: {recall:.2f}, max relative count error: {max_error:.4f}, "
+                f"max avg sentiment error: {max_sentiment_error:.4f}")
+    assert recall >= 0.9, f"Top-{k} recall too low: {recall}"
+    assert max_error <= 0.1, f"Count error too high: {max_error}"
+    for row in approx_top:
+        exact = exact_counts[row["source"]]
+        assert row["article_count"] - row["error"] <= exact <= row["article_count"], \
+            f"Error bound violated for {row['source']}: {row} vs exact {exact}"
+
+
+if __name__ == "__main__":
+    main_test()
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Export Configuration ---
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+ARTICLE_EXPORT_DIR = Path(os.getenv("ARTICLE_EXPORT_DIR", str(BASE_DIR / "exports" / "articles")))
+# Days of the retention window that are exported when their partition is missing
+EXPORT_WINDOW_DAYS = int(os.getenv("EXPORT_WINDOW_DAYS", "30"))
+# Recent partitions are rewritten every run: late articles and re-scores still change them
+EXPORT_REFRESH_DAYS = int(os.getenv("EXPORT_REFRESH_DAYS", "2"))
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+# Every country of the article (the article_countries bridge), sorted
+_COUNTRIES = pa.list_(pa.string())
+# Low-cardinality text columns are dictionary-encoded: each value is stored once
+# per file and rows hold small integer codes
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("source_id", _DICTIONARY),
+    ("category", _DICTIONARY),
+    ("country", _COUNTRIES),
+    ("pubDate", pa.timestamp("us")),
+    ("sentiment", pa.float64()),
+    ("link", pa.string()),
+    ("cluster_id", pa.string()),
+    ("is_duplicate", pa.bool_()),
+    ("model_version", _DICTIONARY),
+])
+
+# --- Writing ---
+
+
+def partition_path(day: date, directory: Path = ARTICLE_EXPORT_DIR) -> Path:
+    return directory / f"articles-{day.isoformat()}.arrow"
+
+
+def write_partition(path: Path, columns: Dict[str, list]) -> int:
+    """
+    Write one day's articles as an Arrow IPC file. The file is written next to its
+    final path and renamed, so readers never see a partial partition.
+    Returns the number of rows written.
+    """
+    table = pa.table({field.name: pa.array(columns[field.name], type=field.type) for field in SCHEMA},
+                     schema=SCHEMA)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+
+async def export_day(day: date, directory: Path = ARTICLE_EXPORT_DIR) -> int:
+    """Export the articles published on `day` (UTC) to its partition. Returns the row count."""
+    # Imported here so reading partitions doesn't need the database settings
+    from sqlalchemy import func
+    from sqlalchemy.future import select
+    from app.db_logic.models import NewsArticle, ArticleCountry, Country
+    from app.db_logic.streaming import stream_partitions
+
+    start = datetime.combine(day, time.min)
+    columns: Dict[str, list] = {field.name: [] for field in SCHEMA}
+    countries = (
+        select(func.array_agg(Country.name))
+        .select_from(ArticleCountry)
+        .join(Country, Country.id == ArticleCountry.country_id)
+        .where(ArticleCountry.article_id == NewsArticle.id)
+        .scalar_subquery()
+        .label("country")
+    )
+    stmt = (
+        select(*(countries if name == "country" else getattr(NewsArticle, name)
+                 for name in SCHEMA.names))
+        .where(NewsArticle.pubDate >= start)
+        .where(NewsArticle.pubDate < start + timedelta(days=1))
+        .order_by(NewsArticle.pubDate, NewsArticle.id)
+    )
+    # One day is small; only the partition being written is held in memory
+    async for rows in stream_partitions(stmt):
+        for row in rows:
+            for name, value in zip(SCHEMA.names, row):
+                columns[name].append(sorted(value or []) if name == "country" else value)
+    return await asyncio.to_thread(write_partition, partition_path(day, directory), columns)
+
+
+async def export_articles(directory: Path = ARTICLE_EXPORT_DIR) -> int:
+    """
+    Export job: write the partitions of the last EXPORT_REFRESH_DAYS days (today
+    included, so partially) and any missing ones of the retention window. Older
+    partitions are left as they are, so the archive outlives the table's 30 days.
+    Returns the number of partitions written.
+    """
+    today = datetime.utcnow().date()
+    written = 0
+    # The oldest day of the window is already partly deleted by retention; see export_days
+    for offset in range(EXPORT_WINDOW_DAYS):
+        day = today - timedelta(days=offset)
+        if offset >= EXPORT_REFRESH_DAYS and partition_path(day, directory).exists():
+            continue
+        count = await export_day(day, directory)
+        written += 1
+        logger.info(f"Exported {count} articles for {day}")
+    logger.info(f"Wrote {written} article partitions to {directory}")
+    return written
+
+
+async def export_days(days: Iterable[date], directory: Path = ARTICLE_EXPORT_DIR) -> int:
+    """
+    Rewrite the partitions of `days`, e.g. after re-scoring changed their articles.
+    Days at the edge of the retention window or older are skipped: retention may
+    already have deleted some of their rows, and the partition is then the only copy.
+    Returns the number of partitions written.
+    """
+    oldest = datetime.utcnow().date() - timedelta(days=EXPORT_WINDOW_DAYS - 1)
+    written = 0
+    for day in sorted(set(days)):
+        if day < oldest:
+            continue
+        count = await export_day(day, directory)
+        written += 1
+        logger.info(f"Re-exported {count} articles for {day}")
+    return written
+
+# --- Reading ---
+
+
+def partition_days(directory: Path = ARTICLE_EXPORT_DIR) -> List[date]:
+    """Days with an exported partition, oldest first."""
+    return sorted(date.fromisoformat(path.stem.removeprefix("articles-"))
+                  for path in directory.glob("articles-*.arrow"))
+
+
+def read_articles(start: Optional[date] = None, end: Optional[date] = None,
+                  columns: Optional[Sequence[str]] = None,
+                  directory: Path = ARTICLE_EXPORT_DIR) -> pa.Table:
+    """
+    Articles of the partitions from `start` to `end` (inclusive) as one Arrow table.
+
+    Partitions are memory-mapped, so the table's buffers are the files' pages:
+    nothing is copied or decoded up front and the OS page cache is shared between
+    analysis processes. Dictionary-encoded columns keep their encoding, one
+    dictionary per partition.
+    """
+    tables = []
+    for day in partition_days(directory):
+        if (start and day < start) or (end and day > end):
+            continue
+        source = pa.memory_map(str(partition_path(day, directory)), "r")
+        table = pa.ipc.open_file(source).read_all()
+        tables.append(table.select(list(columns)) if columns else table)
+    if not tables:
+        schema = pa.schema([SCHEMA.field(name) for name in columns]) if columns else SCHEMA
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def sentiment_by(column: str, start: Optional[date] = None, end: Optional[date] = None,
+                 directory: Path = ARTICLE_EXPORT_DIR, count_clusters_once: bool = False) -> pa.Table:
+    """
+    Article count and average sentiment per value of `column` (e.g. "source_id",
+    "country", "category"), most articles first, computed off the database. An
+    article counts once for each of its countries.
+    """
+    table = read_articles(start, end, [column, "sentiment", "is_duplicate"], directory)
+    if count_clusters_once:
+        table = table.filter(pc.invert(table["is_duplicate"]))
+    if pa.types.is_list(table.schema.field(column).type):
+        # One row per (article, value)
+        table = table.combine_chunks()
+        values = table[column].chunk(0) if table.num_rows else pa.array([], type=table.schema.field(column).type)
+        table = pa.table({column: pc.list_flatten(values),
+                          "sentiment": pc.take(table["sentiment"], pc.list_parent_indices(values))})
+    # Grouping needs one dictionary across partitions
+    table = table.unify_dictionaries()
+    grouped = table.group_by(column).aggregate([("sentiment", "count"), ("sentiment", "mean")])
+    return grouped.rename_columns([column, "article_count", "avg_sentiment"]).sort_by(
+        [("article_count", "descending")])
+
+# --- Test Function ---
+
+
+def main_test():
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for offset, sources in enumerate((["bbc", "cnn", "bbc"], ["cnn", "reuters"])):
+            day = date(2026, 10, 1) + timedelta(days=offset)
+            n = len(sources)
+            write_partition(partition_path(day, directory), {
+                "id": list(range(offset * 10, offset * 10 + n)),
+                "title": [f"Title {i}" for i in range(n)],
+                "source_id": sources,
+                "category": ["World"] * n,
+                "country": [["united states"], ["nigeria", "united states"], []][:n],
+                "pubDate": [datetime.combine(day, time(12))] * n,
+                "sentiment": [0.5, -0.5, 0.1][:n],
+                "link": [None] * n,
+                "cluster_id": [None] * n,
+                "is_duplicate": [False] * n,
+                "model_version": ["vader-3.3.2"] * n,
+            })
+        table = read_articles(directory=directory)
+        assert table.num_rows == 5 and table.schema.field("source_id").type == _DICTIONARY
+        by_source = sentiment_by("source_id", directory=directory).to_pylist()
+        logger.info(f"Sentiment by source: {by_source}")
+        assert by_source[0]["source_id"] in ("bbc", "cnn") and by_source[0]["article_count"] == 2
+        assert read_articles(start=date(2026, 10, 2), directory=directory).num_rows == 2
+        by_country = {row["country"]: row["article_count"]
+                      for row in sentiment_by("country", directory=directory).to_pylist()}
+        assert by_country == {"united states": 4, "nigeria": 2}, by_country
+
+
+if __name__ == "__main__":
+    main_test()
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Hashable, Optional
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Single-Flight Class ---
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one in-flight task.
+
+    The first caller starts the task; callers arriving while it runs await the same
+    task instead of starting their own. Each caller awaits through asyncio.shield,
+    so a caller timing out does not cancel the shared work for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.metrics = {"calls": 0, "shared": 0}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) once per key at a time and share its result."""
+        self.metrics["calls"] += 1
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.metrics["shared"] += 1
+            logger.info(f"Joining in-flight call for {key!r}")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+# --- Background Event Loop ---
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop running in a daemon thread, starting it if needed."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever,
+                             name="async-bridge", daemon=True).start()
+    return _loop
+
+
+def run_coroutine(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the shared background loop from synchronous code (e.g. a
+    Dash callback) and wait for its result. All callers share one loop, so async
+    state such as SingleFlight is shared across callback threads.
+
+    Raises:
+        concurrent.futures.TimeoutError: If the result is not ready within `timeout`.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
@@ -0,0 +1,100 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func
+from datetime import datetime, timedelta
+from app.db_logic.db import read_session
+from app.db_logic.models import SentimentRollup
+import asyncio
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Supported resolutions, finest first
+BUCKET_SIZES = {
+    "hour": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "day": timedelta(days=1),
+}
+# Most points a line graph should show; picks the finest bucket that stays under it
+LINE_GRAPH_MAX_POINTS = int(os.getenv("LINE_GRAPH_MAX_POINTS", "60"))
+# Buckets are aligned to midnight UTC
+BUCKET_ORIGIN = datetime(2000, 1, 1)
+
+
+def choose_bucket(window: timedelta, max_points: int = LINE_GRAPH_MAX_POINTS) -> str:
+    """
+    Pick the finest bucket size giving at most `max_points` buckets over `window`.
+    E.g. a day → "hour", a week → "6h", a month → "day".
+    """
+    for name, size in BUCKET_SIZES.items():
+        if window / size <= max_points:
+            return name
+    return "day"
+
+
+async def get_bucketed_avg_sentiment(start: datetime, end: datetime, category: str | None = None,
+                                     bucket: str | None = None,
+                                     session: AsyncSession | None = None) -> dict:
+    """
+    Average sentiment per time bucket over [start, end), read from the hourly
+    rollups so the cost depends on the number of hours, not the number of articles.
+
+    Args:
+        start (datetime): Window start (naive UTC).
+        end (datetime): Window end (naive UTC), exclusive.
+        category (str | None): Optional category filter (e.g., 'Business', 'Sports').
+        bucket (str | None): "hour", "6h" or "day"; chosen from the window if None.
+        session (AsyncSession | None): Session to reuse; a read session is opened if None.
+
+    Returns:
+        dict: {"bucket": str, "series": {"YYYY-MM-DD HH:MM:SS": float}} with bucket start times as keys.
+    """
+    bucket = bucket or choose_bucket(end - start)
+    if bucket not in BUCKET_SIZES:
+        raise ValueError(f"Unknown bucket size '{bucket}'")
+    logger.info(
+        f"Fetching {bucket} avg sentiment from {start} to {end}, category: {category}")
+
+    try:
+        async with read_session(session) as session:
+            bucket_start = func.date_bin(
+                BUCKET_SIZES[bucket], SentimentRollup.bucket_start, BUCKET_ORIGIN).label("bucket_start")
+            stmt = (
+                select(
+                    bucket_start,
+                    (func.sum(SentimentRollup.sentiment_sum) /
+                     func.sum(SentimentRollup.article_count)).label("avg_sentiment")
+                )
+                .where(SentimentRollup.bucket_start >= start.replace(minute=0, second=0, microsecond=0))
+                .where(SentimentRollup.bucket_start < end)
+            )
+
+            if category:
+                stmt = stmt.where(SentimentRollup.category == category)
+
+            stmt = stmt.group_by(bucket_start).order_by(bucket_start)
+
+            result = await session.execute(stmt)
+            rows = result.all()
+
+            logger.info(f"Retrieved {len(rows)} {bucket} sentiment buckets")
+
+            return {
+                "bucket": bucket,
+                "series": {row.bucket_start.strftime("%Y-%m-%d %H:%M:%S"): float(row.avg_sentiment)
+                           for row in rows},
+            }
+    except Exception as e:
+        logger.error(f"Error fetching bucketed avg sentiment: {str(e)}")
+        return {"bucket": bucket, "series": {}}
+
+if __name__ == "__main__":
+    async def test():
+        now = datetime.utcnow()
+        for days in (1, 7, 30):
+            data = await get_bucketed_avg_sentiment(now - timedelta(days=days), now)
+            print(days, data["bucket"], len(data["series"]))
+    asyncio.run(test())
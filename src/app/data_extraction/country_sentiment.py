@@ -0,0 +1,158 @@
+from sqlalchemy import func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.db_logic.db import read_session
+from app.db_logic.models import NewsArticle, ArticleCountry, Country, Source, counted_articles
+from app.db_logic.dimensions import dimension_cache
+from app.db_logic.streaming import stream_partitions
+from app.data_extraction.bucketing import BUCKET_SIZES, BUCKET_ORIGIN, choose_bucket
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Same thresholds as the pie chart query
+POSITIVE_THRESHOLD = 0.4
+NEGATIVE_THRESHOLD = -0.4
+TOP_SOURCES = 10
+
+
+def _rebin(bucket_start: datetime, size: timedelta) -> datetime:
+    """Start of the coarser `size` bucket containing a finer bucket's start."""
+    return BUCKET_ORIGIN + ((bucket_start - BUCKET_ORIGIN) // size) * size
+
+
+class _Snapshot:
+    """Running sums of one (country, snapshot) cell, folded from grouped rows."""
+
+    def __init__(self):
+        self.series: Dict[datetime, List[float]] = {}
+        self.pie = {"good": 0, "okay": 0, "bad": 0}
+        self.sources: Dict[int | None, List[float]] = {}
+
+    def add(self, bucket_start: datetime, source_key: int | None, count: int, sentiment_sum: float,
+            good: int, okay: int, bad: int) -> None:
+        point = self.series.setdefault(bucket_start, [0, 0.0])
+        point[0] += count
+        point[1] += sentiment_sum
+        source = self.sources.setdefault(source_key, [0, 0.0])
+        source[0] += count
+        source[1] += sentiment_sum
+        self.pie["good"] += good
+        self.pie["okay"] += okay
+        self.pie["bad"] += bad
+
+    def to_dict(self, bucket: str, source_names: Dict[int, str]) -> dict:
+        top = sorted(self.sources.items(), key=lambda item: item[1][0], reverse=True)[:TOP_SOURCES]
+        return {
+            "line_graph": {start.strftime("%Y-%m-%d %H:%M:%S"): total / count
+                           for start, (count, total) in sorted(self.series.items()) if count},
+            "bucket": bucket,
+            "pie_chart": dict(self.pie),
+            "top_sources": [
+                {
+                    "source": source_names.get(key, "Unknown"),
+                    "article_count": int(count),
+                    "avg_sentiment": round(total / count, 4) if count else 0.0
+                }
+                for key, (count, total) in top
+            ],
+            # Sketches are kept per category only
+            "sentiment_quantiles": {},
+            "top_terms": [],
+            "article_count": sum(count for count, _ in self.series.values()),
+        }
+
+
+async def get_country_snapshots(snapshots: List[Tuple[str, int, str | None]],
+                                now: Optional[datetime] = None,
+                                session: Optional[AsyncSession] = None) -> Optional[Dict[str, Dict[str, dict]]]:
+    """
+    Dashboard snapshots of every country with articles, for each of `snapshots`
+    ((label, days, category) as in app.scheduled.store_in_redis.SNAPSHOTS).
+
+    One grouped scan over the longest window covers the whole country × category ×
+    period matrix: rows are grouped by country, category, source, the finest line
+    graph bucket and the shortest period containing the article, then folded into
+    each snapshot in Python. Adding countries or snapshots adds no queries.
+    `session` is reused if given, otherwise a read session is opened.
+
+    Returns:
+        dict | None: {country name: {label: snapshot}}, snapshots shaped like the
+            global ones (line_graph, bucket, pie_chart, top_sources, ...), or None
+            if the scan failed, so callers can tell "no articles" from "unknown".
+    """
+    if not snapshots:
+        return {}
+    now = now or datetime.utcnow()
+    periods = sorted({days for _, days, _ in snapshots})
+    buckets = {days: choose_bucket(timedelta(days=days)) for days in periods}
+    finest = min(buckets.values(), key=lambda name: BUCKET_SIZES[name])
+    cutoffs = {days: now - timedelta(days=days) for days in periods}
+    logger.info(f"Fetching per-country sentiment for periods {periods} at {finest} resolution")
+
+    bucket_start = func.date_bin(
+        BUCKET_SIZES[finest], NewsArticle.pubDate, BUCKET_ORIGIN).label("bucket_start")
+    # Shortest period whose window contains the article, so windows stay exact
+    # even though buckets straddle their start
+    window = case(*((NewsArticle.pubDate >= cutoffs[days], days) for days in periods)).label("window")
+    stmt = (
+        select(
+            Country.name.label("country"),
+            NewsArticle.category,
+            NewsArticle.source_key,
+            bucket_start,
+            window,
+            func.count(NewsArticle.id).label("article_count"),
+            func.coalesce(func.sum(NewsArticle.sentiment), 0.0).label("sentiment_sum"),
+            func.sum(case((NewsArticle.sentiment > POSITIVE_THRESHOLD, 1), else_=0)).label("good"),
+            func.sum(case((NewsArticle.sentiment < NEGATIVE_THRESHOLD, 1), else_=0)).label("bad"),
+            func.sum(case(((NewsArticle.sentiment >= NEGATIVE_THRESHOLD) &
+                           (NewsArticle.sentiment <= POSITIVE_THRESHOLD), 1), else_=0)).label("okay"),
+        )
+        .select_from(NewsArticle)
+        .join(ArticleCountry, ArticleCountry.article_id == NewsArticle.id)
+        .join(Country, Country.id == ArticleCountry.country_id)
+        .where(NewsArticle.pubDate >= cutoffs[periods[-1]])
+        .where(NewsArticle.pubDate <= now)
+        .where(counted_articles())
+        .group_by(Country.name, NewsArticle.category, NewsArticle.source_key, bucket_start, window)
+    )
+
+    cells: Dict[Tuple[str, str], _Snapshot] = {}
+    try:
+        async with read_session(session) as session:
+            source_names = await dimension_cache.names(session, Source)
+            rows = 0
+            async for partition in stream_partitions(stmt, session=session):
+                rows += len(partition)
+                for row in partition:
+                    for label, days, category in snapshots:
+                        if row.window > days or (category and row.category != category):
+                            continue
+                        cells.setdefault((row.country, label), _Snapshot()).add(
+                            _rebin(row.bucket_start, BUCKET_SIZES[buckets[days]]), row.source_key,
+                            row.article_count, float(row.sentiment_sum),
+                            row.good or 0, row.okay or 0, row.bad or 0)
+    except Exception as e:
+        logger.error(f"Error fetching per-country sentiment: {str(e)}")
+        return None
+
+    result: Dict[str, Dict[str, dict]] = {}
+    for (country, label), cell in cells.items():
+        days = next(days for snapshot, days, _ in snapshots if snapshot == label)
+        result.setdefault(country, {})[label] = cell.to_dict(buckets[days], source_names)
+    logger.info(f"Built {len(cells)} country snapshots for {len(result)} countries from {rows} grouped rows")
+    return result
+
+if __name__ == "__main__":
+    async def test():
+        data = await get_country_snapshots([("weekly_summary", 7, None), ("monthly_business", 30, "Business")])
+        for country, snapshots in sorted((data or {}).items()):
+            print(country, {label: snapshot["article_count"] for label, snapshot in snapshots.items()})
+    asyncio.run(test())
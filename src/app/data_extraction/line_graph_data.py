@@ -1,9 +1,6 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import func
 from datetime import datetime, timedelta
-from app.db_logic.db import engine
-from app.db_logic.models import NewsArticle
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.data_extraction.bucketing import get_bucketed_avg_sentiment
 import asyncio
 import logging
 
@@ -17,6 +14,7 @@ async def get_daily_avg_sentiment(days: int = 30, category: str | None = None) -
     Returns a dict mapping date (YYYY-MM-DD) → average sentiment over the last specified days.
     If `category` is provided, only articles in that category are considered.
     Supports days=30 (last 30 days) and days=7 (last 7 days).
+    Read from the hourly rollups rather than news_articles.
 
     Args:
         days (int): Number of days to look back (e.g., 7 for last week, 30 for last month).
@@ -25,39 +23,24 @@ async def get_daily_avg_sentiment(days: int = 30, category: str | None = None) -
     Returns:
         dict[str, float]: Dictionary mapping dates (YYYY-MM-DD HH:MM:SS) to average sentiment scores.
     """
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    logger.info(
-        f"Fetching daily avg sentiment for last {days} days, category: {category}, cutoff: {cutoff}")
-
-    try:
-        async with AsyncSession(engine) as session:
-            # Define the date_trunc expression once for reuse
-            day_trunc = func.date_trunc(
-                'day', NewsArticle.pubDate).label("day")
-            stmt = (
-                select(
-                    day_trunc,
-                    func.avg(NewsArticle.sentiment).label("avg_sentiment")
-                )
-                .where(NewsArticle.pubDate >= cutoff)
-                .where(NewsArticle.pubDate <= datetime.utcnow())
-            )
-
-            if category:
-                stmt = stmt.where(NewsArticle.category == category)
+    now = datetime.utcnow()
+    data = await get_bucketed_avg_sentiment(
+        now - timedelta(days=days), now, category=category, bucket="day")
+    return data["series"]
 
-            stmt = stmt.group_by(day_trunc).order_by(day_trunc)
 
-            result = await session.execute(stmt)
-            rows = result.all()
+async def get_avg_sentiment_series(days: int = 30, category: str | None = None,
+                                   session: AsyncSession | None = None) -> dict:
+    """
+    Average sentiment over the last `days` days at a resolution picked from the
+    window: hourly for a day, 6-hourly for a week, daily for a month.
 
-            logger.info(f"Retrieved {len(rows)} daily sentiment records")
+    Returns:
+        dict: {"bucket": "hour" | "6h" | "day", "series": {"YYYY-MM-DD HH:MM:SS": float}}.
+    """
+    now = datetime.utcnow()
+    return await get_bucketed_avg_sentiment(now - timedelta(days=days), now, category=category, session=session)
 
-            # Build a date → average map
-            return {row.day.strftime("%Y-%m-%d 00:00:00"): float(row.avg_sentiment) for row in rows}
-    except Exception as e:
-        logger.error(f"Error fetching daily avg sentiment: {str(e)}")
-        return {}
 
 if __name__ == "__main__":
     # Overall last-month sentiment
@@ -5,15 +5,16 @@ from datetime import datetime, timedelta
 import asyncio
 import logging
 
-from app.db_logic.db import engine
-from app.db_logic.models import NewsArticle
+from app.db_logic.db import read_session
+from app.db_logic.models import NewsArticle, counted_articles
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-async def get_sentiment_pie_data(days: int = 30, category: str | None = None) -> dict:
+async def get_sentiment_pie_data(days: int = 30, category: str | None = None,
+                                 session: AsyncSession | None = None) -> dict:
     """
     Returns a dictionary with sentiment class counts over the past `days`,
     optionally filtered by category.
@@ -26,6 +27,7 @@ async def get_sentiment_pie_data(days: int = 30, category: str | None = None) ->
     Args:
         days (int): Number of days to look back (e.g., 7 for last week, 30 for last month).
         category (str | None): Optional category filter (e.g., 'business', 'sports').
+        session (AsyncSession | None): Session to reuse; a read session is opened if None.
 
     Returns:
         dict: {"good": int, "okay": int, "bad": int} with counts of articles in each sentiment category.
@@ -35,7 +37,7 @@ async def get_sentiment_pie_data(days: int = 30, category: str | None = None) ->
         f"Fetching pie chart data for last {days} days, category: {category}, cutoff: {cutoff}")
 
     try:
-        async with AsyncSession(engine) as session:
+        async with read_session(session) as session:
             stmt = (
                 select(
                     func.sum(case((NewsArticle.sentiment > 0.4, 1), else_=0)).label(
@@ -50,6 +52,7 @@ async def get_sentiment_pie_data(days: int = 30, category: str | None = None) ->
                 )
                 .where(NewsArticle.pubDate >= cutoff)
                 .where(NewsArticle.pubDate <= datetime.utcnow())
+                .where(counted_articles())
             )
 
             if category:
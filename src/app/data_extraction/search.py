@@ -0,0 +1,137 @@
+from sqlalchemy import String, and_, bindparam, case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from datetime import datetime, timedelta
+from app.db_logic.db import engine, read_session
+from app.db_logic.models import NewsArticle, SEARCH_CONFIG, article_search_vector, counted_articles, decompress_text
+from app.db_logic.streaming import stream_partitions
+from app.data_extraction.bucketing import BUCKET_ORIGIN, BUCKET_SIZES, choose_bucket
+import asyncio
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# How far back local searches look (the retention window)
+SEARCH_WINDOW_DAYS = int(os.getenv("SEARCH_WINDOW_DAYS", "30"))
+# Matching articles needed to answer a custom search locally instead of calling the API
+LOCAL_SEARCH_MIN_RESULTS = int(os.getenv("LOCAL_SEARCH_MIN_RESULTS", "5"))
+SEARCH_RESULT_LIMIT = 10
+# Same split as the custom search pie chart
+POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD = 0.2, -0.2
+
+
+async def search_articles(query: str, days: int = SEARCH_WINDOW_DAYS, bucket: str | None = None,
+                          limit: int = SEARCH_RESULT_LIMIT) -> dict:
+    """
+    Full-text search of stored articles through the GIN index on search_vector.
+    The query uses web search syntax ("quoted phrases", or, -excluded).
+
+    Args:
+        query (str): Search query.
+        days (int): Look back this many days.
+        bucket (str | None): "hour", "6h" or "day"; chosen from the window if None.
+        limit (int): Most ranked articles returned.
+
+    Returns:
+        dict: {
+            "total": matching articles,
+            "bucket": bucket size,
+            "series": [{"bucket_start": "YYYY-MM-DD HH:MM:SS", "avg_sentiment": float, "count": int}],
+            "pie": [positive, neutral, negative],
+            "articles": [{"title", "link", "source_id", "pubDate", "sentiment", "rank"}] best first,
+        }
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    bucket = bucket or choose_bucket(end - start)
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    match = and_(
+        NewsArticle.search_vector.op("@@")(tsquery),
+        NewsArticle.pubDate >= start,
+        NewsArticle.pubDate <= end,
+        counted_articles(),
+    )
+    rank = func.ts_rank_cd(NewsArticle.search_vector, tsquery).label("rank")
+    bucket_start = func.date_bin(BUCKET_SIZES[bucket], NewsArticle.pubDate, BUCKET_ORIGIN).label("bucket_start")
+
+    async with read_session() as session:
+        result = await session.execute(
+            select(NewsArticle.title, NewsArticle.link, NewsArticle.source_id,
+                   NewsArticle.pubDate, NewsArticle.sentiment, rank)
+            .where(match)
+            .order_by(rank.desc(), NewsArticle.pubDate.desc())
+            .limit(limit)
+        )
+        articles = result.all()
+        result = await session.execute(
+            select(
+                bucket_start,
+                func.avg(NewsArticle.sentiment).label("avg_sentiment"),
+                func.count(NewsArticle.id).label("count"),
+                func.sum(case((NewsArticle.sentiment > POSITIVE_THRESHOLD, 1), else_=0)).label("positive"),
+                func.sum(case((NewsArticle.sentiment < NEGATIVE_THRESHOLD, 1), else_=0)).label("negative"),
+            )
+            .where(match)
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+        rows = result.all()
+
+    total = sum(row.count for row in rows)
+    positive = sum(int(row.positive) for row in rows)
+    negative = sum(int(row.negative) for row in rows)
+    logger.info(f"Local search for '{query}': {total} articles in {len(rows)} {bucket} buckets")
+    return {
+        "total": total,
+        "bucket": bucket,
+        "series": [{"bucket_start": row.bucket_start.strftime("%Y-%m-%d %H:%M:%S"),
+                    "avg_sentiment": round(float(row.avg_sentiment), 4),
+                    "count": row.count} for row in rows],
+        "pie": [positive, total - positive - negative, negative],
+        "articles": [{"title": row.title, "link": row.link, "source_id": row.source_id,
+                      "pubDate": row.pubDate.strftime("%Y-%m-%d %H:%M:%S"),
+                      "sentiment": row.sentiment, "rank": round(float(row.rank), 4)}
+                     for row in articles],
+    }
+
+
+async def backfill_search_vectors() -> int:
+    """
+    Index articles stored before the search column existed, weighted like inserts:
+    title (A) and, where it was kept, the description (B), which is only stored
+    compressed and so is decompressed here. Returns rows updated.
+    """
+    table = NewsArticle.__table__
+    write = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(search_vector=article_search_vector(
+            bindparam("b_title", type_=String), bindparam("b_description", type_=String)))
+    )
+    updated = 0
+    # Writes go through their own session; the cursor's transaction stays read-only
+    async with AsyncSession(engine) as write_session:
+        async for rows in stream_partitions(
+            select(NewsArticle.id, NewsArticle.title, NewsArticle.description_compressed)
+            .where(NewsArticle.search_vector.is_(None))
+        ):
+            await write_session.execute(write, [
+                {"b_id": row.id, "b_title": row.title,
+                 "b_description": decompress_text(row.description_compressed)}
+                for row in rows])
+            await write_session.commit()
+            updated += len(rows)
+    if updated:
+        logger.info(f"Indexed {updated} articles for full-text search")
+    return updated
+
+if __name__ == "__main__":
+    async def test():
+        data = await search_articles("interest rates")
+        print(data["total"], data["bucket"], data["pie"])
+        for article in data["articles"]:
+            print(article["rank"], article["title"])
+    asyncio.run(test())
@@ -1,15 +1,8 @@
-import feedparser
+import httpx
+from app.feed_fetcher import FeedFetcher
 
 
-async def get_news_headlines(sector=None | str):
-    link = "https://news.google.com/rss?hl=en-US&gl=NG&ceid=US:en"
-    if sector:
-        sector = sector.lower()
-        # if sector not in ["business", "world", "sports", "sci/tech"]:
-        #     return []
-        link = f"https://news.google.com/rss/search?q={sector}&hl=en-US&gl=US&ceid=US:en"
-
-    feed = feedparser.parse(link)
+def _extract_headlines(feed, url):
     top_headlines = []
 
     for entry in feed.entries[:10]:  # Get top 5
@@ -24,10 +17,28 @@ async def get_news_headlines(sector=None | str):
     return top_headlines
 
 
+# Conditional GET: unchanged feeds (304) reuse the previously parsed headlines
+feed_fetcher = FeedFetcher(_extract_headlines)
+
+
+async def get_news_headlines(sector=None | str):
+    link = "https://news.google.com/rss?hl=en-US&gl=NG&ceid=US:en"
+    if sector:
+        sector = sector.lower()
+        # if sector not in ["business", "world", "sports", "sci/tech"]:
+        #     return []
+        link = f"https://news.google.com/rss/search?q={sector}&hl=en-US&gl=US&ceid=US:en"
+
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
+        return await feed_fetcher.afetch(client, link)
+
+
 if __name__ == "__main__":
     import asyncio
 
     async def func():
         x = await get_news_headlines("Sports")
         print(x)
+        x = await get_news_headlines("Sports")
+        print(feed_fetcher.get_metrics())
     asyncio.run(func())
@@ -5,15 +5,16 @@ from datetime import datetime, timedelta
 import asyncio
 import logging
 
-from app.db_logic.db import engine
-from app.db_logic.models import NewsArticle
+from app.db_logic.db import read_session
+from app.db_logic.models import NewsArticle, Source, counted_articles
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-async def get_top_sources_with_avg_sentiment(days: int = 30, category: str | None = None) -> list[dict]:
+async def get_top_sources_with_avg_sentiment(days: int = 30, category: str | None = None,
+                                             session: AsyncSession | None = None) -> list[dict]:
     """
     Returns the top 10 sources by article count over the past `days`,
     along with their average sentiment scores, optionally filtered by `category`.
@@ -21,6 +22,7 @@ async def get_top_sources_with_avg_sentiment(days: int = 30, category: str | Non
     Args:
         days (int): Number of days to look back (e.g., 7 for last week, 30 for last month).
         category (str | None): Optional category filter (e.g., 'business', 'sports').
+        session (AsyncSession | None): Session to reuse; a read session is opened if None.
 
     Returns:
         list[dict]: List of dictionaries with keys:
@@ -33,23 +35,30 @@ async def get_top_sources_with_avg_sentiment(days: int = 30, category: str | Non
         f"Fetching top sources for last {days} days, category: {category}, cutoff: {cutoff}")
 
     try:
-        async with AsyncSession(engine) as session:
+        async with read_session(session) as session:
+            # Group by the integer source key, then label the ten winners
             stmt = (
                 select(
-                    NewsArticle.source_id,
+                    NewsArticle.source_key,
                     func.count(NewsArticle.id).label("article_count"),
                     func.avg(NewsArticle.sentiment).label("avg_sentiment")
                 )
                 .where(NewsArticle.pubDate >= cutoff)
                 .where(NewsArticle.pubDate <= datetime.utcnow())
+                .where(counted_articles())
             )
 
             if category:
                 stmt = stmt.where(NewsArticle.category == category)
 
-            stmt = stmt.group_by(NewsArticle.source_id) \
-                       .order_by(func.count(NewsArticle.id).desc()) \
-                       .limit(10)
+            top = stmt.group_by(NewsArticle.source_key) \
+                      .order_by(func.count(NewsArticle.id).desc()) \
+                      .limit(10) \
+                      .subquery()
+            stmt = select(Source.name, top.c.article_count, top.c.avg_sentiment) \
+                .select_from(top) \
+                .outerjoin(Source, Source.id == top.c.source_key) \
+                .order_by(top.c.article_count.desc())
 
             result = await session.execute(stmt)
             top_sources = result.all()
@@ -1,26 +1,152 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base
 # import asyncio
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from app.db_logic.pool_metrics import pool_metrics
+import asyncio
+import logging
 import os
+import time
 
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Pool sizing; see the db:pool_metrics Redis hash (app.db_logic.pool_metrics) for
+# checkout waits and saturation before changing these
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "5"))
+DATABASE_POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+# Connections older than this are replaced on checkout (-1 keeps them)
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "-1"))
+DATABASE_CONNECT_TIMEOUT = int(os.getenv("DATABASE_CONNECT_TIMEOUT", "10"))
 # print(DATABASE_URL)
 # Create an asynchronous engine
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,  # Set to True for verbose SQL logging (useful for debugging)
-    pool_size=10,  # Number of connections to keep in the pool
-    max_overflow=5,  # Number of connections that can be opened beyond pool_size
-    pool_timeout=30,  # seconds to wait for a connection from the pool
+    pool_size=DATABASE_POOL_SIZE,  # Number of connections to keep in the pool
+    max_overflow=DATABASE_MAX_OVERFLOW,  # Number of connections that can be opened beyond pool_size
+    pool_timeout=DATABASE_POOL_TIMEOUT,  # seconds to wait for a connection from the pool
+    pool_recycle=DATABASE_POOL_RECYCLE,
     connect_args={
-        "timeout": 10  # Connection timeout for asyncpg (in seconds)
+        "timeout": DATABASE_CONNECT_TIMEOUT  # Connection timeout for asyncpg (in seconds)
     }
 )
+pool_metrics.instrument(engine, "primary", DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW)
+
+# --- Read Replica ---
+# Optional read-only server for the dashboard aggregation queries (app.data_extraction),
+# so they don't contend with ingestion and retention writes on the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+DATABASE_READ_POOL_SIZE = int(os.getenv("DATABASE_READ_POOL_SIZE", "5"))
+DATABASE_READ_MAX_OVERFLOW = int(os.getenv("DATABASE_READ_MAX_OVERFLOW", "5"))
+DATABASE_READ_POOL_TIMEOUT = int(os.getenv("DATABASE_READ_POOL_TIMEOUT", "10"))
+# After failing to connect to the replica, reads go to the primary for this long
+READ_REPLICA_RETRY_SECONDS = int(os.getenv("READ_REPLICA_RETRY_SECONDS", "60"))
+# How long a read that must see earlier writes waits for the replica to replay them
+# before it goes to the primary instead
+READ_REPLICA_MAX_LAG_SECONDS = float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "5"))
+READ_REPLICA_LAG_POLL_SECONDS = 0.1
+# Errors meaning the replica can't be reached (asyncpg raises OSError when refused)
+REPLICA_UNAVAILABLE_EXCEPTIONS = (DBAPIError, OSError, asyncio.TimeoutError)
+
+# The primary when no replica is configured
+read_engine = create_async_engine(
+    DATABASE_READ_URL,
+    echo=False,
+    pool_size=DATABASE_READ_POOL_SIZE,
+    max_overflow=DATABASE_READ_MAX_OVERFLOW,
+    pool_timeout=DATABASE_READ_POOL_TIMEOUT,
+    pool_recycle=DATABASE_POOL_RECYCLE,
+    connect_args={
+        "timeout": DATABASE_CONNECT_TIMEOUT,
+        # Reject writes even if the URL points at a writable server
+        "server_settings": {"default_transaction_read_only": "on"},
+    }
+) if DATABASE_READ_URL else engine
+if read_engine is not engine:
+    pool_metrics.instrument(read_engine, "read", DATABASE_READ_POOL_SIZE + DATABASE_READ_MAX_OVERFLOW)
+_replica_retry_at = 0.0
+
+
+async def primary_wal_lsn() -> Optional[str]:
+    """
+    The primary's current WAL position, to pass as read_session's `min_lsn` after
+    committing writes that the reads must see. None without a replica, where
+    reads already go to the primary.
+    """
+    if read_engine is engine:
+        return None
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar()
+
+
+async def _replayed(session: AsyncSession, min_lsn: str) -> bool:
+    """Wait up to READ_REPLICA_MAX_LAG_SECONDS for the replica to replay the WAL up to `min_lsn`."""
+    # A server that isn't a standby has no replay position and sees its own writes
+    query = text("SELECT coalesce(pg_last_wal_replay_lsn(), pg_current_wal_lsn()) >= CAST(CAST(:lsn AS text) AS pg_lsn)")
+    deadline = time.monotonic() + READ_REPLICA_MAX_LAG_SECONDS
+    while not (await session.execute(query, {"lsn": min_lsn})).scalar():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(READ_REPLICA_LAG_POLL_SECONDS)
+    return True
+
+
+@asynccontextmanager
+async def read_session(session: Optional[AsyncSession] = None,
+                       min_lsn: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Session for read-only queries: on the read replica when DATABASE_READ_URL is
+    set and reachable, otherwise on the primary. The connection is checked out when
+    the session opens, so an unreachable replica falls back before any query runs
+    and is skipped for READ_REPLICA_RETRY_SECONDS. Reads may lag the primary by the
+    replication delay. To see just-committed writes, pass the primary_wal_lsn()
+    taken after the commit as `min_lsn`: the replica is used once it has replayed
+    up to it, or the primary if that takes over READ_REPLICA_MAX_LAG_SECONDS.
+
+    A caller-owned `session` is reused as is, so several queries can share one
+    connection (e.g. a snapshot refresh pass). A query failing in it rolls it
+    back, so the next query can still use it; the caller closes it.
+    """
+    global _replica_retry_at
+    if session is not None:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        return
+    if read_engine is not engine and time.monotonic() >= _replica_retry_at:
+        session = AsyncSession(read_engine)
+        try:
+            await session.connection()
+            caught_up = min_lsn is None or await _replayed(session, min_lsn)
+        except REPLICA_UNAVAILABLE_EXCEPTIONS as e:
+            await session.close()
+            _replica_retry_at = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+            logger.warning(
+                f"Read replica unavailable, using the primary for {READ_REPLICA_RETRY_SECONDS}s: {e}")
+        else:
+            if caught_up:
+                async with session:
+                    yield session
+                return
+            await session.close()
+            logger.warning(f"Read replica hasn't replayed {min_lsn} after "
+                           f"{READ_REPLICA_MAX_LAG_SECONDS}s, reading from the primary")
+    async with AsyncSession(engine) as session:
+        yield session
 
 # Declarative base for defining models
 Base = declarative_base()
@@ -48,3 +174,16 @@ async def get_async_db():
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+
+if __name__ == "__main__":
+    # Shows where reads are routed, e.g. with two local servers:
+    # DATABASE_URL=...@localhost:5432/db DATABASE_READ_URL=...@localhost:5433/db
+    async def test():
+        from sqlalchemy import text
+        query = text("SELECT inet_server_port(), current_setting('transaction_read_only')")
+        async with AsyncSession(engine) as session:
+            print("primary:", (await session.execute(query)).one())
+        async with read_session() as session:
+            print("reads:", (await session.execute(query)).one())
+        print(pool_metrics.snapshot())
+    asyncio.run(test())
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Type
+from sqlalchemy import literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db_logic.db import Base, engine
+from app.db_logic.models import NewsArticle, Source, Category, Country
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def split_countries(country: str | None) -> List[str]:
+    """Country names of an article; newsdata.io lists are stored comma-joined."""
+    return [name.strip() for name in (country or "").split(",") if name.strip()]
+
+
+class DimensionCache:
+    """
+    name → surrogate key maps of the dimension tables, kept for the life of the
+    process. Dimensions are small and append-only, so after warm-up ingestion
+    resolves keys without touching the database; unseen names are inserted
+    (ON CONFLICT DO NOTHING, so concurrent writers agree) and looked up in one
+    round trip per table. Only committed rows are cached, so a caller rolling back
+    its own transaction can't leave keys in the cache that don't exist.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, Dict[str, int]] = {}
+
+    async def resolve(self, model: Type[Base], names: Iterable[str]) -> Dict[str, int]:
+        """
+        Keys of `names` in `model`'s table. Missing rows are created and committed in
+        a session of their own before their keys are cached, independently of the
+        caller's transaction (an unused dimension row is harmless).
+        """
+        names = list(names)
+        keys = self._keys.setdefault(model.__tablename__, {})
+        missing = {name for name in names if name not in keys}
+        if missing:
+            async with AsyncSession(engine) as session:
+                await session.execute(
+                    pg_insert(model).values([{"name": name} for name in missing])
+                    .on_conflict_do_nothing(index_elements=["name"]))
+                result = await session.execute(select(model.id, model.name).where(model.name.in_(sorted(missing))))
+                resolved = {name: key for key, name in result.all()}
+                await session.commit()
+            keys.update(resolved)
+        return {name: keys[name] for name in names}
+
+    async def names(self, session: AsyncSession, model: Type[Base]) -> Dict[int, str]:
+        """key → name of a whole dimension table, for labelling integer-keyed results."""
+        result = await session.execute(select(model.id, model.name))
+        keys = self._keys.setdefault(model.__tablename__, {})
+        rows = result.all()
+        keys.update({name: key for key, name in rows})
+        return {key: name for key, name in rows}
+
+
+# Shared by ingestion and readers within a process
+dimension_cache = DimensionCache()
+
+# Fill dimensions and keys of articles stored before the dimension tables existed
+_BACKFILL_STATEMENTS = [
+    "INSERT INTO sources (name) SELECT DISTINCT source_id FROM news_articles "
+    "WHERE source_key IS NULL ON CONFLICT (name) DO NOTHING",
+    "INSERT INTO categories (name) SELECT DISTINCT category FROM news_articles "
+    "WHERE category_key IS NULL ON CONFLICT (name) DO NOTHING",
+    "INSERT INTO countries (name) SELECT DISTINCT trim(t.country_name) FROM news_articles, "
+    "unnest(string_to_array(country, ',')) AS t(country_name) "
+    "WHERE source_key IS NULL AND trim(t.country_name) <> '' ON CONFLICT (name) DO NOTHING",
+    "INSERT INTO article_countries (article_id, country_id) SELECT DISTINCT a.id, c.id "
+    "FROM news_articles a, unnest(string_to_array(a.country, ',')) AS t(country_name) "
+    "JOIN countries c ON c.name = trim(t.country_name) WHERE a.source_key IS NULL ON CONFLICT DO NOTHING",
+    "UPDATE news_articles a SET category_key = c.id FROM categories c "
+    "WHERE a.category_key IS NULL AND c.name = a.category",
+    # Last: source_key IS NULL marks the rows still to backfill above
+    "UPDATE news_articles a SET source_key = s.id FROM sources s "
+    "WHERE a.source_key IS NULL AND s.name = a.source_id",
+]
+
+
+async def backfill_dimensions() -> None:
+    """Backfill the dimension keys and country bridge once for articles that predate them."""
+    async with AsyncSession(engine) as session:
+        pending = (await session.execute(
+            select(literal_column("1")).select_from(NewsArticle)
+            .where(NewsArticle.source_key.is_(None)).limit(1))).first()
+        if not pending:
+            return
+        logger.info("Backfilling dimension keys of existing articles")
+        for statement in _BACKFILL_STATEMENTS:
+            await session.execute(text(statement))
+        await session.commit()
+
+if __name__ == "__main__":
+    async def test():
+        await backfill_dimensions()
+        print(await dimension_cache.resolve(Source, ["bbc", "cnn"]))
+        async with AsyncSession(engine) as session:
+            print(await dimension_cache.names(session, Category))
+            print(await dimension_cache.names(session, Country))
+    asyncio.run(test())
@@ -0,0 +1,33 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db_logic.models import JobFence
+from app.redis_logic.lease_lock import FencingError, current_lease
+import logging
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def check_fence(session: AsyncSession) -> None:
+    """
+    Reject this transaction's writes if a newer lease of the current job's lock
+    has already written. Call it in the write transaction, before committing.
+
+    Records the lease's token in job_fences unless a higher token is stored. The
+    row stays locked until the transaction ends, so writers of the same lock are
+    serialized and a stale holder that resumes after a newer one wrote fails with
+    FencingError. A no-op outside a lease (e.g. a manual run).
+    """
+    lease = current_lease.get()
+    if lease is None:
+        return
+    name, token = lease
+    stmt = (
+        pg_insert(JobFence).values(name=name, token=token)
+        .on_conflict_do_update(index_elements=[JobFence.name], set_={"token": token},
+                               where=JobFence.token <= token)
+        .returning(JobFence.token)
+    )
+    if (await session.execute(stmt)).first() is None:
+        raise FencingError(f"Fencing token {token} of lock '{name}' is stale, write rejected")
@@ -0,0 +1,29 @@
+import asyncio
+import logging
+from app.db_logic.models import create_tables
+from app.db_logic.rollups import ensure_hourly_rollups
+from app.db_logic.dimensions import backfill_dimensions
+from app.data_extraction.search import backfill_search_vectors
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def migrate() -> None:
+    """
+    Bring the schema and derived columns up to date: create missing tables,
+    columns and indexes, then backfill the hourly rollups, search vectors and
+    dimension keys of articles stored before they existed. Every step is
+    idempotent. Run once at worker startup, not per ingestion run, so their
+    checks don't scan news_articles on every run.
+    """
+    await create_tables()
+    await ensure_hourly_rollups()
+    await backfill_search_vectors()
+    await backfill_dimensions()
+    logger.info("Database migrations complete")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -1,7 +1,54 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, Float, DateTime, Text, Index, Boolean, LargeBinary, ForeignKey, inspect, true, func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.db_logic.db import Base, engine
 import asyncio
 import logging
+import os
+import zlib
+
+# Count each near-duplicate story cluster once in the aggregates
+COUNT_CLUSTERS_ONCE = os.getenv("COUNT_CLUSTERS_ONCE", "false").lower() == "true"
+# Text search configuration of the full-text index
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "english")
+
+
+def compress_text(text: str | None) -> bytes | None:
+    """Compress text for storage; short descriptions are below TOAST's compression threshold."""
+    return zlib.compress(text.encode("utf-8"), 6) if text else None
+
+
+def decompress_text(data: bytes | None) -> str | None:
+    return zlib.decompress(data).decode("utf-8") if data else None
+
+
+class Source(Base):
+    """Dimension table: one row per news source, referenced by a small integer key."""
+    __tablename__ = "sources"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(SmallInteger, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id = Column(SmallInteger, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class ArticleCountry(Base):
+    """Bridge table: an article is tagged with one or more countries."""
+    __tablename__ = "article_countries"
+
+    article_id = Column(Integer, ForeignKey("news_articles.id", ondelete="CASCADE"), primary_key=True)
+    country_id = Column(SmallInteger, ForeignKey("countries.id"), primary_key=True, index=True)
 
 
 class NewsArticle(Base):
@@ -15,6 +62,71 @@ class NewsArticle(Base):
     sentiment = Column(Float, nullable=False)
     category = Column(String, nullable=False)
     link = Column(String)
+    # Dimension keys; the text columns above are kept while readers move to the keys
+    source_key = Column(Integer, ForeignKey("sources.id"), index=True)
+    category_key = Column(SmallInteger, ForeignKey("categories.id"))
+    # zlib-compressed UTF-8; use the `description` property
+    description_compressed = Column(LargeBinary)
+    # Sentiment/classifier versions that produced `sentiment` and `category`
+    model_version = Column(String)
+    # Story cluster from near-duplicate detection; duplicates joined an earlier article's cluster
+    cluster_id = Column(String, index=True)
+    is_duplicate = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Title (weight A) and description (weight B) lexemes, set at insert by article_search_vector
+    search_vector = Column(TSVECTOR)
+
+    @property
+    def description(self) -> str | None:
+        return decompress_text(self.description_compressed)
+
+    @description.setter
+    def description(self, value: str | None) -> None:
+        self.description_compressed = compress_text(value)
+
+    __table_args__ = (
+        # Serves the per-category time-window scans of the dashboard queries
+        Index("ix_news_articles_category_pubdate", "category", "pubDate"),
+        Index("ix_news_articles_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+class SentimentRollup(Base):
+    """Article count and sentiment sum per (hour, category), maintained at ingestion."""
+    __tablename__ = "sentiment_rollups_hourly"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    category = Column(String, primary_key=True)
+    article_count = Column(Integer, nullable=False, default=0)
+    sentiment_sum = Column(Float, nullable=False, default=0.0)
+
+
+class JobFence(Base):
+    """Highest lease fencing token that has written under each job lock (see app.db_logic.fencing)."""
+    __tablename__ = "job_fences"
+
+    name = Column(String, primary_key=True)
+    token = Column(BigInteger, nullable=False)
+
+
+def article_search_vector(title, description=None):
+    """
+    tsvector of an article for the full-text index. Takes values or columns, so it
+    serves both inserts and backfills (with the description, which is only stored
+    compressed, so it is passed as a value).
+    """
+    # setweight takes a "char", which a bound VARCHAR doesn't resolve to
+    vector = func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(title, "")),
+                            literal_column("'A'"))
+    if description is not None:
+        vector = vector.op("||")(
+            func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(description, "")),
+                           literal_column("'B'")))
+    return vector
+
+
+def counted_articles():
+    """Filter for the articles aggregates count: all, or one per story cluster."""
+    return NewsArticle.is_duplicate.is_(False) if COUNT_CLUSTERS_ONCE else true()
 
 
 logging.basicConfig(level=logging.INFO,
@@ -29,11 +141,34 @@ logger = logging.getLogger(__name__)
 #     async with engine.begin() as conn:
 #         await conn.run_sync(Base.metadata.create_all)
 
+def _add_missing_columns(conn) -> None:
+    """create_all doesn't alter existing tables, so add columns introduced since they were created."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column.type.compile(conn.dialect)}'
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            conn.exec_driver_sql(ddl)
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
 async def create_tables():
     logger.info("Attempting to create database tables...")
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
+            # create_all skips indexes of tables that already exist
+            for index in NewsArticle.__table__.indexes:
+                await conn.run_sync(index.create, checkfirst=True)
         logger.info("Database tables ensured to exist.")
     except Exception as e:
         logger.critical(f"Failed to create database tables: {e}")
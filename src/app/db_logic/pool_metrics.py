@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Metrics Configuration ---
+DB_METRICS_ENABLED = os.getenv("DB_METRICS_ENABLED", "true").lower() == "true"
+# Redis hash with one JSON entry per process, readable from outside the worker
+DB_METRICS_KEY = "db:pool_metrics"
+# Distinct query shapes tracked; further shapes are counted under "other"
+DB_METRICS_MAX_QUERIES = int(os.getenv("DB_METRICS_MAX_QUERIES", "200"))
+# Queries are keyed by the start of their SQL text (parameters are bound separately)
+QUERY_LABEL_LENGTH = 120
+
+
+@dataclass
+class DurationStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "total_ms": round(self.total * 1000, 2),
+        }
+
+
+@dataclass
+class PoolUsage:
+    capacity: int = 0
+    in_use: int = 0
+    peak_in_use: int = 0
+    checkouts: int = 0
+    # Checkouts that took the last free connection; the next one has to wait
+    saturated_checkouts: int = 0
+    connections_opened: int = 0
+
+# --- Pool Metrics Class ---
+
+
+class PoolMetrics:
+    """
+    Per-engine pool usage and checkout wait times, and per-query durations,
+    collected in this process through SQLAlchemy event hooks:
+
+    - pool "checkout"/"checkin"/"connect": connections in use against the pool's
+      capacity (pool_size + max_overflow) and how often the pool was full.
+    - Session "after_transaction_create" → "after_begin": the time a session waits
+      between starting a transaction and getting its connection, i.e. the pool
+      checkout (including opening a connection when the pool is empty).
+    - engine "before_cursor_execute"/"after_cursor_execute": duration of every
+      statement, grouped by the start of its SQL text.
+    """
+
+    def __init__(self):
+        self.pools: Dict[str, PoolUsage] = {}
+        self.checkout_wait: Dict[str, DurationStats] = {}
+        self.queries: Dict[str, DurationStats] = {}
+        self._labels: Dict[int, str] = {}
+        self._session_hooks = False
+        # Per collector, so separate collectors don't consume each other's timings
+        self._started_key = f"checkout_started:{id(self)}"
+
+    def instrument(self, engine: AsyncEngine, label: str, capacity: int) -> None:
+        """Collect metrics for `engine` under `label` ("primary", "read")."""
+        if not DB_METRICS_ENABLED:
+            return
+        sync_engine = engine.sync_engine
+        self._labels[id(sync_engine)] = label
+        usage = self.pools[label] = PoolUsage(capacity=capacity)
+        self.checkout_wait[label] = DurationStats()
+
+        @event.listens_for(sync_engine.pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            usage.connections_opened += 1
+
+        @event.listens_for(sync_engine.pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            usage.in_use += 1
+            usage.checkouts += 1
+            usage.peak_in_use = max(usage.peak_in_use, usage.in_use)
+            if usage.in_use >= usage.capacity:
+                usage.saturated_checkouts += 1
+
+        @event.listens_for(sync_engine.pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            usage.in_use = max(usage.in_use - 1, 0)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            self._record_query(conn, statement)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def on_error(context):
+            if context.connection is not None and context.statement is not None:
+                self._record_query(context.connection, context.statement)
+
+        self._listen_sessions()
+
+    def _record_query(self, conn, statement: str) -> None:
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        label = " ".join(statement.split())[:QUERY_LABEL_LENGTH]
+        if label not in self.queries and len(self.queries) >= DB_METRICS_MAX_QUERIES:
+            label = "other"
+        self.queries.setdefault(label, DurationStats()).add(elapsed)
+
+    def _listen_sessions(self) -> None:
+        # Session events are global; register them once for every engine
+        if self._session_hooks:
+            return
+        self._session_hooks = True
+
+        @event.listens_for(Session, "after_transaction_create")
+        def on_transaction(session, transaction):
+            if transaction.parent is None:
+                session.info[self._started_key] = time.perf_counter()
+
+        @event.listens_for(Session, "after_begin")
+        def on_begin(session, transaction, connection):
+            started = session.info.pop(self._started_key, None)
+            label = self._labels.get(id(connection.engine))
+            if started is not None and label is not None:
+                self.checkout_wait[label].add(time.perf_counter() - started)
+
+    def snapshot(self, top_queries: int = 10) -> Dict[str, Any]:
+        """Current metrics; queries are the `top_queries` with the most total time."""
+        slowest = sorted(self.queries.items(), key=lambda item: item[1].total, reverse=True)[:top_queries]
+        return {
+            "updated": time.time(),
+            "pools": {label: {**asdict(usage),
+                              "checkout_wait": self.checkout_wait[label].to_dict()}
+                      for label, usage in self.pools.items()},
+            "queries": {label: stats.to_dict() for label, stats in slowest},
+        }
+
+    async def publish(self, redis_client) -> None:
+        """Mirror this process's metrics to the DB_METRICS_KEY Redis hash."""
+        if not self.pools:
+            return
+        await redis_client.ensure_client()
+        await redis_client.execute_command(
+            redis_client.client.hset, DB_METRICS_KEY,
+            f"{socket.gethostname()}:{os.getpid()}", json.dumps(self.snapshot()))
+
+    def log_summary(self) -> None:
+        for label, data in self.snapshot(top_queries=0)["pools"].items():
+            logger.info(f"DB pool '{label}': {data['in_use']}/{data['capacity']} in use, "
+                        f"peak {data['peak_in_use']}, {data['saturated_checkouts']} of "
+                        f"{data['checkouts']} checkouts saturated, checkout wait "
+                        f"avg {data['checkout_wait']['avg_ms']}ms max {data['checkout_wait']['max_ms']}ms")
+
+
+# One collector per process, fed by every instrumented engine
+pool_metrics = PoolMetrics()
@@ -0,0 +1,84 @@
+from datetime import datetime
+import asyncio
+import logging
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db_logic.db import engine
+from app.db_logic.models import NewsArticle, SentimentRollup, counted_articles
+from app.db_logic.fencing import check_fence
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def hour_start(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+async def add_to_hourly_rollup(session: AsyncSession, category: str, pub_date: datetime,
+                               sentiment: float) -> None:
+    """
+    Add one article to its (hour, category) rollup row. Does not commit, so the
+    rollup update lands in the same transaction as the article insert.
+    """
+    stmt = pg_insert(SentimentRollup).values(
+        bucket_start=hour_start(pub_date),
+        category=category,
+        article_count=1,
+        sentiment_sum=sentiment,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SentimentRollup.bucket_start, SentimentRollup.category],
+        set_={
+            "article_count": SentimentRollup.article_count + 1,
+            "sentiment_sum": SentimentRollup.sentiment_sum + stmt.excluded.sentiment_sum,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def rebuild_hourly_rollups() -> int:
+    """Recompute every hourly rollup row from news_articles. Returns the number of rows written."""
+    hour = func.date_trunc('hour', NewsArticle.pubDate)
+    async with AsyncSession(engine) as session:
+        await session.execute(delete(SentimentRollup))
+        result = await session.execute(
+            pg_insert(SentimentRollup).from_select(
+                ["bucket_start", "category", "article_count", "sentiment_sum"],
+                select(hour, NewsArticle.category,
+                       func.count(NewsArticle.id), func.sum(NewsArticle.sentiment))
+                .where(counted_articles())
+                .group_by(hour, NewsArticle.category)
+            )
+        )
+        await check_fence(session)
+        await session.commit()
+    logger.info(f"Rebuilt {result.rowcount} hourly rollup rows")
+    return result.rowcount
+
+
+async def ensure_hourly_rollups() -> None:
+    """Backfill the rollups once if they are empty but articles exist (e.g. after upgrading)."""
+    async with AsyncSession(engine) as session:
+        has_rollups = (await session.execute(
+            select(literal_column("1")).select_from(SentimentRollup).limit(1))).first()
+        has_articles = (await session.execute(
+            select(literal_column("1")).select_from(NewsArticle).limit(1))).first()
+    if has_articles and not has_rollups:
+        logger.info("Hourly rollups empty, backfilling from news_articles")
+        await rebuild_hourly_rollups()
+
+
+async def prune_hourly_rollups(cutoff: datetime) -> int:
+    """Delete rollup rows for hours entirely before `cutoff`."""
+    async with AsyncSession(engine) as session:
+        result = await session.execute(
+            delete(SentimentRollup).where(SentimentRollup.bucket_start < hour_start(cutoff)))
+        await check_fence(session)
+        await session.commit()
+    return result.rowcount
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_hourly_rollups())
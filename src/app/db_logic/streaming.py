@@ -0,0 +1,60 @@
+from typing import AsyncIterator, Optional, Sequence
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from app.db_logic.db import engine
+import asyncio
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from a server-side cursor
+STREAM_FETCH_SIZE = int(os.getenv("STREAM_FETCH_SIZE", "500"))
+
+
+async def stream_partitions(stmt: Select, fetch_size: int = STREAM_FETCH_SIZE,
+                            session: Optional[AsyncSession] = None) -> AsyncIterator[Sequence[Row]]:
+    """
+    Run a SELECT through a server-side cursor (asyncpg) and yield its rows in
+    lists of at most `fetch_size`, so memory depends on the fetch size rather than
+    on the size of the result.
+
+    Args:
+        stmt (Select): The query.
+        fetch_size (int): Rows per fetch and per yielded list.
+        session (AsyncSession | None): Session to run in; a new one is opened if None.
+            The cursor lives in the session's transaction, so don't run other
+            statements on it while iterating.
+    """
+    stmt = stmt.execution_options(yield_per=fetch_size)
+    if session is not None:
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+        return
+    async with AsyncSession(engine) as own_session:
+        result = await own_session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+
+async def stream_rows(stmt: Select, fetch_size: int = STREAM_FETCH_SIZE,
+                      session: Optional[AsyncSession] = None) -> AsyncIterator[Row]:
+    """Like stream_partitions, one row at a time."""
+    async for partition in stream_partitions(stmt, fetch_size, session):
+        for row in partition:
+            yield row
+
+if __name__ == "__main__":
+    async def test():
+        from sqlalchemy.future import select
+        from app.db_logic.models import NewsArticle
+        count = 0
+        async for partition in stream_partitions(select(NewsArticle.id, NewsArticle.title)):
+            count += len(partition)
+            logger.info(f"Fetched {len(partition)} rows ({count} so far)")
+        print(count)
+    asyncio.run(test())
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+import feedparser
+import httpx
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- Cached Feed State ---
+
+
+@dataclass
+class CachedFeed(Generic[T]):
+    """Validators and parsed result of the last 200 response for a feed URL."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_length: int
+    parsed: T
+
+# --- Feed Fetcher Class ---
+
+
+class FeedFetcher(Generic[T]):
+    """
+    Fetch RSS feeds with conditional GET requests.
+
+    The ETag and Last-Modified validators of each URL are remembered together with
+    the parsed result. Later requests send If-None-Match / If-Modified-Since and a
+    304 Not Modified response returns the cached result without downloading or
+    parsing the document again. Bytes saved by 304s are tracked in `metrics`.
+    """
+
+    def __init__(self, parser: Callable[[Any, str], T], timeout: float = 10.0,
+                 is_cacheable: Callable[[T], bool] = bool):
+        self.parser = parser
+        # Fallback results (e.g. placeholder headlines) must not be revalidated later
+        self.is_cacheable = is_cacheable
+        self.timeout = timeout
+        self._feeds: Dict[str, CachedFeed[T]] = {}
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self.metrics = {
+            "requests": 0,
+            "not_modified": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+        }
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a previously seen URL."""
+        with self._lock:
+            cached = self._feeds.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def _not_modified(self, url: str) -> Optional[T]:
+        """Record a 304 and return the cached result, or None if the cache was dropped."""
+        with self._lock:
+            cached = self._feeds.get(url)
+            self.metrics["requests"] += 1
+            if cached is None:
+                return None
+            self.metrics["not_modified"] += 1
+            self.metrics["bytes_saved"] += cached.content_length
+        logger.info(f"Feed not modified, reusing parsed result: {url}")
+        return cached.parsed
+
+    def _store(self, url: str, response: httpx.Response, parsed: T) -> T:
+        """Remember the validators and parsed result of a 200 response."""
+        with self._lock:
+            self.metrics["requests"] += 1
+            self.metrics["bytes_downloaded"] += len(response.content)
+            if not self.is_cacheable(parsed):
+                self._feeds.pop(url, None)
+                return parsed
+            self._feeds[url] = CachedFeed(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                content_length=len(response.content),
+                parsed=parsed,
+            )
+        return parsed
+
+    def fetch(self, url: str) -> T:
+        """Fetch and parse a feed synchronously, reusing the cached result on 304."""
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=self.timeout, follow_redirects=True)
+        response = self._client.get(
+            url, headers=self._conditional_headers(url))
+        if response.status_code == 304:
+            cached = self._not_modified(url)
+            if cached is not None:
+                return cached
+            response = self._client.get(url)
+        response.raise_for_status()
+        parsed = self.parser(feedparser.parse(response.content), url)
+        return self._store(url, response, parsed)
+
+    async def afetch(self, client: httpx.AsyncClient, url: str) -> T:
+        """Fetch a feed with an async client; parsing runs in a worker thread."""
+        response = await client.get(url, headers=self._conditional_headers(url))
+        if response.status_code == 304:
+            cached = self._not_modified(url)
+            if cached is not None:
+                return cached
+            response = await client.get(url)
+        response.raise_for_status()
+        feed = await asyncio.to_thread(feedparser.parse, response.content)
+        return self._store(url, response, self.parser(feed, url))
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return a copy of the request counters."""
+        with self._lock:
+            return dict(self.metrics)
+
+    def close(self) -> None:
+        """Close the synchronous HTTP client."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
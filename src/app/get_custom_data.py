@@ -1,15 +1,19 @@
+import asyncio
 import logging
 from typing import Tuple, List, Dict, Any
 from pathlib import Path
 from dotenv import load_dotenv
 import os
-import requests
-from requests.exceptions import RequestException, HTTPError
 from urllib.error import URLError
 import socket
-import feedparser
-from tenacity import retry, wait_exponential, stop_after_attempt, before_log, after_log, retry_if_exception_type
+import httpx
+from tenacity import retry, wait_exponential, stop_after_attempt, before_log, after_log, retry_if_exception_type, retry_if_exception
 from app.models.sentiment import analyze_sentiment
+from app.feed_fetcher import FeedFetcher
+from app.concurrency import SingleFlight
+from app.news_editions import DEFAULT_COUNTRY, build_feed_url
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+from app.redis_logic.query_cache import QueryResultCache
 
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO,
@@ -44,7 +48,19 @@ ALT_HEADLINES = [
 ]
 
 # --- Retry Logic Configuration ---
-RETRIABLE_EXCEPTIONS = (RequestException, HTTPError, URLError, socket.timeout)
+RETRIABLE_EXCEPTIONS = (httpx.TransportError, URLError, socket.timeout)
+
+# --- Newsdata.io Configuration ---
+NEWS_API_URL = "https://newsdata.io/api/1/latest"
+# Per-request limits so a slow upstream cannot hold a search for minutes
+API_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+# Searches are answered from stored articles first; a slow database counts as a miss
+LOCAL_SEARCH_TIMEOUT = float(os.getenv("LOCAL_SEARCH_TIMEOUT", "3"))
+# Best-ranked stored articles plotted for a local answer (the API returns one page too)
+LOCAL_SEARCH_ARTICLES = int(os.getenv("LOCAL_SEARCH_ARTICLES", "50"))
+_search_flight = SingleFlight()
+# Shared across workers; popular searches are answered without any upstream call
+_query_cache = QueryResultCache(RedisClient(REDIS_URL))
 
 # --- Utility Functions ---
 
@@ -83,66 +99,47 @@ def _extract_needed_data(response: Dict[str, Any]) -> Tuple[List[str], List[str]
 # --- Main Functions ---
 
 
+RETRIABLE_STATUS_CODES = (429, 503)
+
+
+def _is_retriable_api_error(exception: BaseException) -> bool:
+    """Retry network errors and 429/503 responses from Newsdata.io."""
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code in RETRIABLE_STATUS_CODES
+    return isinstance(exception, httpx.TransportError)
+
+
 @retry(
-    wait=wait_exponential(multiplier=1, min=1, max=10),
-    stop=stop_after_attempt(5),
-    retry=retry_if_exception_type(RETRIABLE_EXCEPTIONS),
+    wait=wait_exponential(multiplier=1, min=1, max=4),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_retriable_api_error),
     before=before_log(logger, logging.INFO),
     after=after_log(logger, logging.WARNING),
-    reraise=False
+    reraise=True
 )
-def get_data(input: str) -> Tuple[List[str], List[float], List[int], List[Dict[str, str]]]:
-    """
-    Fetch news data from Newsdata.io API and Google News RSS, analyze sentiments, and prepare visualization data.
-    Returns dummy headlines if RSS fetch fails.
-
-    Args:
-        input (str): Search query for news articles.
+async def _fetch_api_articles(client: httpx.AsyncClient, input: str) -> Tuple[List[str], List[str]]:
+    """Fetch articles matching a query from the Newsdata.io API."""
+    response = await client.get(
+        NEWS_API_URL, params={"apikey": NEWS_API_KEY, "language": "en", "q": input})
+    response.raise_for_status()
+    return _extract_needed_data(response.json())
 
-    Returns:
-        Tuple containing:
-            - List[str]: Publication dates.
-            - List[float]: Sentiment scores for descriptions.
-            - List[int]: Counts of positive, neutral, negative sentiments for pie chart.
-            - List[Dict[str, str]]: Top headlines with titles and links.
-    """
-    # Default return value for failures
-    default_return = ([], [], [0, 0, 0], ALT_HEADLINES)
 
-    # Fetch from Newsdata.io API
-    NEWS_URL = f"https://newsdata.io/api/1/latest?apikey={NEWS_API_KEY}&language=en&q={input}"
+async def _fetch_rss_headlines(client: httpx.AsyncClient, input: str, country: str) -> List[Dict[str, str]]:
+    """Fetch Google News RSS headlines for a query, falling back to dummy data."""
+    rss_url = build_feed_url(country, input)
     try:
-        response = requests.get(NEWS_URL, timeout=30)
-        response.raise_for_status()
-        response_data = response.json()
-        descriptions, dates = _extract_needed_data(response_data)
-    except HTTPError as e:
-        if e.response.status_code in (429, 503):
-            logger.warning(
-                f"Retriable HTTP error {e.response.status_code} for {NEWS_URL}: {e}")
-            raise
-        logger.error(
-            f"Non-retriable HTTP error {e.response.status_code} for {NEWS_URL}: {e}")
-        return default_return
-    except RETRIABLE_EXCEPTIONS as e:
-        logger.warning(
-            f"Retriable error fetching API data from {NEWS_URL}: {e}")
-        return default_return
+        return await feed_fetcher.afetch(client, rss_url)
     except Exception as e:
-        logger.error(
-            f"Unexpected error fetching API data from {NEWS_URL}: {e}")
-        return default_return
+        logger.error(f"Failed to fetch RSS headlines from {rss_url}: {e}")
+        return ALT_HEADLINES
 
-    # Analyze sentiments
-    sentiments = []
-    try:
-        for description in descriptions:
-            sentiments.append(analyze_sentiment(description))
-    except Exception as e:
-        logger.error(f"Error analyzing sentiments: {e}")
-        return default_return
 
-    # Prepare pie chart data
+def _score_sentiments(descriptions: List[str]) -> Tuple[List[float], List[int]]:
+    """Score descriptions with VADER and count positive, neutral and negative articles."""
+    sentiments = [analyze_sentiment(description)
+                  for description in descriptions]
+
     positive, neutral, negative = 0, 0, 0
     positive_threshold, negative_threshold = 0.2, -0.2
     for score in sentiments:
@@ -152,22 +149,134 @@ def get_data(input: str) -> Tuple[List[str], List[float], List[int], List[Dict[s
             negative += 1
         else:
             neutral += 1
-    pie_data = [positive, neutral, negative]
+    return sentiments, [positive, neutral, negative]
 
-    # Fetch RSS headlines
-    cleaned_input = ''.join(input.split())
-    rss_url = f"https://news.google.com/rss/search?q={cleaned_input}&hl=en-US&gl=US&ceid=US:en"
+
+async def _search_local(input: str) -> Dict[str, Any] | None:
+    """Search stored articles; None on a miss (too few matches) or if the database is unavailable."""
     try:
-        top_headlines = top_news(rss_url)
+        # Imported here so the web tier still starts without database settings
+        from app.data_extraction.search import search_articles, LOCAL_SEARCH_MIN_RESULTS
+        result = await asyncio.wait_for(
+            search_articles(input, limit=LOCAL_SEARCH_ARTICLES), LOCAL_SEARCH_TIMEOUT)
     except Exception as e:
-        logger.error(f"Failed to fetch RSS headlines from {rss_url}: {e}")
+        logger.warning(f"Local search for '{input}' unavailable: {e}")
+        return None
+    if result["total"] < LOCAL_SEARCH_MIN_RESULTS:
+        logger.info(f"Local search miss for '{input}' ({result['total']} articles)")
+        return None
+    return result
+
+
+def _local_answer(result: Dict[str, Any], top_headlines: List[Dict[str, str]]) -> Tuple[List[str], List[float], List[int], List[Dict[str, str]]]:
+    """Shape a local search like an API answer: one point per ranked article, in date order."""
+    articles = sorted(result["articles"], key=lambda article: article["pubDate"])
+    if top_headlines is ALT_HEADLINES:
+        # RSS failed; the best-ranked stored articles are real headlines for the query
+        top_headlines = [{"title": article["title"], "link": article["link"]}
+                         for article in result["articles"][:5]]
+    return ([article["pubDate"] for article in articles],
+            [article["sentiment"] for article in articles],
+            result["pie"], top_headlines)
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    """Cancel a task and wait for it, so it never outlives the HTTP client it uses."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _get_data(input: str, country: str) -> Tuple[List[str], List[float], List[int], List[Dict[str, str]]]:
+    """
+    Answer from stored articles when enough match, otherwise from Newsdata.io, with
+    the RSS headlines fetched concurrently, and prepare visualization data. The API
+    is only called after the local search missed, timed out or failed, so answers
+    from stored articles spend no API credits.
+    """
+    api_result = None
+    async with httpx.AsyncClient(timeout=API_TIMEOUT, follow_redirects=True) as client:
+        rss_task = asyncio.create_task(_fetch_rss_headlines(client, input, country))
+        try:
+            local_result = await _search_local(input)
+            if local_result is None:
+                try:
+                    api_result = await _fetch_api_articles(client, input)
+                except Exception as e:
+                    api_result = e
+            top_headlines, = await asyncio.gather(rss_task, return_exceptions=True)
+        finally:
+            if not rss_task.done():
+                await _cancel(rss_task)
+    if isinstance(top_headlines, BaseException):
+        logger.error(f"Failed to fetch RSS headlines: {top_headlines}")
         top_headlines = ALT_HEADLINES
 
+    if local_result is not None:
+        logger.info(f"Answered '{input}' from {local_result['total']} stored articles")
+        return _local_answer(local_result, top_headlines)
+
+    # Default return value for failures
+    default_return = ([], [], [0, 0, 0], top_headlines)
+    if isinstance(api_result, httpx.HTTPStatusError):
+        logger.error(
+            f"HTTP error {api_result.response.status_code} fetching API data for '{input}': {api_result}")
+        return default_return
+    if isinstance(api_result, BaseException):
+        logger.error(
+            f"Error fetching API data for '{input}': {api_result}")
+        return default_return
+    descriptions, dates = api_result
+
+    # VADER is CPU-bound; keep it off the event loop
+    try:
+        sentiments, pie_data = await asyncio.to_thread(_score_sentiments, descriptions)
+    except Exception as e:
+        logger.error(f"Error analyzing sentiments: {e}")
+        return default_return
+
     logger.info(
         f"Fetched {len(descriptions)} API articles and {len(top_headlines)} RSS headlines")
     return dates, sentiments, pie_data, top_headlines
 
 
+async def _cached_get_data(input: str, country: str) -> Tuple[List[str], List[float], List[int], List[Dict[str, str]]]:
+    """Serve a search from the query-result cache, computing and storing it on a miss."""
+    cached = await _query_cache.get(input, country)
+    if cached is not None:
+        logger.info(f"Query cache hit for '{input}' ({country})")
+        return tuple(cached)
+
+    result = await _get_data(input, country)
+    # Failed searches (no API data) are not cached so the next click retries upstream
+    if result[0]:
+        await _query_cache.set(input, country, list(result))
+    return result
+
+
+async def get_data(input: str, country: str = DEFAULT_COUNTRY) -> Tuple[List[str], List[float], List[int], List[Dict[str, str]]]:
+    """
+    Fetch news data from stored articles (full-text index) or, when too few match, the
+    Newsdata.io API, plus Google News RSS headlines, and prepare visualization data.
+    Results are cached in Redis by normalized query and country. On a cache miss the RSS
+    headlines are fetched while the stored articles are searched, and identical queries
+    already in flight share one upstream request (single-flight). Returns dummy headlines if RSS fetch fails.
+
+    Args:
+        input (str): Search query for news articles.
+        country (str): Google News edition used for the headlines.
+
+    Returns:
+        Tuple containing:
+            - List[str]: Publication dates, one per article (best-ranked stored articles for local results).
+            - List[float]: Sentiment scores of those articles.
+            - List[int]: Counts of positive, neutral, negative sentiments for pie chart
+              (every matching stored article for local results).
+            - List[Dict[str, str]]: Top headlines with titles and links.
+    """
+    key = (country, QueryResultCache.normalize(input))
+    return await _search_flight.do(key, _cached_get_data, input, country)
+
+
 @retry(
     wait=wait_exponential(multiplier=1, min=1, max=10),
     stop=stop_after_attempt(5),
@@ -187,29 +296,9 @@ def top_news(url: str) -> List[Dict[str, str]]:
     Returns:
         List[Dict[str, str]]: A list of dictionaries containing 'title' and 'link' for each headline.
     """
-    top_headlines = []
     try:
-        feed = feedparser.parse(url)
-        if feed.get("bozo", False):
-            logger.warning(
-                f"Invalid RSS feed at {url}: {feed.get('bozo_exception')}")
-            return ALT_HEADLINES
-
-        for entry in feed.entries[:5]:  # Get top 5 headlines
-            if hasattr(entry, "title") and hasattr(entry, "link"):
-                top_headlines.append({
-                    "title": entry.title,
-                    "link": entry.link
-                })
-
-        if not top_headlines:
-            logger.info(
-                f"No valid headlines found at {url}, returning dummy data")
-            return ALT_HEADLINES
-
-        logger.info(
-            f"Successfully fetched {len(top_headlines)} headlines from {url}")
-        return top_headlines
+        # Conditional GET: a 304 reuses the previously parsed headlines
+        return feed_fetcher.fetch(url)
 
     except RETRIABLE_EXCEPTIONS as e:
         logger.warning(f"Retriable error fetching RSS feed from {url}: {e}")
@@ -218,12 +307,52 @@ def top_news(url: str) -> List[Dict[str, str]]:
         logger.error(f"Unexpected error fetching RSS feed from {url}: {e}")
         return ALT_HEADLINES
 
+def parse_headlines(feed: Any, url: str) -> List[Dict[str, str]]:
+    """
+    Extract the top 5 headlines from a parsed feedparser result.
+    Returns dummy data (ALT_HEADLINES) if the feed is invalid or has no headlines.
+
+    Args:
+        feed: The result of feedparser.parse for a URL or a downloaded document.
+        url (str): The RSS feed URL, used for logging.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries containing 'title' and 'link' for each headline.
+    """
+    if feed.get("bozo", False):
+        logger.warning(
+            f"Invalid RSS feed at {url}: {feed.get('bozo_exception')}")
+        return ALT_HEADLINES
+
+    top_headlines = []
+    for entry in feed.entries[:5]:  # Get top 5 headlines
+        if hasattr(entry, "title") and hasattr(entry, "link"):
+            top_headlines.append({
+                "title": entry.title,
+                "link": entry.link
+            })
+
+    if not top_headlines:
+        logger.info(
+            f"No valid headlines found at {url}, returning dummy data")
+        return ALT_HEADLINES
+
+    logger.info(
+        f"Successfully fetched {len(top_headlines)} headlines from {url}")
+    return top_headlines
+
+# Shared by the interactive paths and the headline prefetch job
+feed_fetcher = FeedFetcher(
+    parse_headlines, is_cacheable=lambda headlines: headlines is not ALT_HEADLINES)
+
 # --- Test Function ---
 
 
-def main_test():
+async def main_test():
     try:
-        dates, sentiments, pie_data, headlines = get_data("technology")
+        # Both searches share one upstream request
+        (dates, sentiments, pie_data, headlines), _ = await asyncio.gather(
+            get_data("technology"), get_data("Technology"))
         logger.info(
             f"Fetched {len(dates)} dates, {len(sentiments)} sentiments, pie data {pie_data}, {len(headlines)} headlines")
         for headline in headlines:
@@ -234,7 +363,7 @@ def main_test():
 
 
 if __name__ == "__main__":
-    main_test()
+    asyncio.run(main_test())
 
 
 # from dotenv import load_dotenv
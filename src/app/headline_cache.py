@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from app.get_custom_data import top_news, ALT_HEADLINES
+from app.news_editions import COUNTRY_CODES, DEFAULT_COUNTRY, normalize_query, build_feed_url, headline_key
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Cache Configuration ---
+# Entries younger than HEADLINE_CACHE_TTL are served as-is. Older entries are
+# still served (stale-while-revalidate) until HEADLINE_CACHE_STALE_TTL, while a
+# background refresh fetches the feed again.
+HEADLINE_CACHE_TTL = int(os.getenv("HEADLINE_CACHE_TTL", "300"))
+HEADLINE_CACHE_STALE_TTL = int(os.getenv("HEADLINE_CACHE_STALE_TTL", "3600"))
+HEADLINE_REFRESH_WORKERS = int(os.getenv("HEADLINE_REFRESH_WORKERS", "4"))
+
+# --- Headline Cache Class ---
+
+
+class HeadlineCache:
+    """
+    Thread-safe TTL cache of RSS headlines keyed by (country, query).
+
+    Dash callbacks run in worker threads, so a fresh entry is returned directly, a
+    stale entry is returned immediately while a single background refresh is
+    scheduled, and only a cold (or expired) key blocks on news.google.com.
+    When a snapshot client is given, refreshes read the headlines prefetched into
+    Redis by the scheduler first and only fall back to the RSS feed on a miss.
+    """
+
+    def __init__(self, ttl: int = HEADLINE_CACHE_TTL, stale_ttl: int = HEADLINE_CACHE_STALE_TTL,
+                 max_workers: int = HEADLINE_REFRESH_WORKERS, snapshot_client: Optional[Any] = None):
+        self.snapshot_client = snapshot_client
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._entries: Dict[Tuple[str, str], Tuple[float, List[Dict[str, str]]]] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="headline-refresh")
+
+    def get(self, country: str, query: Optional[str] = None) -> List[Dict[str, str]]:
+        """Return headlines for (country, query), refreshing in the background when stale."""
+        key = (country if country in COUNTRY_CODES else DEFAULT_COUNTRY,
+               normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            return self._refresh(key)
+
+        fetched_at, headlines = entry
+        age = time.monotonic() - fetched_at
+        if age >= self.stale_ttl:
+            logger.info(f"Headline cache entry {key} expired, refreshing inline")
+            return self._refresh(key)
+        if age >= self.ttl:
+            self._schedule_refresh(key)
+        return headlines
+
+    def _schedule_refresh(self, key: Tuple[str, str]) -> None:
+        """Start a background refresh for a key unless one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        logger.info(f"Serving stale headlines for {key}, refreshing in background")
+        self._executor.submit(self._refresh, key)
+
+    def _read_snapshot(self, key: Tuple[str, str]) -> Optional[List[Dict[str, str]]]:
+        """Read prefetched headlines from Redis, or None if unavailable."""
+        if self.snapshot_client is None:
+            return None
+        try:
+            value = self.snapshot_client.get(headline_key(*key))
+            headlines = json.loads(value) if value else None
+        except Exception as e:
+            logger.warning(f"Failed to read prefetched headlines for {key}: {e}")
+            return None
+        return headlines if isinstance(headlines, list) and headlines else None
+
+    def _refresh(self, key: Tuple[str, str]) -> List[Dict[str, str]]:
+        """Load headlines and store them; keep any previous entry if the fetch fails."""
+        headlines = self._read_snapshot(key)
+        if headlines is None:
+            url = build_feed_url(*key)
+            try:
+                headlines = top_news(url)
+            except Exception as e:
+                logger.error(f"Failed to refresh headlines from {url}: {e}")
+                headlines = ALT_HEADLINES
+
+        with self._lock:
+            self._refreshing.discard(key)
+            # top_news falls back to ALT_HEADLINES on errors; never cache the placeholder
+            if headlines is ALT_HEADLINES:
+                previous = self._entries.get(key)
+                return previous[1] if previous else headlines
+            self._entries[key] = (time.monotonic(), headlines)
+        return headlines
+
+    def invalidate(self, country: Optional[str] = None) -> None:
+        """Drop all cached entries, or only those for one country."""
+        with self._lock:
+            if country is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == country]:
+                    del self._entries[key]
+
+# --- Test Function ---
+
+
+def main_test():
+    cache = HeadlineCache(ttl=1, stale_ttl=60)
+    start = time.perf_counter()
+    headlines = cache.get("Nigeria", "sports")
+    logger.info(
+        f"Cold fetch: {len(headlines)} headlines in {time.perf_counter() - start:.3f}s")
+    time.sleep(1.5)
+    start = time.perf_counter()
+    headlines = cache.get("Nigeria", "sports")
+    logger.info(
+        f"Stale read: {len(headlines)} headlines in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main_test()
@@ -0,0 +1,128 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+import redis.asyncio as redis
+from app.redis_logic.async_redis import RedisClient
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Redis hash holding one JSON entry per job, readable from any process
+RUNS_KEY = "jobs:runs"
+
+
+@dataclass
+class JobRun:
+    running: bool = False
+    queued: bool = False
+    started_at: Optional[float] = None
+    last_started_at: Optional[float] = None
+    last_finished_at: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_status: Optional[str] = None
+    runs: int = 0
+    skipped: int = 0
+    queued_runs: int = 0
+
+# --- Job Run Registry Class ---
+
+
+class JobRunRegistry:
+    """
+    Tracks the state of each scheduled job in this process: whether it is running
+    or has a run queued behind it, how long the current run has taken, and the
+    duration and outcome of the last run. Every change is mirrored to a Redis hash
+    so the state can be inspected from outside the worker.
+    """
+
+    def __init__(self, redis_client: Optional[RedisClient] = None):
+        self.redis_client = redis_client
+        self._runs: Dict[str, JobRun] = {}
+
+    def _get(self, job_id: str) -> JobRun:
+        return self._runs.setdefault(job_id, JobRun())
+
+    def is_running(self, job_id: str) -> bool:
+        return self._get(job_id).running
+
+    def is_queued(self, job_id: str) -> bool:
+        return self._get(job_id).queued
+
+    async def skip(self, job_id: str) -> None:
+        """Record a run dropped because the job was already running (or queued)."""
+        run = self._get(job_id)
+        run.skipped += 1
+        logger.warning(f"Job '{job_id}' still running, skipping overlapping run "
+                       f"(running for {self.current_duration(job_id):.1f}s)")
+        await self._publish(job_id)
+
+    async def queue(self, job_id: str) -> None:
+        """Record a run waiting for the current one to finish."""
+        run = self._get(job_id)
+        run.queued = True
+        run.queued_runs += 1
+        logger.info(f"Job '{job_id}' still running, queueing next run")
+        await self._publish(job_id)
+
+    async def start(self, job_id: str) -> None:
+        run = self._get(job_id)
+        run.running = True
+        run.queued = False
+        run.started_at = time.time()
+        run.last_started_at = run.started_at
+        await self._publish(job_id)
+
+    async def finish(self, job_id: str, status: str) -> None:
+        run = self._get(job_id)
+        now = time.time()
+        run.running = False
+        run.last_finished_at = now
+        run.last_duration = round(now - run.started_at, 3)
+        run.last_status = status
+        run.started_at = None
+        run.runs += 1
+        logger.info(
+            f"Job '{job_id}' finished with status '{status}' in {run.last_duration}s")
+        await self._publish(job_id)
+
+    def current_duration(self, job_id: str) -> float:
+        """Seconds the current run has been going, or 0.0 if idle."""
+        run = self._get(job_id)
+        return time.time() - run.started_at if run.running else 0.0
+
+    def get_runs(self) -> Dict[str, Dict[str, Any]]:
+        """Return the state of every job, including the current run duration."""
+        return {
+            job_id: {**asdict(run), "current_duration": round(self.current_duration(job_id), 3)}
+            for job_id, run in self._runs.items()
+        }
+
+    async def _publish(self, job_id: str) -> None:
+        if self.redis_client is None:
+            return
+        try:
+            await self.redis_client.ensure_client()
+            await self.redis_client.execute_command(
+                self.redis_client.client.hset, RUNS_KEY, job_id,
+                json.dumps(asdict(self._get(job_id))))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish run state for '{job_id}': {e}")
+
+
+async def read_job_runs(redis_client: RedisClient) -> Dict[str, Dict[str, Any]]:
+    """Read every job's published run state from Redis."""
+    try:
+        await redis_client.ensure_client()
+        raw = await redis_client.execute_command(redis_client.client.hgetall, RUNS_KEY)
+    except redis.RedisError as e:
+        logger.error(f"Failed to read job runs: {e}")
+        return {}
+    runs = {job_id: json.loads(value) for job_id, value in raw.items()}
+    for run in runs.values():
+        run["current_duration"] = round(
+            time.time() - run["started_at"], 3) if run["running"] else 0.0
+    return runs
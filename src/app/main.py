@@ -5,22 +5,22 @@ from dash import dcc, html, dash_table
 import plotly.express as px
 # from redis import Redis
 from app.redis_logic.redis import RedisClient
+from app.aggregates.bursts import read_trending_sync
+from app.aggregates.daily_buckets import query_window_sync
+from redis.exceptions import RedisError
 # import os
 # from dotenv import load_dotenv
 import pandas as pd
 from urllib.parse import urlparse
 import json
-from datetime import datetime
-import asyncio
-import nest_asyncio
-from asgiref.wsgi import WsgiToAsgi  # Import the adapter
-import uvicorn
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+import os
+from datetime import datetime, timedelta
 import logging
 
-from .get_custom_data import get_data, top_news
-from .scheduler import startup_function, shutdown_function
+from .get_custom_data import get_data
+from .concurrency import run_coroutine
+from .headline_cache import HeadlineCache
+from .news_editions import EDITION_COUNTRIES, DEFAULT_COUNTRY, country_snapshot_key
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -38,9 +38,20 @@ logger = logging.getLogger(__name__)
 # print(f"DEBUG: NEWSAPI_KEY loaded: {NEWS_API}")
 # NEWS_URL = f"https://newsdata.io/api/1/latest?apikey={NEWS_API}&language=en&q=pizza"
 
-nest_asyncio.apply()
-
 client = RedisClient()
+# Upper bound on how long a custom search may hold a callback thread (seconds)
+CUSTOM_SEARCH_TIMEOUT = 45
+headline_cache = HeadlineCache(snapshot_client=client)
+# Dropdown values → window days and daily bucket categories (None: every category),
+# as in app.scheduled.store_in_redis, which the web tier doesn't import
+PERIOD_DAYS = {'monthly': 30, 'weekly': 7}
+BUCKET_CATEGORIES = {
+    'summary': None,
+    'business': 'Business',
+    'world': 'World',
+    'sports': 'Sports',
+    'sci_tech': 'Sci/Tech'
+}
 
 # --- 1. Prepare Dummy Data (Same as before) ---
 # Dropdown Options
@@ -80,30 +91,6 @@ country_options = [
     # You can add more as needed
 ]
 
-COUNTRY_CODES = {
-    'United States': {'gl': 'US', 'hl': 'en', 'ceid': 'US:en'},
-    'Canada': {'gl': 'CA', 'hl': 'en', 'ceid': 'CA:en'},
-    'United Kingdom': {'gl': 'GB', 'hl': 'en', 'ceid': 'GB:en'},
-    # English news from Germany
-    'Germany': {'gl': 'DE', 'hl': 'en', 'ceid': 'DE:en'},
-    'Australia': {'gl': 'AU', 'hl': 'en', 'ceid': 'AU:en'},
-    # 5 Most Popular Countries added
-    'India': {'gl': 'IN', 'hl': 'en', 'ceid': 'IN:en'},
-    # English news from France
-    'France_en': {'gl': 'FR', 'hl': 'en', 'ceid': 'FR:en'},
-    # English news from Japan
-    'Japan_en': {'gl': 'JP', 'hl': 'en', 'ceid': 'JP:en'},
-    # English news from Brazil
-    'Brazil_en': {'gl': 'BR', 'hl': 'en', 'ceid': 'BR:en'},
-    # English news from China
-    'China_en': {'gl': 'CN', 'hl': 'en', 'ceid': 'CN:en'},
-    # Countries you specifically asked about
-    'Nigeria': {'gl': 'NG', 'hl': 'en', 'ceid': 'NG:en'},
-    'Netherlands_en': {'gl': 'NL', 'hl': 'en', 'ceid': 'NL:en'},
-    # Dutch news for Netherlands
-    'Netherlands_nl': {'gl': 'NL', 'hl': 'nl', 'ceid': 'NL:nl'},
-    'Zambia': {'gl': 'ZM', 'hl': 'en', 'ceid': 'ZM:en'},
-}
 custom_search_output_children = None
 
 client.initialize()
@@ -219,15 +206,70 @@ def create_news_item_component(title, link):
 #     article['title'], article['link']) for article in news_articles]
 
 
+def get_snapshot(time_value, category_value, country=None):
+    """
+    Snapshot of a period/category from Redis, for `country` (a country dropdown
+    value) when it has articles in the window, otherwise the global one.
+    Returns (data, country label or None).
+    """
+    label = f"{time_value}_{category_value}"
+    if country in EDITION_COUNTRIES:
+        data = client.get(country_snapshot_key(EDITION_COUNTRIES[country], label))
+        if data:
+            return json.loads(data), country.split('_')[0]
+    return json.loads(client.get(label)), None
+
+
+def snapshot_figures(data, country=None):
+    """Top sources table rows, line graph and pie chart of a snapshot."""
+    line_graph = data['line_graph']
+    timestamps = [datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
+                  for ts_str in line_graph.keys()]
+    sentiments = list(line_graph.values())
+    df_line = pd.DataFrame({
+        "Timestamp": timestamps,
+        "Sentiment Score": sentiments
+    })
+
+    df = df_line.sort_values(by="Timestamp")
+    title = f"Sentiment Trend: {country}" if country else "Overall Sentiment Trend"
+    fig_line = px.line(df, x="Timestamp", y="Sentiment Score", title=title,
+                       markers=True, line_shape="linear")
+    fig_line.update_layout(hovermode="x unified", template="plotly_white",
+                           xaxis_rangeslider_visible=True)
+
+    pie_chart = data['pie_chart']
+    pie_data = [
+        pie_chart.get('good', 0),
+        pie_chart.get('okay', 0),
+        pie_chart.get('bad', 0)
+    ]
+    total = sum(pie_data) or 1  # Avoid division by zero
+    pie_data = [int(round(x / total * 100)) for x in pie_data]
+    df_pie = pd.DataFrame({
+        "Sentiment": ["Positive", "Neutral", "Negative"],
+        "Count": pie_data
+    })
+    fig_pie = px.pie(df_pie, names="Sentiment", values="Count", title="Sentiment Distribution",
+                     color_discrete_map={'Positive': '#28a745', 'Neutral': '#ffc107', 'Negative': '#dc3545'})
+    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+    fig_pie.update_layout(showlegend=True)
+
+    df_table = pd.DataFrame({
+        "Sources": [i['source'] for i in data['top_sources']],
+        "Art. Count": [i['article_count'] for i in data['top_sources']],
+        "Avg. Sentiment": [i['avg_sentiment'] for i in data['top_sources']]
+    })
+    return df_table.to_dict('records'), fig_line, fig_pie
+
+
 # --- 2. Initialize Dash App ---
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[
                 dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME])
 # Added dbc.icons.FONT_AWESOME for a potential settings icon on the button
 
-# EXPOSE THE SERVER for Gunicorn
-# wsgi_app = app.server  # This line is essential!
-# wsgi_app = app.server
-# asgi_app = WsgiToAsgi(wsgi_app)
+# Flask server, wrapped for ASGI workers by app.serve
+server = app.server
 
 
 # --- 3. Define Dashboard Layout ---
@@ -426,6 +468,58 @@ app.layout = dbc.Container([
             md=6,
             className="mb-4"
         )
+    ], className="mb-4"),
+
+    # Row 5: Keywords extracted at ingestion
+    dbc.Row([
+        dbc.Col(
+            dbc.Card([
+                dbc.CardHeader("Top Keywords", className="h5"),
+                dbc.CardBody(
+                    dash_table.DataTable(
+                        id='term-table',
+                        columns=[{"name": i, "id": i}
+                                 for i in ["Keyword", "Mentions", "Avg. Sentiment"]],
+                        style_table={'overflowX': 'auto'},
+                        style_header={
+                            'backgroundColor': 'white',
+                            'fontWeight': 'bold'
+                        },
+                        style_data_conditional=[
+                            {'if': {'row_index': 'odd'},
+                                'backgroundColor': 'rgb(248, 248, 248)'}
+                        ],
+                        export_headers='display',
+                        export_format='xlsx'
+                    )
+                )
+            ], className="shadow-sm border-0"),
+            md=6,
+            className="mb-4"
+        ),
+        dbc.Col(
+            dbc.Card([
+                dbc.CardHeader("Trending Now", className="h5"),
+                dbc.CardBody(
+                    dash_table.DataTable(
+                        id='trending-table',
+                        columns=[{"name": i, "id": i}
+                                 for i in ["Keyword", "Recent Mentions", "Usual", "Z-score"]],
+                        style_table={'overflowX': 'auto'},
+                        style_header={
+                            'backgroundColor': 'white',
+                            'fontWeight': 'bold'
+                        },
+                        style_data_conditional=[
+                            {'if': {'row_index': 'odd'},
+                                'backgroundColor': 'rgb(248, 248, 248)'}
+                        ]
+                    )
+                )
+            ], className="shadow-sm border-0"),
+            md=6,
+            className="mb-4"
+        )
     ], className="mb-4")
 
 ], fluid=True, className="p-4")
@@ -447,6 +541,69 @@ def toggle_offcanvas(n_clicks, is_open):
     return is_open
 
 
+# Callback to fill the keyword table from the daily buckets of the selected period/category
+@app.callback(
+    Output('term-table', 'data'),
+    [
+        Input('time-dropdown', 'value'),
+        Input('category-dropdown', 'value'),
+        Input('interval-component', 'n_intervals')
+    ]
+)
+def update_term_table(selected_time_value, selected_category_value, n):
+    # The dropdowns are reset to None in custom search mode; keep the last table
+    if selected_time_value is None or selected_category_value is None:
+        raise dash.exceptions.PreventUpdate
+    days = PERIOD_DAYS.get(selected_time_value)
+    if days is None or selected_category_value not in BUCKET_CATEGORIES:
+        raise dash.exceptions.PreventUpdate
+    # Merged from the buckets on every refresh, so the window is always the last `days` days
+    now = datetime.utcnow()
+    try:
+        terms = query_window_sync(client, now - timedelta(days=days), now,
+                                  BUCKET_CATEGORIES[selected_category_value])['top_terms']
+    except RedisError as e:
+        logger.error(f"Failed to read keywords from the daily buckets: {e}")
+        terms = []
+    if not terms:
+        # No buckets yet (first deploy); the stored snapshot may still have them
+        data = client.get(f"{selected_time_value}_{selected_category_value}")
+        terms = json.loads(data).get('top_terms', []) if data else []
+    return [
+        {
+            "Keyword": term.get('term', ''),
+            "Mentions": term.get('article_count', 0),
+            "Avg. Sentiment": term.get('avg_sentiment', 0)
+        } for term in terms
+    ]
+
+
+# Callback to fill the trending table from the burst detector's output for the selected category
+@app.callback(
+    Output('trending-table', 'data'),
+    [
+        Input('category-dropdown', 'value'),
+        Input('interval-component', 'n_intervals')
+    ]
+)
+def update_trending_table(selected_category_value, n):
+    if selected_category_value is None:
+        raise dash.exceptions.PreventUpdate
+    try:
+        trending = read_trending_sync(client, selected_category_value)
+    except RedisError as e:
+        logger.error(f"Failed to read trending terms: {e}")
+        return []
+    return [
+        {
+            "Keyword": term['term'],
+            "Recent Mentions": term['recent'],
+            "Usual": term['baseline'],
+            "Z-score": term['z_score']
+        } for term in trending
+    ]
+
+
 # Callback to fetch data on page load or interval
 
 # Callback to render components
@@ -553,8 +710,7 @@ def render_components(pathname, n):
 
         # News Bar
         try:
-            news_articles = top_news(
-                'https://news.google.com/rss?hl=en-US&gl=NG&ceid=US:en')
+            news_articles = headline_cache.get('United States')
             news_children = [create_news_item_component(
                 article['title'], article['link']) for article in news_articles]
         except Exception as e:
@@ -747,8 +903,7 @@ def handle_default_search_button(n_clicks, search_mode):
 
         df_table_json = df_table.to_dict('records')
         # Dummy News Articles for Scrollable Feed
-        news_articles = top_news(
-            "https://news.google.com/rss?hl=en-US&gl=NG&ceid=US:en")
+        news_articles = headline_cache.get('United States')
 
         news_elements = [create_news_item_component(
             article['title'], article['link']) for article in news_articles]
@@ -862,10 +1017,12 @@ def handle_default_search_button(n_clicks, search_mode):
     State("custom-search-query-input", "value"),
     # Input: Get the last stored query
     State("last-searched-query-store", "data"),
+    # Results are cached per (query, country edition)
+    State("country-dropdown", "value"),
     prevent_initial_call=True,
     running=[(Output("apply-custom-search", "disabled"), True, False)]
 )
-def perform_custom_search(n_clicks, current_search_query, last_searched_query):
+def perform_custom_search(n_clicks, current_search_query, last_searched_query, selected_country):
     # Ensure n_clicks is not None (first load scenario) and remove leading/trailing whitespace
     if n_clicks is None:
         raise dash.exceptions.PreventUpdate
@@ -881,8 +1038,16 @@ def perform_custom_search(n_clicks, current_search_query, last_searched_query):
             style={'text-align': 'center'}
         )
 
-        dates, sentiments, pie_data, top_headlines = get_data(
-            cleaned_current_query)
+        try:
+            # get_data is async; run it on the shared loop so identical searches
+            # from other callbacks join the same upstream request
+            dates, sentiments, pie_data, top_headlines = run_coroutine(
+                get_data(cleaned_current_query, selected_country or DEFAULT_COUNTRY),
+                timeout=CUSTOM_SEARCH_TIMEOUT)
+        except Exception as e:
+            logger.error(
+                f"Custom search for '{cleaned_current_query}' failed: {e}")
+            dates, sentiments, pie_data, top_headlines = [], [], [0, 0, 0], []
         if dates == []:
             search_message = html.Div(
                 dbc.Alert(
@@ -917,7 +1082,8 @@ def perform_custom_search(n_clicks, current_search_query, last_searched_query):
             article['title'], article['link']) for article in top_headlines]
 
         # Return the message and update the store with the new query
-        return search_message, cleaned_current_query, [], fig_line, fig_pie, news_elements, "United States"
+        # The headlines are already for the selected country; keep it selected
+        return search_message, cleaned_current_query, [], fig_line, fig_pie, news_elements, dash.no_update
     elif not cleaned_current_query:
         # User pressed search with an empty input
         search_message = html.Div(
@@ -941,10 +1107,15 @@ def perform_custom_search(n_clicks, current_search_query, last_searched_query):
 @app.callback(
     # allow_duplicate=True is important!
     Output('news-bar', 'children', allow_duplicate=True),
-    # No other outputs for now, but you could add more for other dashboards if needed
+    # In default mode the charts switch to the country's sentiment snapshot
+    Output('keyword-table', 'data', allow_duplicate=True),
+    Output('sentiment-line-graph', 'figure', allow_duplicate=True),
+    Output('sentiment-pie-chart', 'figure', allow_duplicate=True),
     Input("country-dropdown", "value"),
     State("search-mode", "data"),  # Corrected ID: 'search-mode-store'
     State("last-searched-query-store", "data"),
+    State('time-dropdown', 'value'),
+    State('category-dropdown', 'value'),
     prevent_initial_call=True  # Prevents the callback from firing on app load
     # running=[(Output("custom-search-output", "children"), html.Div(
     #     dbc.Alert(f"Getting country news from our system",
@@ -952,47 +1123,34 @@ def perform_custom_search(n_clicks, current_search_query, last_searched_query):
     #     style={'text-align': 'center'}
     # ), html.Div())]
 )
-def top_news_in_country(selected_country_value, current_search_mode, last_searched_query):
+def top_news_in_country(selected_country_value, current_search_mode, last_searched_query,
+                        selected_time_value, selected_category_value):
     # Ensure current_search_mode is not None (e.g., during very initial load if store hasn't populated)
     if current_search_mode is None:
         raise dash.exceptions.PreventUpdate
 
-    # Get country parameters
-    # Use .get() with a default to prevent KeyError if selected_country_value is unexpected
-    country_params = COUNTRY_CODES.get(
-        selected_country_value, COUNTRY_CODES['United States'])
-    hl = country_params['hl']
-    gl = country_params['gl']
-    ceid = country_params['ceid']
-
     news_elements = []  # Initialize news_elements to an empty list
+    charts = (dash.no_update, dash.no_update, dash.no_update)
 
     if current_search_mode == 'default':
         # In default mode, get general top news for the selected country
-        url = f"https://news.google.com/rss?hl={hl}-{gl}&gl={gl}&ceid={ceid}"
-        # Debugging
-        print(
-            f"Fetching default news for {selected_country_value} from URL: {url}")
-        top_headlines = top_news(url)
+        # Served from the headline cache; stale entries refresh in the background
+        top_headlines = headline_cache.get(selected_country_value)
         news_elements = [create_news_item_component(
             article['title'], article['link']) for article in top_headlines]
+        if selected_time_value and selected_category_value:
+            try:
+                charts = snapshot_figures(*get_snapshot(
+                    selected_time_value, selected_category_value, selected_country_value))
+            except (RedisError, TypeError, KeyError, ValueError) as e:
+                logger.error(f"Failed to load country sentiment snapshot: {e}")
 
     elif current_search_mode == 'custom':
         # In custom mode, use the last searched query with the new country
         if last_searched_query:  # Check if there's actually a query to search for
-            # Ensure the query is URL-encoded if it contains spaces or special characters
-            # requests.get will handle this mostly, but for constructing the URL,
-            # it's good practice to ensure it's clean for the 'q' parameter.
-            # However, Google News RSS often handles spaces naturally with just '+'
-            # Let's revert to last_searched_query directly for query part, as it's cleaner.
-            cleaned_input_for_url = last_searched_query.strip().replace(
-                ' ', '+')  # Replace spaces with '+'
-
-            url = f"https://news.google.com/rss/search?q={cleaned_input_for_url}&hl={hl}&gl={gl}&ceid={ceid}"
-            # Debugging
-            print(
-                f"Fetching custom news for '{last_searched_query}' in {selected_country_value} from URL: {url}")
-            top_headlines = top_news(url)
+            # The cache URL-encodes the query and keys it by (country, query)
+            top_headlines = headline_cache.get(
+                selected_country_value, last_searched_query)
             news_elements = [create_news_item_component(
                 article['title'], article['link']) for article in top_headlines]
         else:
@@ -1020,7 +1178,7 @@ def top_news_in_country(selected_country_value, current_search_mode, last_search
             style={'text-align': 'center'}
         )
 
-    return news_elements
+    return (news_elements, *charts)
 
 
 @app.callback(
@@ -1049,77 +1207,14 @@ def time_and_cat_sort(selected_time_value, selected_category_value, selected_cou
         print("Time or Category dropdown value is None, preventing update.")
         raise dash.exceptions.PreventUpdate
 
-    redis_key = f"{selected_time_value}_{selected_category_value}"
-    data = client.get(redis_key)
-
-    data = json.loads(data)
-
-    # Dummy Data for Line Graph
-    line_graph = data['line_graph']
-    # timestamps = line_graph.keys()
-    timestamps = [datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                  for ts_str in line_graph.keys()]
-    sentiments = list(line_graph.values())
-    df_line = pd.DataFrame({
-        "Timestamp": timestamps,
-        "Sentiment Score": sentiments
-    })
-
-    df = df_line.sort_values(by="Timestamp")
-    fig_line = px.line(df, x="Timestamp", y="Sentiment Score", title="Overall Sentiment Trend",
-                       markers=True, line_shape="linear")
-    fig_line.update_layout(hovermode="x unified", template="plotly_white",
-                           xaxis_rangeslider_visible=True)
-
-    # Dummy Data for Pie Chart
-    pie_chart = data['pie_chart']
-    pie_data = [
-        pie_chart.get('good', 0),
-        pie_chart.get('okay', 0),
-        pie_chart.get('bad', 0)
-    ]
-    total = sum(pie_data) or 1  # Avoid division by zero
-    pie_data = [int(round(x / total * 100)) for x in pie_data]
-    df_pie = pd.DataFrame({
-        "Sentiment": ["Positive", "Neutral", "Negative"],
-        "Count": pie_data
-    })
-    fig_pie = px.pie(df_pie, names="Sentiment", values="Count", title="Sentiment Distribution",
-                     color_discrete_map={'Positive': '#28a745', 'Neutral': '#ffc107', 'Negative': '#dc3545'})
-    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-    fig_pie.update_layout(showlegend=True)
-
-    # Dummy Data for Table
-    top_sources = data['top_sources']
-    sources = []
-    article_counts = []
-    avg_sentiments = []
-
-    for i in top_sources:
-        sources.append(i['source'])
-        article_counts.append(i['article_count'])
-        avg_sentiments.append(i['avg_sentiment'])
-
-    df_table = pd.DataFrame({
-        "Sources": sources,
-        "Art. Count": article_counts,
-        "Avg. Sentiment": avg_sentiments
-    })
-
-    df_table_json = df_table.to_dict('records')
-    # Dummy News Articles for Scrollable Feed
-
-    country_params = COUNTRY_CODES.get(
-        selected_country, COUNTRY_CODES['United States'])
-    hl = country_params['hl']
-    gl = country_params['gl']
-    ceid = country_params['ceid']
+    # The selected country's snapshot, or the global one if it has none
+    data, country = get_snapshot(
+        selected_time_value, selected_category_value, selected_country)
+    df_table_json, fig_line, fig_pie = snapshot_figures(data, country)
 
-    url = f"https://news.google.com/rss/search?q={selected_category_value}&hl={hl}-{gl}&gl={gl}&ceid={ceid}"
-    if selected_category_value == "summary":
-        url = f"https://news.google.com/rss?hl={hl}-{gl}&gl={gl}&ceid={ceid}"
-
-    news_articles = top_news(url)
+    # "summary" maps to the country's top stories inside the headline cache
+    news_articles = headline_cache.get(
+        selected_country, selected_category_value)
     news_elements = [create_news_item_component(
         article['title'], article['link']) for article in news_articles]
 
@@ -1131,59 +1226,9 @@ def time_and_cat_sort(selected_time_value, selected_category_value, selected_cou
     )
 
 
-# @asynccontextmanager
-# async def lifespan(app: WsgiToAsgi) -> AsyncGenerator[None, None]:
-#     """
-#     Manage the startup and shutdown of the scheduler alongside the ASGI app.
-#     """
-#     try:
-#         await startup_function()  # Start the scheduler before the app
-#         logger.info("Application startup completed")
-#         yield
-#     finally:
-#         await shutdown_function()  # Shut down the scheduler after the app
-#         logger.info("Application shutdown completed")
-
-
-# def get_lifespan():
-#     """Return the lifespan context manager for Uvicorn."""
-#     return lifespan(asgi_app)
-
-
-# async def main():
-#     config = uvicorn.Config(asgi_app, host="0.0.0.0", port=8000)
-#     server = uvicorn.Server(config)
-#     try:
-#         await startup_function()  # Run startup tasks
-#         logger.info("Application startup completed")
-#         await server.serve()      # Start the server
-#     finally:
-#         await shutdown_function()  # Ensure shutdown tasks run
-#         logger.info("Application shutdown completed")
-
 if __name__ == "__main__":
-    try:
-        app.run(port="8000", debug=True)
-    except Exception as e:
-        pass
-    # uvicorn.run(
-    #     asgi_app,  # Use the ASGI-wrapped Dash app
-    #     host="0.0.0.0",
-    #     port=8000,
-    #     # lifespan="on",  # Enable lifespan events
-    #     lifespan=get_lifespan)
-
-
-# # Run the App
-# if __name__ == '__main__':
-
-#     loop = asyncio.new_event_loop()
-#     asyncio.set_event_loop(loop)
-
-#     # Schedule the main() task
-#     loop.create_task(main())
-
-    # app.run()
+    # Development server only; use `python -m app.serve` in production
+    app.run(port="8000", debug=os.getenv("DASH_DEBUG", "true").lower() == "true")
 
 # @app.callback(
 #     Output('news-bar', 'children', allow_duplicate=True),
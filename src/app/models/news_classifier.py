@@ -3,6 +3,7 @@
 # from sklearn.pipeline import Pipeline
 # from datasets import load_dataset, load_from_disk
 import os
+import hashlib
 import joblib
 
 
@@ -24,6 +25,9 @@ import joblib
 model_path = os.path.join(os.path.dirname(__file__), "ag_news_classifier.pkl")
 # joblib.dump(pipeline, model_path)       # Save
 model = joblib.load(model_path)         # Load
+# Changes whenever the pickled model is retrained
+with open(model_path, "rb") as f:
+    CLASSIFIER_MODEL_VERSION = f"agnews-{hashlib.sha256(f.read()).hexdigest()[:12]}"
 
 # Save model
 
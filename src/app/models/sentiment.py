@@ -1,7 +1,13 @@
+from importlib.metadata import PackageNotFoundError, version
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 analyzer = SentimentIntensityAnalyzer()
 
+try:
+    SENTIMENT_MODEL_VERSION = f"vader-{version('vaderSentiment')}"
+except PackageNotFoundError:
+    SENTIMENT_MODEL_VERSION = "vader"
+
 
 def analyze_sentiment(text):
     score = analyzer.polarity_scores(text)
@@ -0,0 +1,5 @@
+from app.models.sentiment import SENTIMENT_MODEL_VERSION
+from app.models.news_classifier import CLASSIFIER_MODEL_VERSION
+
+# Stored with each article; rows with another version are re-scored by app.scheduled.rescore_articles
+MODEL_VERSION = f"{SENTIMENT_MODEL_VERSION}+{CLASSIFIER_MODEL_VERSION}"
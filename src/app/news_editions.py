@@ -0,0 +1,87 @@
+from typing import Optional
+from urllib.parse import quote_plus
+
+# --- Google News Editions ---
+COUNTRY_CODES = {
+    'United States': {'gl': 'US', 'hl': 'en', 'ceid': 'US:en'},
+    'Canada': {'gl': 'CA', 'hl': 'en', 'ceid': 'CA:en'},
+    'United Kingdom': {'gl': 'GB', 'hl': 'en', 'ceid': 'GB:en'},
+    # English news from Germany
+    'Germany': {'gl': 'DE', 'hl': 'en', 'ceid': 'DE:en'},
+    'Australia': {'gl': 'AU', 'hl': 'en', 'ceid': 'AU:en'},
+    # 5 Most Popular Countries added
+    'India': {'gl': 'IN', 'hl': 'en', 'ceid': 'IN:en'},
+    # English news from France
+    'France_en': {'gl': 'FR', 'hl': 'en', 'ceid': 'FR:en'},
+    # English news from Japan
+    'Japan_en': {'gl': 'JP', 'hl': 'en', 'ceid': 'JP:en'},
+    # English news from Brazil
+    'Brazil_en': {'gl': 'BR', 'hl': 'en', 'ceid': 'BR:en'},
+    # English news from China
+    'China_en': {'gl': 'CN', 'hl': 'en', 'ceid': 'CN:en'},
+    # Countries you specifically asked about
+    'Nigeria': {'gl': 'NG', 'hl': 'en', 'ceid': 'NG:en'},
+    'Netherlands_en': {'gl': 'NL', 'hl': 'en', 'ceid': 'NL:en'},
+    # Dutch news for Netherlands
+    'Netherlands_nl': {'gl': 'NL', 'hl': 'nl', 'ceid': 'NL:nl'},
+    'Zambia': {'gl': 'ZM', 'hl': 'en', 'ceid': 'ZM:en'},
+}
+DEFAULT_COUNTRY = 'United States'
+
+# Category dropdown values; "summary" is the edition's top stories
+HEADLINE_CATEGORIES = ['summary', 'business', 'world', 'sports', 'sci_tech']
+
+# newsdata.io country names (as stored in the countries table) of the editions,
+# for the per-country sentiment snapshots
+EDITION_COUNTRIES = {
+    'United States': 'united states of america',
+    'Canada': 'canada',
+    'United Kingdom': 'united kingdom',
+    'Germany': 'germany',
+    'Australia': 'australia',
+    'India': 'india',
+    'France_en': 'france',
+    'Japan_en': 'japan',
+    'Brazil_en': 'brazil',
+    'China_en': 'china',
+    'Nigeria': 'nigeria',
+    # newsdata.io's spelling
+    'Netherlands_en': 'netherland',
+    'Netherlands_nl': 'netherland',
+    'Zambia': 'zambia',
+}
+
+# --- Utility Functions ---
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Normalize a headline query; the 'summary' category means top stories."""
+    if not query:
+        return ""
+    query = " ".join(query.split()).lower()
+    return "" if query == "summary" else query
+
+
+def build_feed_url(country: str, query: Optional[str] = None) -> str:
+    """Build the Google News RSS URL for a country edition and optional search query."""
+    params = COUNTRY_CODES.get(country, COUNTRY_CODES[DEFAULT_COUNTRY])
+    hl, gl, ceid = params['hl'], params['gl'], params['ceid']
+    query = normalize_query(query)
+    if not query:
+        return f"https://news.google.com/rss?hl={hl}-{gl}&gl={gl}&ceid={ceid}"
+    return f"https://news.google.com/rss/search?q={quote_plus(query)}&hl={hl}-{gl}&gl={gl}&ceid={ceid}"
+
+
+def country_snapshot_key(country: str, label: str) -> str:
+    """
+    Redis key of a per-country sentiment snapshot, e.g. "country:nigeria:weekly_sci_tech".
+    `country` is a stored (newsdata.io) country name and `label` a global snapshot
+    key ("{period}_{category}"), so every cell of the country x category x period
+    matrix has its own key.
+    """
+    return f"country:{'_'.join(country.lower().split())}:{label}"
+
+
+def headline_key(country: str, query: Optional[str] = None) -> str:
+    """Redis key under which prefetched headlines for (country, query) are stored."""
+    return f"headlines:{country}:{normalize_query(query) or 'summary'}"
@@ -106,12 +106,12 @@ class RedisClient:
             self.circuit_breaker.record_failure()
             raise
 
-    async def set(self, key: str, value: str) -> bool:
-        """Set a key-value pair in Redis."""
+    async def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        """Set a key-value pair in Redis, optionally expiring after `ex` seconds."""
         if not self.circuit_breaker.can_execute():
             return False
         try:
-            await self.execute_command(self.client.set, key, value)
+            await self.execute_command(self.client.set, key, value, ex=ex)
             logger.info(f"Set Redis key: {key}")
             return True
         except redis.RedisError as e:
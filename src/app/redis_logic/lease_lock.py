@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import redis.asyncio as redis
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Lock Configuration ---
+JOB_LOCK_TTL = int(os.getenv("JOB_LOCK_TTL", "60"))
+
+# Extend the lease only while we still own it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Delete the lease only while we still own it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Record a hold duration: running total, last and maximum
+HOLD_METRICS_SCRIPT = """
+redis.call('HINCRBY', KEYS[1], 'hold_ms_total', ARGV[1])
+redis.call('HSET', KEYS[1], 'last_hold_ms', ARGV[1])
+local max = tonumber(redis.call('HGET', KEYS[1], 'hold_ms_max') or '0')
+if tonumber(ARGV[1]) > max then
+    redis.call('HSET', KEYS[1], 'hold_ms_max', ARGV[1])
+end
+return 1
+"""
+
+
+# Write keys only if ARGV[1] is still the latest token issued for the lock (KEYS[1]).
+# KEYS[2..n+1] are set to ARGV[4..n+3] (with a PX of ARGV[3] ms unless it is 0),
+# where n = ARGV[2]; the remaining keys are deleted.
+FENCED_WRITE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local n = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+for i = 1, n do
+    if ttl > 0 then
+        redis.call('SET', KEYS[i + 1], ARGV[i + 3], 'PX', ttl)
+    else
+        redis.call('SET', KEYS[i + 1], ARGV[i + 3])
+    end
+end
+for i = n + 2, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+return 1
+"""
+
+# (lock name, fencing token) of the lease the current job runs under. Set by
+# LeaseLock.run for the job's task, so protected writes can check the token
+# without it being threaded through every call.
+current_lease: ContextVar[Optional[Tuple[str, int]]] = ContextVar("current_lease", default=None)
+
+
+class LeaseLostError(Exception):
+    """Raised when a lease expires or is taken over while its job is still running."""
+
+
+class FencingError(Exception):
+    """Raised when a write carries a fencing token older than the lock's latest one."""
+
+# --- Lease Lock Class ---
+
+
+class LeaseLock:
+    """
+    Redis lease lock that lets exactly one process run a named job at a time.
+
+    Acquiring stores the owner under the lock key with SET NX PX and then takes a
+    fencing token from a monotonically increasing counter. While the job runs the
+    lease is renewed every ttl/3; if it cannot be renewed before it expires (or
+    another owner holds it) the job is cancelled.
+
+    Cancellation can come too late for a holder that stalls (e.g. a long GC or
+    event-loop pause) past the TTL, so the job runs with its token in
+    `current_lease` and the protected writes check it: database transactions
+    through app.db_logic.fencing.check_fence, Redis snapshot and bucket writes
+    through fenced_write. A stale holder's writes are then rejected with
+    FencingError. Acquisitions, contention, lost leases and hold times are counted
+    in a Redis hash per lock.
+    """
+
+    def __init__(self, redis_client: RedisClient, name: str, ttl: int = JOB_LOCK_TTL):
+        self.redis_client = redis_client
+        self.name = name
+        self.ttl_ms = ttl * 1000
+        self.renew_interval = ttl / 3
+        self.key = f"lock:{name}"
+        self.fence_key = f"lock:{name}:fence"
+        self.metrics_key = f"lock:{name}:metrics"
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: Optional[int] = None
+        self._value: Optional[str] = None
+        self._acquired_at = 0.0
+        self._expires_at = 0.0
+
+    async def _command(self, func_name: str, *args, **kwargs) -> Any:
+        await self.redis_client.ensure_client()
+        return await self.redis_client.execute_command(
+            getattr(self.redis_client.client, func_name), *args, **kwargs)
+
+    async def _count(self, field: str) -> None:
+        try:
+            await self._command("hincrby", self.metrics_key, field, 1)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update lock metrics for '{self.name}': {e}")
+
+    async def acquire(self) -> Optional[int]:
+        """Try to take the lease. Returns the fencing token, or None if another owner holds it."""
+        value = self.owner
+        if not await self._command("set", self.key, value, nx=True, px=self.ttl_ms):
+            await self._count("contended")
+            return None
+        # Only holders take a token, so the counter is always the current holder's
+        token = await self._command("incr", self.fence_key)
+        self.token = token
+        self._value = value
+        self._acquired_at = time.monotonic()
+        self._expires_at = self._acquired_at + self.ttl_ms / 1000
+        await self._count("acquired")
+        try:
+            await self._command("hset", self.metrics_key, mapping={
+                "last_token": token, "last_owner": self.owner,
+                "last_acquired_at": int(time.time())})
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update lock metrics for '{self.name}': {e}")
+        logger.info(f"Acquired lock '{self.name}' with fencing token {token}")
+        return token
+
+    async def renew(self) -> bool:
+        """
+        Extend the lease. Returns False once it can no longer be trusted: another
+        owner holds it, or Redis has been unreachable until it expired.
+        """
+        started = time.monotonic()
+        try:
+            renewed = await self._command("eval", RENEW_SCRIPT, 1, self.key,
+                                          self._value, self.ttl_ms)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to renew lock '{self.name}': {e}")
+            return time.monotonic() < self._expires_at
+        if not renewed:
+            return False
+        self._expires_at = started + self.ttl_ms / 1000
+        return True
+
+    async def release(self) -> None:
+        """Release the lease if still owned and record how long it was held."""
+        if self._value is None:
+            return
+        hold_ms = int((time.monotonic() - self._acquired_at) * 1000)
+        try:
+            await self._command("eval", RELEASE_SCRIPT, 1, self.key, self._value)
+            await self._command("eval", HOLD_METRICS_SCRIPT, 1, self.metrics_key, hold_ms)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release lock '{self.name}': {e}")
+        logger.info(
+            f"Released lock '{self.name}' (token {self.token}) after {hold_ms} ms")
+        self._value = None
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Run func() while holding the lease.
+
+        Returns:
+            True if the job ran here, False if another owner holds the lease.
+
+        Raises:
+            LeaseLostError: If the lease was lost and the job was cancelled.
+        """
+        if await self.acquire() is None:
+            logger.info(f"Lock '{self.name}' held elsewhere, skipping job")
+            return False
+        # The job's task copies the context, so its writes see this lease's token
+        lease = current_lease.set((self.name, self.token))
+        try:
+            job = asyncio.ensure_future(func())
+        finally:
+            current_lease.reset(lease)
+        try:
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=self.renew_interval)
+                if done:
+                    job.result()
+                    return True
+                if not await self.renew():
+                    job.cancel()
+                    await self._count("lost")
+                    raise LeaseLostError(
+                        f"Lost lock '{self.name}' (token {self.token}), job cancelled")
+        finally:
+            if not job.done():
+                job.cancel()
+            await self.release()
+
+
+async def fenced_write(redis_client: RedisClient, sets: Dict[str, str],
+                       deletes: Iterable[str] = (), ttl: Optional[int] = None) -> None:
+    """
+    Set (with an optional TTL in seconds) and delete keys in one atomic step. Under
+    a lease (see current_lease) the write only happens while the lease's token is
+    still the latest one issued for its lock; otherwise FencingError is raised.
+    Outside a lease (e.g. a manual run) the keys are written unconditionally.
+    """
+    deletes = list(deletes)
+    if not sets and not deletes:
+        return
+    await redis_client.ensure_client()
+    client = redis_client.client
+    lease = current_lease.get()
+    if lease is None:
+        async with client.pipeline(transaction=True) as pipe:
+            for key, value in sets.items():
+                pipe.set(key, value, ex=ttl)
+            if deletes:
+                pipe.delete(*deletes)
+            await redis_client.execute_command(pipe.execute)
+        return
+    name, token = lease
+    keys = [f"lock:{name}:fence", *sets, *deletes]
+    written = await redis_client.execute_command(
+        client.eval, FENCED_WRITE_SCRIPT, len(keys), *keys,
+        token, len(sets), (ttl or 0) * 1000, *sets.values())
+    if not written:
+        raise FencingError(f"Fencing token {token} of lock '{name}' is stale, write rejected")
+
+
+async def get_lock_metrics(redis_client: RedisClient, name: str) -> Dict[str, int]:
+    """Return acquisition, contention, loss and hold-time counters for a lock."""
+    raw = {}
+    try:
+        await redis_client.ensure_client()
+        raw = await redis_client.execute_command(
+            redis_client.client.hgetall, f"lock:{name}:metrics")
+    except redis.RedisError as e:
+        logger.error(f"Failed to read lock metrics for '{name}': {e}")
+    return {field: int(raw.get(field, 0)) for field in (
+        "acquired", "contended", "lost", "hold_ms_total", "hold_ms_max",
+        "last_hold_ms", "last_token")}
+
+# --- Test Function ---
+
+
+async def main_test():
+    redis_client = RedisClient(REDIS_URL)
+    try:
+        await redis_client.initialize()
+
+        async def job():
+            await asyncio.sleep(2)
+
+        # Two replicas race for the same job; only one should run it
+        first = LeaseLock(redis_client, "lock_test", ttl=3)
+        second = LeaseLock(redis_client, "lock_test", ttl=3)
+        ran = await asyncio.gather(first.run(job), second.run(job))
+        logger.info(f"Ran: {ran}")
+        logger.info(f"Metrics: {await get_lock_metrics(redis_client, 'lock_test')}")
+    finally:
+        await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main_test())
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+import redis.asyncio as redis
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Cache Configuration ---
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "900"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "500"))
+
+# --- Query Result Cache Class ---
+
+
+class QueryResultCache:
+    """
+    Redis-backed cache of custom search results keyed by normalized query and country.
+
+    Entries expire after `ttl` seconds. A sorted set indexes entries by last access
+    time; when it grows beyond `max_entries`, members whose entries have already
+    expired are pruned first and only then are the least recently used live entries
+    evicted. Hits and misses are counted in a Redis hash shared by all workers.
+    """
+
+    def __init__(self, redis_client: RedisClient, prefix: str = "search",
+                 ttl: int = QUERY_CACHE_TTL, max_entries: int = QUERY_CACHE_MAX_ENTRIES):
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_key = f"{prefix}:index"
+        self.metrics_key = f"{prefix}:metrics"
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Lowercase a query and collapse its whitespace."""
+        return " ".join(query.split()).lower()
+
+    def key_for(self, query: str, country: str) -> str:
+        return f"{self.prefix}:{country}:{self.normalize(query)}"
+
+    async def _ready(self) -> bool:
+        """Connect on first use; report False while Redis is unavailable."""
+        if not self.redis_client.circuit_breaker.can_execute():
+            return False
+        if self.redis_client.client is None:
+            try:
+                await self.redis_client.initialize()
+            except redis.RedisError as e:
+                logger.error(f"Query cache unavailable: {e}")
+                self.redis_client.circuit_breaker.record_failure()
+                return False
+        return True
+
+    async def get(self, query: str, country: str) -> Optional[Any]:
+        """Return the cached result for (query, country), or None on a miss."""
+        if not await self._ready():
+            return None
+        key = self.key_for(query, country)
+        value = await self.redis_client.get(key)
+        client = self.redis_client.client
+        try:
+            if value is None:
+                await self.redis_client.execute_command(
+                    client.hincrby, self.metrics_key, "misses", 1)
+                # The entry may have expired while still indexed
+                await self.redis_client.execute_command(client.zrem, self.index_key, key)
+                return None
+            await self.redis_client.execute_command(
+                client.hincrby, self.metrics_key, "hits", 1)
+            await self.redis_client.execute_command(
+                client.zadd, self.index_key, {key: time.time()})
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update query cache metrics: {e}")
+        return json.loads(value) if value is not None else None
+
+    async def _prune_expired(self) -> int:
+        """Drop index members whose entries have expired. Returns the number of live entries."""
+        client = self.redis_client.client
+        # Entries are written at or before their last access, so these are certainly gone
+        await self.redis_client.execute_command(
+            client.zremrangebyscore, self.index_key, "-inf", time.time() - self.ttl)
+        members = await self.redis_client.execute_command(client.zrange, self.index_key, 0, -1)
+        if not members:
+            return 0
+        async with client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.exists(member)
+            alive = await self.redis_client.execute_command(pipe.execute)
+        expired = [member for member, exists in zip(members, alive) if not exists]
+        if expired:
+            await self.redis_client.execute_command(client.zrem, self.index_key, *expired)
+        return len(members) - len(expired)
+
+    async def set(self, query: str, country: str, result: Any) -> bool:
+        """Store a result and evict the least recently used entries beyond max_entries."""
+        if not await self._ready():
+            return False
+        key = self.key_for(query, country)
+        if not await self.redis_client.set(key, json.dumps(result), ex=self.ttl):
+            return False
+        client = self.redis_client.client
+        try:
+            await self.redis_client.execute_command(
+                client.zadd, self.index_key, {key: time.time()})
+            size = await self.redis_client.execute_command(client.zcard, self.index_key)
+            if size > self.max_entries:
+                # Only live entries count against the bound
+                size = await self._prune_expired()
+            if size > self.max_entries:
+                evicted = await self.redis_client.execute_command(
+                    client.zpopmin, self.index_key, size - self.max_entries)
+                evicted_keys = [member for member, _ in evicted]
+                if evicted_keys:
+                    await self.redis_client.execute_command(client.delete, *evicted_keys)
+                    await self.redis_client.execute_command(
+                        client.hincrby, self.metrics_key, "evictions", len(evicted_keys))
+                    logger.info(
+                        f"Evicted {len(evicted_keys)} query cache entries")
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update query cache index: {e}")
+        return True
+
+    async def get_metrics(self) -> Dict[str, float]:
+        """Return hit, miss and eviction counts with the hit rate."""
+        raw = {}
+        try:
+            if not await self._ready():
+                raise redis.RedisError("Redis unavailable")
+            raw = await self.redis_client.execute_command(
+                self.redis_client.client.hgetall, self.metrics_key)
+        except redis.RedisError as e:
+            logger.error(f"Failed to read query cache metrics: {e}")
+        hits = int(raw.get("hits", 0))
+        misses = int(raw.get("misses", 0))
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": int(raw.get("evictions", 0)),
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+# --- Test Function ---
+
+
+async def main_test():
+    redis_client = RedisClient(REDIS_URL)
+    try:
+        await redis_client.initialize()
+        cache = QueryResultCache(redis_client, prefix="search_test", max_entries=2)
+        await cache.set("Technology", "United States", [["2025-01-01"], [0.5], [1, 0, 0], []])
+        logger.info(f"Hit: {await cache.get('  technology ', 'United States')}")
+        logger.info(f"Miss: {await cache.get('election', 'United States')}")
+        logger.info(f"Metrics: {await cache.get_metrics()}")
+    finally:
+        await redis_client.close()
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main_test())
@@ -6,6 +6,9 @@ from sqlalchemy.exc import OperationalError, TimeoutError, StatementError
 from tenacity import retry, wait_exponential, stop_after_attempt, before_log, after_log, retry_if_exception_type
 from app.db_logic.db import engine
 from app.db_logic.models import NewsArticle
+from app.db_logic.rollups import prune_hourly_rollups
+from app.db_logic.fencing import check_fence
+from app.redis_logic.lease_lock import FencingError
 
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO,
@@ -32,16 +35,23 @@ async def delete_old_news_articles():
     Logs success or failure for debugging.
     """
     cutoff = datetime.utcnow() - timedelta(days=30)
+    deleted_count = 0
 
     async with AsyncSession(engine) as session:
         try:
             result = await session.execute(
                 delete(NewsArticle).where(NewsArticle.pubDate < cutoff)
             )
+            await check_fence(session)
             await session.commit()
             deleted_count = result.rowcount
             logger.info(
                 f"Successfully deleted {deleted_count} news articles older than 30 days")
+            pruned_count = await prune_hourly_rollups(cutoff)
+            logger.info(f"Pruned {pruned_count} hourly rollup rows")
+        except FencingError:
+            await session.rollback()
+            raise
         except RETRIABLE_DB_EXCEPTIONS as e:
             logger.error(f"Retriable database error during deletion: {e}")
             await session.rollback()
@@ -49,6 +59,16 @@ async def delete_old_news_articles():
             logger.error(f"Unexpected error during deletion: {e}")
             await session.rollback()
 
+    if deleted_count:
+        # Snapshots still count the deleted articles until their next refresh
+        from app.scheduled.store_in_redis import store_data_in_redis
+        try:
+            await store_data_in_redis(read_own_writes=True)
+        except FencingError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to refresh snapshots after deletion: {e}")
+
 if __name__ == "__main__":
     import asyncio
     asyncio.run(delete_old_news_articles())
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+import httpx
+from app.get_custom_data import feed_fetcher, ALT_HEADLINES
+from app.news_editions import COUNTRY_CODES, HEADLINE_CATEGORIES, build_feed_url, headline_key
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Prefetch Configuration ---
+# Maximum number of feeds downloaded at once from news.google.com
+HEADLINE_PREFETCH_CONCURRENCY = int(
+    os.getenv("HEADLINE_PREFETCH_CONCURRENCY", "10"))
+HEADLINE_PREFETCH_TIMEOUT = float(os.getenv("HEADLINE_PREFETCH_TIMEOUT", "10"))
+# Prefetched headlines expire if the job stops running, so the web tier falls back to RSS
+HEADLINE_PREFETCH_TTL = int(os.getenv("HEADLINE_PREFETCH_TTL", "3600"))
+
+
+async def fetch_feed(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                     country: str, category: str) -> Tuple[str, str, Optional[List[Dict[str, str]]]]:
+    """
+    Download one feed with a conditional GET. Unchanged feeds (304) reuse the
+    previously parsed headlines; changed feeds are parsed in a worker thread.
+    """
+    url = build_feed_url(country, category)
+    async with semaphore:
+        try:
+            headlines = await feed_fetcher.afetch(client, url)
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to prefetch headlines from {url}: {e}")
+            return country, category, None
+
+    if headlines is ALT_HEADLINES:
+        return country, category, None
+    return country, category, headlines
+
+
+async def prefetch_headlines() -> Dict[str, int]:
+    """
+    Fetch the headlines for every country/category combination on the dashboard
+    and store them in Redis under headlines:{country}:{category}.
+
+    Returns:
+        Dict[str, int]: Counts of stored and failed feeds.
+    """
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(HEADLINE_PREFETCH_CONCURRENCY)
+    limits = httpx.Limits(max_connections=HEADLINE_PREFETCH_CONCURRENCY,
+                          max_keepalive_connections=HEADLINE_PREFETCH_CONCURRENCY)
+
+    async with httpx.AsyncClient(timeout=HEADLINE_PREFETCH_TIMEOUT, limits=limits,
+                                 follow_redirects=True) as client:
+        results = await asyncio.gather(*[
+            fetch_feed(client, semaphore, country, category)
+            for country in COUNTRY_CODES
+            for category in HEADLINE_CATEGORIES
+        ])
+
+    redis_client = RedisClient(REDIS_URL)
+    await redis_client.initialize()
+    stored, failed = 0, 0
+    try:
+        for country, category, headlines in results:
+            if headlines is None:
+                failed += 1
+                continue
+            if await redis_client.set(headline_key(country, category), json.dumps(headlines),
+                                      ex=HEADLINE_PREFETCH_TTL):
+                stored += 1
+            else:
+                failed += 1
+    finally:
+        await redis_client.close()
+
+    metrics = feed_fetcher.get_metrics()
+    logger.info(
+        f"Prefetched {stored} of {len(results)} headline feeds "
+        f"({failed} failed) in {time.perf_counter() - start:.2f}s; "
+        f"feed fetcher totals: {metrics['not_modified']} not modified, "
+        f"{metrics['bytes_downloaded']} bytes downloaded, {metrics['bytes_saved']} bytes saved")
+    return {"stored": stored, "failed": failed}
+
+if __name__ == "__main__":
+    asyncio.run(prefetch_headlines())
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db_logic.db import engine
+from app.db_logic.models import NewsArticle, Category, decompress_text
+from app.db_logic.dimensions import dimension_cache
+from app.db_logic.streaming import stream_partitions
+from app.db_logic.fencing import check_fence
+from app.db_logic.rollups import rebuild_hourly_rollups
+from app.aggregates.daily_buckets import rebuild_daily_buckets
+from app.analytics.article_archive import export_days
+from app.models.versions import MODEL_VERSION
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+from app.redis_logic.lease_lock import LeaseLock
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Re-scoring Configuration ---
+# Rows fetched from the server-side cursor and written back per transaction
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "1000"))
+# Scoring processes; VADER and the classifier are CPU-bound
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", str(os.cpu_count() or 1)))
+# Held while re-scoring so ingestion doesn't update the aggregates being rebuilt
+INGESTION_LOCK = "store_news"
+
+
+def _score_chunk(descriptions: List[str]) -> Tuple[List[float], List[str]]:
+    """Score descriptions in a worker process; the models load once per process."""
+    from app.models.sentiment import analyze_sentiment
+    from app.models.news_classifier import classify_articles
+    return ([analyze_sentiment(text) for text in descriptions],
+            [str(category) for category in classify_articles(descriptions)])
+
+
+async def _score(pool: ProcessPoolExecutor, descriptions: List[str]) -> Tuple[List[float], List[str]]:
+    """Split a batch across the pool and score the chunks in parallel, keeping order."""
+    loop = asyncio.get_running_loop()
+    size = -(-len(descriptions) // RESCORE_WORKERS)
+    chunks = [descriptions[i:i + size] for i in range(0, len(descriptions), size)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, _score_chunk, chunk) for chunk in chunks))
+    return ([score for scores, _ in results for score in scores],
+            [category for _, categories in results for category in categories])
+
+
+async def rescore_articles(batch_size: int = RESCORE_BATCH_SIZE,
+                           touched_days: Optional[Set[date]] = None) -> int:
+    """
+    Re-score stored articles whose model_version differs from the current models,
+    from their stored descriptions, without any network access. Rows are streamed
+    with a server-side cursor, scored in parallel processes and written back one
+    batch per transaction, so memory stays bounded by the batch size. Articles
+    stored before descriptions were kept can't be re-scored and are left as is.
+    The publication days of updated articles are added to `touched_days` if given.
+    Returns the number of articles updated.
+    """
+    started = time.monotonic()
+    updated = 0
+    stmt = (
+        select(NewsArticle.id, NewsArticle.pubDate, NewsArticle.description_compressed)
+        .where(NewsArticle.description_compressed.is_not(None))
+        .where(NewsArticle.model_version.is_distinct_from(MODEL_VERSION))
+    )
+    with ProcessPoolExecutor(max_workers=RESCORE_WORKERS) as pool:
+        # Writes go through their own session; the cursor's transaction stays read-only
+        async with AsyncSession(engine) as write_session:
+            async for rows in stream_partitions(stmt, batch_size):
+                ids = [row.id for row in rows]
+                sentiments, categories = await _score(
+                    pool, [decompress_text(row.description_compressed) for row in rows])
+                category_keys = await dimension_cache.resolve(Category, categories)
+                # Bulk UPDATE by primary key, one round trip per batch
+                await write_session.execute(update(NewsArticle), [
+                    {"id": article_id, "sentiment": sentiment, "category": category,
+                     "category_key": category_keys[category], "model_version": MODEL_VERSION}
+                    for article_id, sentiment, category in zip(ids, sentiments, categories)
+                ])
+                await check_fence(write_session)
+                await write_session.commit()
+                updated += len(ids)
+                if touched_days is not None:
+                    touched_days.update(row.pubDate.date() for row in rows)
+                logger.info(f"Re-scored {updated} articles")
+    logger.info(f"Re-scored {updated} articles with {MODEL_VERSION} in {time.monotonic() - started:.1f}s")
+    return updated
+
+
+async def rescore_and_rebuild() -> int:
+    """
+    Re-score under the ingestion lease, then rebuild the hourly rollups, daily
+    buckets, dashboard snapshots and archive partitions from the new scores.
+    """
+    redis_client = RedisClient(REDIS_URL)
+    await redis_client.initialize()
+    updated = 0
+
+    async def job():
+        nonlocal updated
+        touched_days: Set[date] = set()
+        updated = await rescore_articles(touched_days=touched_days)
+        if updated:
+            await rebuild_hourly_rollups()
+            await rebuild_daily_buckets(redis_client)
+            from app.scheduled.store_in_redis import store_data_in_redis
+            await store_data_in_redis(read_own_writes=True)
+            # The export job only rewrites its last EXPORT_REFRESH_DAYS
+            await export_days(touched_days)
+
+    try:
+        if not await LeaseLock(redis_client, INGESTION_LOCK).run(job):
+            logger.warning("Ingestion is running; try re-scoring again later")
+    finally:
+        await redis_client.close()
+    return updated
+
+if __name__ == "__main__":
+    asyncio.run(rescore_and_rebuild())
@@ -2,49 +2,204 @@ import redis.asyncio as redis
 from dotenv import load_dotenv
 import os
 import json
-from app.data_extraction.line_graph_data import get_daily_avg_sentiment
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db_logic.db import primary_wal_lsn, read_session
+from app.db_logic.pool_metrics import pool_metrics
+from app.data_extraction.line_graph_data import get_avg_sentiment_series
 from app.data_extraction.pie_chart_data import get_sentiment_pie_data
 from app.data_extraction.top_sources import get_top_sources_with_avg_sentiment
 from app.data_extraction.top_news import get_news_headlines  # optional if implemented
+from app.data_extraction.country_sentiment import get_country_snapshots
+from app.data_extraction.bucketing import BUCKET_ORIGIN, BUCKET_SIZES, choose_bucket
+from app.news_editions import country_snapshot_key
 from app.redis_logic.async_redis import RedisClient
+from app.redis_logic.lease_lock import fenced_write
+from app.aggregates.daily_buckets import query_window
 
 load_dotenv('.env')
 
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-async def store_summary_period(client: RedisClient, label: str, days: int, category: str | None = None):
+# Snapshot keys are "{period}_{name}", e.g. "weekly_sci_tech"
+SUMMARY_PERIODS = {"monthly": 30, "weekly": 7}
+SUMMARY_CATEGORIES = {
+    "summary": None,
+    "business": "Business",
+    "sports": "Sports",
+    "sci_tech": "Sci/Tech",
+    "world": "World",
+}
+SNAPSHOTS = [
+    (f"{period}_{name}", days, category)
+    for period, days in SUMMARY_PERIODS.items()
+    for name, category in SUMMARY_CATEGORIES.items()
+]
+# Per-country snapshots are "country:{country}:{period}_{name}" (see
+# app.news_editions.country_snapshot_key); this set lists the countries that have them
+COUNTRY_INDEX_KEY = "country:index"
+# Hash of snapshot label → window start (see window_start) at its last refresh
+SNAPSHOT_WINDOWS_KEY = "snapshots:window_start"
+
+
+def window_start(days: int, now: datetime) -> str:
+    """
+    Start of the line graph bucket containing the start of a `days` window ending
+    at `now`. It changes when the window slides past a bucket boundary, i.e. when
+    a refresh would drop points that aged out.
+    """
+    size = BUCKET_SIZES[choose_bucket(timedelta(days=days))]
+    return (BUCKET_ORIGIN + ((now - timedelta(days=days) - BUCKET_ORIGIN) // size) * size).isoformat()
+
+
+async def slid_snapshots(client: RedisClient, now: datetime) -> List[Tuple[str, int, str | None]]:
+    """Snapshots whose window start crossed a bucket boundary since their last refresh."""
+    await client.ensure_client()
+    stored = await client.execute_command(client.client.hgetall, SNAPSHOT_WINDOWS_KEY)
+    return [(label, days, category) for label, days, category in SNAPSHOTS
+            if stored.get(label) != window_start(days, now)]
+
+
+def affected_snapshots(touched: Iterable[Tuple[str, date]],
+                       now: Optional[datetime] = None) -> List[Tuple[str, int, str | None]]:
+    """
+    Return the snapshots whose window and category contain at least one of the
+    touched (category, day) buckets. A bucket touches the category snapshot of its
+    own category and the all-category summary, for every period whose window
+    (the last `days` days up to today, UTC) includes its day.
+    """
+    now = now or datetime.utcnow()
+    touched = set(touched)
+    affected = []
+    for label, days, category in SNAPSHOTS:
+        window_start = (now - timedelta(days=days)).date()
+        if any((category is None or category == bucket_category)
+               and window_start <= day <= now.date()
+               for bucket_category, day in touched):
+            affected.append((label, days, category))
+    return affected
+
+
+async def get_bucket_window(client: RedisClient, days: int, category: str | None = None) -> dict | None:
+    """The last `days` days merged from the daily buckets, or None if no buckets are available."""
+    now = datetime.utcnow()
+    try:
+        window = await query_window(client, now - timedelta(days=days), now, category=category)
+        if window["article_count"]:
+            return window
+    except redis.RedisError as e:
+        logger.warning(f"Daily buckets unavailable, falling back to SQL: {e}")
+    return None
+
+
+async def store_summary_period(client: RedisClient, label: str, days: int, category: str | None = None,
+                               session: AsyncSession | None = None):
     """
     Helper to store summary for a given period (week/month) and optional category
-    under Redis key: sentiment:{label}
+    under Redis key: sentiment:{label}. Queries run in `session` when given.
     """
     key = label
+    series = await get_avg_sentiment_series(days=days, category=category, session=session)
+    window = await get_bucket_window(client, days=days, category=category)
     data = {
-        "line_graph": await get_daily_avg_sentiment(days=days, category=category),
-        "pie_chart": await get_sentiment_pie_data(days=days, category=category),
-        "top_sources": await get_top_sources_with_avg_sentiment(days=days, category=category),
+        "line_graph": series["series"],
+        # Resolution of the line_graph points: "hour", "6h" or "day"
+        "bucket": series["bucket"],
+        "pie_chart": await get_sentiment_pie_data(days=days, category=category, session=session),
+        # Top sources come from the merged source sketches when buckets exist
+        "top_sources": window["top_sources"] if window
+        else await get_top_sources_with_avg_sentiment(days=days, category=category, session=session),
+        "sentiment_quantiles": window["sentiment_quantiles"] if window else {},
+        # Keywords exist only in the daily buckets
+        "top_terms": window["top_terms"] if window else [],
     }
-    await client.set(key, json.dumps(data))
+    await fenced_write(client, {key: json.dumps(data)})
+
+
+async def store_country_snapshots(client: RedisClient, snapshots: List[Tuple[str, int, str | None]],
+                                  session: AsyncSession | None = None) -> int:
+    """
+    Store the per-country version of each of `snapshots`, built from one grouped
+    scan (see get_country_snapshots). Country keys of these snapshots that no
+    longer have articles in their window are deleted. If the scan fails, the
+    stored keys are left as they are. Returns the number of keys written.
+    """
+    countries = await get_country_snapshots(snapshots, session=session)
+    if countries is None:
+        logger.warning("Per-country scan failed, keeping the stored country snapshots")
+        return 0
+    await client.ensure_client()
+    redis_client = client.client
+    known = set(await client.execute_command(redis_client.smembers, COUNTRY_INDEX_KEY)) | set(countries)
+    sets, deletes = {}, []
+    for country in sorted(known):
+        country_data = countries.get(country, {})
+        for label, _, _ in snapshots:
+            key = country_snapshot_key(country, label)
+            if label in country_data:
+                sets[key] = json.dumps(country_data[label])
+            else:
+                deletes.append(key)
+    await fenced_write(client, sets, deletes)
+    written = len(sets)
+    if countries:
+        await client.execute_command(redis_client.sadd, COUNTRY_INDEX_KEY, *countries)
+    logger.info(f"Stored {written} country snapshots for {len(countries)} countries")
+    return written
 
 
-async def store_data_in_redis():
+async def store_data_in_redis(touched: Optional[Set[Tuple[str, date]]] = None,
+                              read_own_writes: bool = False) -> Dict[str, List[str]]:
+    """
+    Recompute and publish dashboard snapshots.
+
+    Args:
+        touched: (category, day) buckets changed by an ingestion run. Only snapshots
+            containing one of them, or whose window slid past a bucket boundary
+            since their last refresh, are refreshed; None refreshes every snapshot.
+        read_own_writes: The refresh follows this process's own writes; the read
+            replica is used once it has replayed them (see read_session's min_lsn).
+
+    Returns:
+        dict: {"refreshed": [...], "skipped": [...]} snapshot keys.
+    """
+    now = datetime.utcnow()
     REDIS_URL = os.getenv("REDIS_URL")
     client = RedisClient(REDIS_URL)
     await client.initialize()
+    try:
+        if touched is None:
+            snapshots = SNAPSHOTS
+        else:
+            # Untouched windows still drop the points that aged out of them
+            due = {label for label, _, _ in affected_snapshots(touched, now) + await slid_snapshots(client, now)}
+            snapshots = [snapshot for snapshot in SNAPSHOTS if snapshot[0] in due]
+        refreshed = [label for label, _, _ in snapshots]
+        skipped = [label for label, _, _ in SNAPSHOTS if label not in refreshed]
+        if not snapshots:
+            logger.info(f"No snapshots affected, skipped all {len(skipped)}")
+            return {"refreshed": refreshed, "skipped": skipped}
+
+        # One connection for every query of the pass instead of one checkout per query
+        min_lsn = await primary_wal_lsn() if read_own_writes else None
+        async with read_session(min_lsn=min_lsn) as session:
+            for label, days, category in snapshots:
+                await store_summary_period(client, label, days=days, category=category, session=session)
+            # Every country of the affected snapshots, in one scan
+            await store_country_snapshots(client, snapshots, session=session)
+        await client.execute_command(client.client.hset, SNAPSHOT_WINDOWS_KEY, mapping={
+            label: window_start(days, now) for label, days, _ in snapshots})
+    finally:
+        await client.close()
+    pool_metrics.log_summary()
 
-    # Monthly summaries
-    await store_summary_period(client, "monthly_summary", days=30)
-    await store_summary_period(client, "monthly_business", days=30, category="Business")
-    await store_summary_period(client, "monthly_sports", days=30, category="Sports")
-    await store_summary_period(client, "monthly_sci_tech", days=30, category="Sci/Tech")
-    await store_summary_period(client, "monthly_world", days=30, category="World")
-
-    # Weekly summaries
-    await store_summary_period(client, "weekly_summary", days=7)
-    await store_summary_period(client, "weekly_business", days=7, category="Business")
-    await store_summary_period(client, "weekly_sports", days=7, category="Sports")
-    await store_summary_period(client, "weekly_sci_tech", days=7, category="Sci/Tech")
-    await store_summary_period(client, "weekly_world", days=7, category="World")
-
-    await client.close()
+    logger.info(
+        f"Refreshed {len(refreshed)} snapshots {refreshed}, skipped {len(skipped)} {skipped}")
+    return {"refreshed": refreshed, "skipped": skipped}
 
     # Headline news (optional if implemented)
     # headlines = {
@@ -1,13 +1,22 @@
 
+import asyncio
 import logging
 # from typing import NoneType
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+from datetime import datetime, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from tenacity import retry, wait_exponential, stop_after_attempt, before_log, after_log, retry_if_exception_type
 from app.scheduled.delete_old_news import delete_old_news_articles
+from app.scheduled.prefetch_headlines import prefetch_headlines
+from app.analytics.article_archive import export_articles
 from app.store_in_db import NewsProcessor
+from app.db_logic.migrations import migrate
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
+from app.redis_logic.lease_lock import LeaseLock, LeaseLostError
+from app.job_registry import JobRunRegistry
+from app.db_logic.pool_metrics import pool_metrics
 from sqlalchemy.exc import OperationalError, TimeoutError, StatementError
 
 # --- Configure Logging ---
@@ -26,12 +35,29 @@ load_dotenv(dotenv_path)
 # Default to Africa/Lagos if not set
 TIME_ZONE = os.getenv("TIME_ZONE", "Africa/Lagos")
 logger.info(f"Using timezone: {TIME_ZONE}")
+HEADLINE_PREFETCH_MINUTES = int(os.getenv("HEADLINE_PREFETCH_MINUTES", "10"))
+# What to do when a job fires while its previous run is still going:
+# "skip" drops the new run, "queue" runs it once the current run finishes
+JOB_OVERLAP_POLICY = os.getenv("JOB_OVERLAP_POLICY", "skip").lower()
+if JOB_OVERLAP_POLICY not in ("skip", "queue"):
+    raise ValueError(f"JOB_OVERLAP_POLICY must be 'skip' or 'queue', got '{JOB_OVERLAP_POLICY}'")
+JOB_MISFIRE_GRACE_SECONDS = int(os.getenv("JOB_MISFIRE_GRACE_SECONDS", "300"))
 
 # --- Retry Logic Configuration ---
 RETRIABLE_EXCEPTIONS = (OperationalError, TimeoutError, StatementError)
 
 # --- Scheduler Instance ---
-scheduler = AsyncIOScheduler(timezone=TIME_ZONE)
+# At most one running plus one queued run per job; missed fire times collapse into one run
+scheduler = AsyncIOScheduler(timezone=TIME_ZONE, job_defaults={
+    'max_instances': 2,
+    'coalesce': True,
+    'misfire_grace_time': JOB_MISFIRE_GRACE_SECONDS,
+})
+# Shared by every job's lease lock and the run registry
+lock_client = RedisClient(REDIS_URL)
+job_registry = JobRunRegistry(lock_client)
+# Serializes runs of the same job within this process
+_job_guards = {}
 
 # --- Retry Wrapper for Jobs ---
 
@@ -45,15 +71,64 @@ scheduler = AsyncIOScheduler(timezone=TIME_ZONE)
     reraise=False
 )
 async def retry_job(func):
-    """Wrap an async job function with retry logic."""
+    """Wrap an async job function with retry logic. Returns whether the job succeeded."""
     try:
         await func()
+        return True
     except RETRIABLE_EXCEPTIONS as e:
         logger.error(f"Job failed after retries: {e}")
-        return
+        return False
     except Exception as e:
         logger.error(f"Unexpected error in job: {e}")
-        return
+        return False
+
+
+async def run_exclusive(job_id, func, overlap=JOB_OVERLAP_POLICY):
+    """
+    Run a job under its Redis lease lock so that, across all replicas, only one
+    process executes it at a time. Replicas that lose the race skip the run. If
+    Redis is unreachable the run is skipped rather than risking duplicate
+    upstream calls and DB writes.
+
+    Within this process, a run that fires while the previous one is still going is
+    skipped, or with overlap="queue" waits for it; at most one run is queued.
+    """
+    guard = _job_guards.setdefault(job_id, asyncio.Lock())
+    if guard.locked():
+        if overlap != "queue" or job_registry.is_queued(job_id):
+            await job_registry.skip(job_id)
+            return
+        await job_registry.queue(job_id)
+
+    async with guard:
+        await job_registry.start(job_id)
+        status = "failed"
+
+        async def attempt():
+            nonlocal status
+            status = "success" if await retry_job(func) else "failed"
+
+        lock = LeaseLock(lock_client, job_id)
+        try:
+            if not await lock.run(attempt):
+                status = "skipped_lease"
+        except LeaseLostError as e:
+            status = "lease_lost"
+            logger.error(str(e))
+        except Exception as e:
+            if lock.token is None:
+                status = "skipped_lease"
+                logger.error(f"Could not acquire lock for job '{job_id}', skipping: {e}")
+            else:
+                # The lease was taken, so the job ran (or started) here
+                status = "failed"
+                logger.error(f"Job '{job_id}' failed under its lock: {e}")
+        finally:
+            await job_registry.finish(job_id, status)
+            try:
+                await pool_metrics.publish(lock_client)
+            except Exception as e:
+                logger.warning(f"Failed to publish DB pool metrics: {e}")
 
 # --- Scheduler Management Functions ---
 
@@ -62,12 +137,15 @@ async def startup_function():
     """
     Initialize and start the APScheduler with scheduled jobs.
     Logs when the scheduler starts and adds jobs for deleting old news and storing new articles.
+    Database migrations and backfills run once here, before any job.
     """
     try:
+        await migrate()
+
         # Add job: Delete old news articles daily at midnight
         scheduler.add_job(
-            retry_job,
-            args=[delete_old_news_articles],
+            run_exclusive,
+            args=['delete_old_news', delete_old_news_articles],
             trigger='cron',
             hour=0,
             minute=0,
@@ -78,11 +156,25 @@ async def startup_function():
         logger.info(
             "Scheduled job: 'Delete News Older Than 1 Month' at midnight daily")
 
+        # Add job: Export daily article partitions for offline analysis, after the cleanup
+        scheduler.add_job(
+            run_exclusive,
+            args=['export_articles', export_articles],
+            trigger='cron',
+            hour=0,
+            minute=30,
+            id='export_articles',
+            name='Export Article Partitions',
+            replace_existing=True
+        )
+        logger.info(
+            "Scheduled job: 'Export Article Partitions' at 00:30 daily")
+
         # Add job: Store news articles every 4 hours
         news_processor = NewsProcessor()  # Create instance once
         scheduler.add_job(
-            retry_job,
-            args=[news_processor.store_in_db],
+            run_exclusive,
+            args=['store_news', news_processor.store_in_db],
             trigger='interval',
             hours=4,
             id='store_news',
@@ -92,6 +184,20 @@ async def startup_function():
         logger.info(
             "Scheduled job: 'Store News Articles Every 4 Hours' every 4 hours")
 
+        # Add job: Prefetch headlines for every country/category combination
+        scheduler.add_job(
+            run_exclusive,
+            args=['prefetch_headlines', prefetch_headlines],
+            trigger='interval',
+            minutes=HEADLINE_PREFETCH_MINUTES,
+            next_run_time=datetime.now(timezone.utc),  # Warm Redis at startup
+            id='prefetch_headlines',
+            name='Prefetch Headlines For All Countries And Categories',
+            replace_existing=True
+        )
+        logger.info(
+            f"Scheduled job: 'Prefetch Headlines' every {HEADLINE_PREFETCH_MINUTES} minutes")
+
         # Start the scheduler
         scheduler.start()
         logger.info("APScheduler started successfully")
@@ -111,6 +217,7 @@ async def shutdown_function():
             logger.info("APScheduler shut down successfully")
         else:
             logger.info("APScheduler was not running")
+        await lock_client.close()
     except Exception as e:
         logger.error(f"Failed to shut down scheduler: {e}")
         raise
@@ -119,7 +226,6 @@ async def shutdown_function():
 
 
 if __name__ == "__main__":
-    import asyncio
 
     async def main_test():
         try:
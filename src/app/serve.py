@@ -0,0 +1,61 @@
+import logging
+import os
+import uvicorn
+from a2wsgi import WSGIMiddleware
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Server Configuration ---
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8000"))
+# Worker processes; each runs its own copy of the Dash app
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2"))
+# Threads per worker executing Dash (WSGI) requests
+WEB_THREADS = int(os.getenv("WEB_THREADS", "10"))
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", "5"))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+WEB_BACKLOG = int(os.getenv("WEB_BACKLOG", "2048"))
+# Requests beyond this many in flight per worker get a 503 instead of queueing
+WEB_LIMIT_CONCURRENCY = int(os.getenv("WEB_LIMIT_CONCURRENCY", "0")) or None
+
+# --- ASGI Application ---
+
+
+def create_asgi_app() -> WSGIMiddleware:
+    """
+    Build the ASGI application for one worker process.
+    Called by uvicorn in every worker, so the Dash app is only imported there.
+    """
+    from app.main import app
+    return WSGIMiddleware(app.server, workers=WEB_THREADS)
+
+
+def main() -> None:
+    """
+    Serve the dashboard with uvicorn worker processes.
+
+    Web workers only read Redis; scheduled ingestion runs in the separate
+    `python -m app.worker` process, so adding workers never duplicates jobs.
+    """
+    logger.info(
+        f"Serving on {WEB_HOST}:{WEB_PORT} with {WEB_WORKERS} workers x {WEB_THREADS} threads")
+    uvicorn.run(
+        "app.serve:create_asgi_app",
+        factory=True,
+        host=WEB_HOST,
+        port=WEB_PORT,
+        workers=WEB_WORKERS,
+        timeout_keep_alive=WEB_KEEPALIVE,
+        timeout_graceful_shutdown=WEB_GRACEFUL_TIMEOUT,
+        backlog=WEB_BACKLOG,
+        limit_concurrency=WEB_LIMIT_CONCURRENCY,
+        lifespan="off",
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import logging
 import re
 import asyncio
-from datetime import datetime
-from typing import Optional, List, Dict, Callable, Any
+from collections import Counter
+from datetime import datetime, date
+from typing import Optional, List, Dict, Callable, Any, Set, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -10,10 +11,21 @@ from sqlalchemy.exc import OperationalError, IntegrityError, StatementError, Tim
 from tenacity import retry, wait_exponential, stop_after_attempt, before_log, after_log, retry_if_exception_type
 from app.models.sentiment import analyze_sentiment
 from app.models.news_classifier import classify_articles
-from app.db_logic.models import NewsArticle, create_tables
+from app.models.versions import MODEL_VERSION
+from app.db_logic.models import NewsArticle, ArticleCountry, Source, Category, Country, COUNT_CLUSTERS_ONCE, article_search_vector
+from app.db_logic.dimensions import dimension_cache, split_countries
+from app.db_logic.rollups import add_to_hourly_rollup
+from app.db_logic.fencing import check_fence
+from app.redis_logic.lease_lock import FencingError
+from app.aggregates.daily_buckets import DailyBucket, ensure_daily_buckets, merge_daily_buckets
+from app.aggregates.terms import extract_terms
+from app.aggregates.dedup import NearDuplicateIndex, article_id
+from app.aggregates.bursts import update_bursts
+from app.redis_logic.async_redis import RedisClient, REDIS_URL
 from app.db_logic.db import AsyncSessionLocal
 from app.newsapi_fetcher import NewsFetcher
 from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
 
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO,
@@ -71,17 +83,35 @@ async def execute_with_retry(async_func: Callable[..., Any], *args, **kwargs) ->
 
 
 class NewsProcessor:
-    # def __init__(self, news_url: str):
-    #     self.news_url = news_url
+    def __init__(self):
+        # (category, day) buckets that received articles in the current run
+        self.touched_buckets: Set[Tuple[str, date]] = set()
+        # Aggregates of the articles inserted in the current run, per bucket
+        self.bucket_deltas: Dict[Tuple[str, date], DailyBucket] = {}
+        # Keyword mentions per category in the current run, for burst detection
+        self.term_counts: Dict[str, Counter] = {}
+        # Near-duplicate index, unset when Redis is unavailable
+        self.dedup_index: Optional[NearDuplicateIndex] = None
+
     async def insert_article(self, session: AsyncSession, data: Dict[str, Any]) -> bool:
         """Insert a single article into the database with retry logic."""
         try:
-            article = NewsArticle(**data)
+            article = NewsArticle(**{key: value for key, value in data.items() if key != "country_keys"})
             session.add(article)
+            await session.flush()
+            session.add_all([ArticleCountry(article_id=article.id, country_id=country_key)
+                             for country_key in data["country_keys"]])
+            if not (COUNT_CLUSTERS_ONCE and data["is_duplicate"]):
+                await add_to_hourly_rollup(
+                    session, data["category"], data["pubDate"], data["sentiment"])
+            await check_fence(session)
             await session.commit()
             await session.refresh(article)
             logger.info(f"Inserted article: {data['title']}")
             return True
+        except FencingError:
+            await session.rollback()
+            raise
         except IntegrityError as e:
             logger.warning(
                 f"Skipping duplicate article '{data['title']}': {e}")
@@ -109,6 +139,24 @@ class NewsProcessor:
         classifications = classify_articles(news["descriptions"])
         inserted_count = 0
 
+        # Cluster syndicated copies of a story before inserting, in one batch lookup
+        doc_ids = [article_id(link, title) for link, title in zip(news['links'], news['titles'])]
+        clusters = [(doc_id, False, None) for doc_id in doc_ids]
+        if self.dedup_index is not None:
+            try:
+                clusters = await self.dedup_index.assign([
+                    (doc_id, f"{title}. {description}") for doc_id, title, description
+                    in zip(doc_ids, news['titles'], news['descriptions'])])
+            except RedisError as e:
+                logger.error(f"Near-duplicate check unavailable for this run: {e}")
+        indexed = []
+
+        # Surrogate keys of this batch's sources, categories and countries (cached after warm-up)
+        source_keys = await dimension_cache.resolve(Source, news['source_ids'])
+        category_keys = await dimension_cache.resolve(Category, classifications)
+        country_keys = await dimension_cache.resolve(
+            Country, [name for country in news['countries'] for name in split_countries(country)])
+
         for i, (country, description, pub_date, source_id, link, title) in enumerate(zip(
             news['countries'], news['descriptions'], news['pubDates'],
             news['source_ids'], news['links'], news['titles']
@@ -120,38 +168,91 @@ class NewsProcessor:
 
                 data = {
                     "source_id": source_id,
+                    "source_key": source_keys[source_id],
+                    "category_key": category_keys[classifications[i]],
+                    "country_keys": sorted({country_keys[name] for name in split_countries(country)}),
                     "sentiment": sentiment,
                     "country": country,
                     "pubDate": dt,
                     "category": classifications[i],
                     "link": validated_link,
-                    "title": title
+                    "title": title,
+                    # Kept so articles can be re-scored offline when the models change
+                    "description": description,
+                    "model_version": MODEL_VERSION,
+                    "cluster_id": clusters[i][0],
+                    "is_duplicate": clusters[i][1],
+                    # Indexed here; the stored copy is compressed and opaque to SQL
+                    "search_vector": article_search_vector(title, description)
                 }
 
                 success = await execute_with_retry(self.insert_article, session, data)
                 if success:
                     inserted_count += 1
+                    if clusters[i][2] is not None:
+                        indexed.append((doc_ids[i], clusters[i][0], clusters[i][2]))
+                    if COUNT_CLUSTERS_ONCE and data["is_duplicate"]:
+                        continue
+                    bucket = (classifications[i], dt.date())
+                    self.touched_buckets.add(bucket)
+                    terms = extract_terms(f"{title}. {description}")
+                    self.bucket_deltas.setdefault(bucket, DailyBucket()).add(
+                        source_id, sentiment, terms)
+                    self.term_counts.setdefault(classifications[i], Counter()).update(terms)
+            except FencingError:
+                # A newer run holds the lease; stop writing
+                raise
             except Exception as e:
                 logger.error(f"Failed to process article '{title}': {e}")
 
+        if indexed:
+            try:
+                await self.dedup_index.add(indexed)
+            except RedisError as e:
+                logger.error(f"Failed to index articles for near-duplicate detection: {e}")
+
         logger.info(
             f"Successfully processed {inserted_count} of {len(news['titles'])} articles")
         return inserted_count
 
     async def store_in_db(self) -> None:
-        """Main method to create tables, process news, and store in Redis."""
-        await create_tables()
+        """Main method to process news and store in Redis; tables are migrated at worker startup."""
+        self.touched_buckets = set()
+        self.bucket_deltas = {}
+        self.term_counts = {}
+        self.dedup_index = None
+        redis_client = RedisClient(REDIS_URL)
+        redis_ready = buckets_ready = False
+        try:
+            await redis_client.initialize()
+            redis_ready = True
+            self.dedup_index = NearDuplicateIndex(redis_client)
+            # Backfill before inserting so this run is not counted twice
+            buckets_ready = await ensure_daily_buckets(redis_client)
+        except RedisError as e:
+            logger.error(f"Daily buckets unavailable for this run: {e}")
         async with AsyncSessionLocal() as session:
             try:
                 inserted_count = await self.process_news_data(session)
-                if inserted_count > 0:
-                    from app.scheduled.store_in_redis import store_data_in_redis
-                    await store_data_in_redis()
-                    logger.info(
-                        "Stored data in Redis after successful DB insertion")
+                if redis_ready:
+                    # Runs without new articles still decay the trending scores
+                    try:
+                        await update_bursts(redis_client, self.term_counts)
+                    except RedisError as e:
+                        logger.error(f"Failed to update trending terms: {e}")
+                if inserted_count > 0 and buckets_ready:
+                    await merge_daily_buckets(redis_client, self.bucket_deltas)
+                # Runs without new articles still slide the snapshot windows
+                from app.scheduled.store_in_redis import store_data_in_redis
+                await store_data_in_redis(touched=self.touched_buckets, read_own_writes=True)
+                logger.info(
+                    f"Stored data in Redis after DB insertion of {inserted_count} articles "
+                    f"({len(self.touched_buckets)} category/day buckets touched)")
             except Exception as e:
                 logger.error(f"Failed to process and store news: {e}")
                 await session.rollback()
+            finally:
+                await redis_client.close()
 
 # --- Test Function ---
 
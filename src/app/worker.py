@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import signal
+from app.scheduler import startup_function, shutdown_function
+
+# --- Configure Logging ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    """
+    Ingestion worker entry point: `python -m app.worker`.
+
+    Owns the AsyncIOScheduler and with it every job that touches the database, the
+    classifier and VADER (news ingestion, retention, Redis snapshots and headline
+    prefetch). Web processes started with `python -m app.serve` only read the
+    results from Redis. Run exactly one worker per deployment.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt handling below
+            pass
+
+    await startup_function()
+    logger.info("Ingestion worker started")
+    try:
+        await stop_event.wait()
+    finally:
+        await shutdown_function()
+        logger.info("Ingestion worker stopped")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass